@@ -14,6 +14,7 @@ from ..data import Data as data
 from ..settings import Settings as sett 
 from ..settings import DATA 
 from plbot .playerokbot import get_playerok_bot 
+from core .message_templates import get_message_templates 
 
 if TYPE_CHECKING :
     from plbot .playerokbot import PlayerokBot 
@@ -22,6 +23,7 @@ if TYPE_CHECKING :
 logger =getLogger (f"{NAME }.playerok")
 config =sett .get ("config")
 messages =sett .get ("messages")
+get_message_templates ().register ("messages",DATA )
 
 new_forms =data .get ("new_forms")
 forms =data .get ("forms")
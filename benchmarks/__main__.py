@@ -0,0 +1,126 @@
+import sys 
+import json 
+import time 
+import logging 
+import argparse 
+import platform 
+import traceback 
+from datetime import datetime ,timezone 
+
+from __init__ import VERSION 
+from core .utils import patch_requests 
+
+from .fixtures import load_recorded 
+from .scenarios import SCENARIOS 
+
+
+def parse_args (args :list [str ]|None =None )->argparse .Namespace :
+    parser =argparse .ArgumentParser (
+    prog ="python -m benchmarks",
+    description ="Offline benchmarks of the bot against a local stand-in of Playerok."
+    )
+    parser .add_argument ("scenarios",nargs ="*",help =f"scenarios to run: {', '.join (SCENARIOS )} (all by default)")
+    parser .add_argument ("-o","--output",default ="bench_report.json",help ="path of the JSON report")
+    parser .add_argument ("--orders",type =int ,default =100000 ,help ="cached orders of the get_stats scenario")
+    parser .add_argument ("--repeat",type =int ,default =5 ,help ="measured calls of the get_stats scenario")
+    parser .add_argument ("--items",type =int ,default =5000 ,help ="account items of the get_my_items scenario")
+    parser .add_argument ("--frames",type =int ,default =5000 ,help ="chat messages of the listener scenario and of the synthetic replay capture")
+    parser .add_argument ("--deals",type =int ,default =200 ,help ="deals of the deals scenario")
+    parser .add_argument ("--chats",type =int ,default =24 ,help ="account chats of the listener, deals and replay scenarios")
+    parser .add_argument ("--timeout",type =float ,default =300 ,help ="maximum wait of the listener, deals and replay scenarios in seconds")
+    parser .add_argument ("--capture",help ="WebSocket capture of the replay scenario (see the ws_capture config option)")
+    parser .add_argument ("--save-capture",help ="path to save the replayed capture to")
+    parser .add_argument ("--rates",default ="1,10,100",help ="replay speeds relative to the capture, comma-separated")
+    parser .add_argument ("--capture-rate",type =float ,default =100 ,help ="messages per second of the synthetic replay capture")
+    parser .add_argument ("--deals-share",type =float ,default =0.02 ,help ="share of the paid deal messages of the synthetic replay capture")
+    parser .add_argument ("--duplicates",type =float ,default =0 ,help ="share of the messages of the synthetic replay capture delivered twice")
+    parser .add_argument ("--no-tracemalloc",action ="store_true",help ="do not trace the allocations of the replay scenario")
+    parser .add_argument ("--latency",type =float ,default =0 ,help ="delay of each HTTP answer in seconds")
+    parser .add_argument ("--jitter",type =float ,default =0 ,help ="random addition to the delay in seconds")
+    parser .add_argument ("--error-rate",type =float ,default =0 ,help ="share of the requests answered with a GraphQL error")
+    parser .add_argument ("--rate-limit-rate",type =float ,default =0 ,help ="share of the requests answered with 429")
+    parser .add_argument ("--retry-after",type =float ,default =0.1 ,help ="Retry-After of the 429 answers in seconds")
+    parser .add_argument ("--no-ws-deflate",action ="store_true",help ="do not compress the WebSocket messages")
+    parser .add_argument ("--fixtures",help ="JSON file with the recorded responses (operationName → response body)")
+    parser .add_argument ("--seed",type =int ,default =None ,help ="seed of the generated data and the injected errors")
+    parser .add_argument ("-v","--verbose",action ="store_true",help ="show the bot logs")
+    parsed =parser .parse_args (args )
+    unknown =[name for name in parsed .scenarios if name not in SCENARIOS ]
+    if unknown :
+        parser .error (f"unknown scenarios: {', '.join (unknown )}")
+    try :
+        parsed .rates =[float (rate )for rate in parsed .rates .split (",")]
+    except ValueError :
+        parser .error (f"invalid replay speeds: {parsed .rates }")
+    return parsed 
+
+
+def run (args :argparse .Namespace )->dict :
+    recorded =load_recorded (args .fixtures )if args .fixtures else None 
+    server_options ={
+    "latency":args .latency ,
+    "jitter":args .jitter ,
+    "error_rate":args .error_rate ,
+    "rate_limit_rate":args .rate_limit_rate ,
+    "retry_after":args .retry_after ,
+    "ws_deflate":not args .no_ws_deflate ,
+    "seed":args .seed 
+    }
+    kwargs ={
+    "get_stats":{"orders":args .orders ,"repeat":args .repeat ,"seed":args .seed },
+    "get_my_items":{"items":args .items ,"recorded":recorded ,"server_options":server_options },
+    "listener":{"frames":args .frames ,"chats":args .chats ,"timeout":args .timeout ,"recorded":recorded ,"server_options":server_options },
+    "deals":{"deals":args .deals ,"chats":args .chats ,"timeout":args .timeout ,"recorded":recorded ,"server_options":server_options },
+    "replay":{
+    "capture":args .capture ,
+    "rates":args .rates ,
+    "messages":args .frames ,
+    "chats":args .chats ,
+    "capture_rate":args .capture_rate ,
+    "deals_share":args .deals_share ,
+    "duplicates_share":args .duplicates ,
+    "timeout":args .timeout ,
+    "trace_allocations":not args .no_tracemalloc ,
+    "save_capture_path":args .save_capture ,
+    "seed":args .seed ,
+    "server_options":server_options 
+    }
+    }
+
+    report ={
+    "version":VERSION ,
+    "python":platform .python_version (),
+    "platform":platform .platform (),
+    "started_at":datetime .now (timezone .utc ).isoformat (),
+    "options":{**vars (args ),"fixtures":sorted (recorded )if recorded else None },
+    "scenarios":{}
+    }
+    for name in args .scenarios or list (SCENARIOS ):
+        print (f"Running {name }...",flush =True )
+        started =time .perf_counter ()
+        try :
+            result =SCENARIOS [name ](**kwargs [name ])
+        except Exception as e :
+            result ={"error":f"{type (e ).__name__ }: {e }"}
+            if args .verbose :
+                traceback .print_exc ()
+        result ["duration"]=round (time .perf_counter ()-started ,3 )
+        report ["scenarios"][name ]=result 
+        print (f"  {json .dumps ({k :v for k ,v in result .items ()if not isinstance (v ,dict )},ensure_ascii =False )}",flush =True )
+    return report 
+
+
+def main (args :list [str ]|None =None )->int :
+    args =parse_args (args )
+    logging .basicConfig (level =logging .DEBUG if args .verbose else logging .CRITICAL )
+    patch_requests ()# 429 and 5xx are retried the same way as in the bot
+
+    report =run (args )
+    with open (args .output ,"w",encoding ="utf-8")as f :
+        json .dump (report ,f ,ensure_ascii =False ,indent =4 )
+    print (f"Report saved to {args .output }")
+    return 1 if any ("error"in result for result in report ["scenarios"].values ())else 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main ())
@@ -0,0 +1,346 @@
+import json 
+import uuid 
+import random 
+from threading import Lock 
+from datetime import datetime ,timedelta ,timezone 
+
+
+ACCOUNT_ID ="bench-account"
+ACCOUNT_USERNAME ="bench_seller"
+SUPPORT_CHAT_ID ="bench-support-chat"
+SYSTEM_CHAT_ID ="bench-system-chat"
+ROOT_KEYS ={
+"viewerBalance":"viewer",
+"userChats":"chats",
+"GamePage":"game",
+"GamePageCategory":"gameCategory",
+"SbpBankMembers":"sbpBankMembers"
+}
+
+
+def _iso (dt :datetime |None =None )->str :
+    return (dt or datetime .now (timezone .utc )).strftime ("%Y-%m-%dT%H:%M:%S.%f")[:-3 ]+"Z"
+
+
+def _page (nodes :list ,variables :dict )->dict :
+    pagination =variables .get ("pagination")or {}
+    first =pagination .get ("first")or 24 
+    after =pagination .get ("after")
+    start =int (after )if after else 0 
+    page =nodes [start :start +first ]
+    return {
+    "edges":[{"cursor":str (start +i +1 ),"node":node }for i ,node in enumerate (page )],
+    "pageInfo":{
+    "startCursor":str (start +1 )if page else None ,
+    "endCursor":str (start +len (page ))if page else None ,
+    "hasPreviousPage":start >0 ,
+    "hasNextPage":start +len (page )<len (nodes )
+    },
+    "totalCount":len (nodes )
+    }
+
+
+def load_recorded (path :str )->dict [str ,dict ]:
+    'Loads the recorded responses: a JSON object operationName → response body\n    (`{"data": {...}}` as it was returned by Playerok).\n\n    :param path: Path to the JSON file.\n    :type path: `str`\n\n    :return: Recorded responses by the operation name.\n    :rtype: `dict[str, dict]`'
+    with open (path ,"r",encoding ="utf-8")as f :
+        return json .load (f )
+
+
+def generate_orders (count :int ,days :int =60 ,seed :int |None =None )->dict [str ,dict ]:
+    'Generates the cached orders (`bot_data/cached_orders.json`) spread over the last days.\n\n    :param count: Number of orders.\n    :type count: `int`\n\n    :param days: Period of the orders dates in days, _optional_.\n    :type days: `int`\n\n    :return: Orders by the deal ID.\n    :rtype: `dict[str, dict]`'
+    rnd =random .Random (seed )
+    moscow =timezone (timedelta (hours =3 ))
+    now =datetime .now (moscow )
+    statuses =["CONFIRMED"]*6 +["CONFIRMED_AUTOMATICALLY","PAID","SENT","ROLLED_BACK"]
+    orders ={}
+    for i in range (count ):
+        deal_id =f"deal-{i }"
+        item_index =rnd .randrange (200 )
+        orders [deal_id ]={
+        "id":deal_id ,
+        "price":rnd .randrange (50 ,5000 ),
+        "status":rnd .choice (statuses ),
+        "date":(now -timedelta (seconds =rnd .uniform (0 ,days *86400 ))).isoformat (),
+        "item_id":f"item-{item_index }",
+        "item_name":f"Benchmark item #{item_index }"
+        }
+    return orders 
+
+
+class MockPlayerok :
+    'State of the stand-in Playerok: the account, its chats, messages, items and deals.\n    Answers the GraphQL operations of `playerokapi.account.Account` with synthetic data,\n    the operations from `recorded` are answered with the recorded responses as is.\n\n    :param chats: Number of the account chats, _optional_.\n    :type chats: `int`\n\n    :param items: Number of the account items, _optional_.\n    :type items: `int`\n\n    :param recorded: Recorded responses by the operation name, _optional_.\n    :type recorded: `dict[str, dict]` or `None`'
+
+    def __init__ (self ,chats :int =24 ,items :int =0 ,recorded :dict [str ,dict ]|None =None ):
+        self .recorded :dict [str ,dict ]=recorded or {}
+        "Recorded responses by the operation name."
+
+        self .chats :dict [str ,dict ]={}
+        "Chats by the ID (in the order of the last activity)."
+        self .messages :dict [str ,list [dict ]]={}
+        "Chat messages by the chat ID, newest first."
+        self .items :list [dict ]=[]
+        "Account items."
+        self .deals :list [dict ]=[]
+        "Account deals, newest first."
+
+        self ._lock =Lock ()
+
+        for i in range (chats ):
+            self .add_chat (f"buyer-{i }",f"buyer_{i }")
+        self .add_items (items )
+
+    def _user (self ,user_id :str ,username :str )->dict :
+        return {
+        "__typename":"UserFragment",
+        "id":user_id ,
+        "username":username ,
+        "role":"USER",
+        "avatarURL":None ,
+        "isOnline":True ,
+        "isBlocked":False ,
+        "rating":5 ,
+        "testimonialCounter":10 ,
+        "createdAt":_iso (),
+        "supportChatId":None ,
+        "systemChatId":None 
+        }
+
+    def _viewer (self )->dict :
+        return {
+        "id":ACCOUNT_ID ,
+        "username":ACCOUNT_USERNAME ,
+        "email":"bench@example.com",
+        "role":"USER",
+        "hasFrozenBalance":False ,
+        "supportChatId":SUPPORT_CHAT_ID ,
+        "systemChatId":SYSTEM_CHAT_ID ,
+        "unreadChatsCounter":0 ,
+        "isBlocked":False ,
+        "isBlockedFor":None ,
+        "createdAt":_iso (),
+        "lastItemCreatedAt":_iso (),
+        "hasConfirmedPhoneNumber":True ,
+        "canPublishItems":True ,
+        "balance":{
+        "id":"bench-balance",
+        "value":10000 ,
+        "frozen":0 ,
+        "available":10000 ,
+        "withdrawable":10000 ,
+        "pendingIncome":0 
+        }
+        }
+
+    def _account_user (self )->dict :
+        viewer =self ._viewer ()
+        return {
+        "__typename":"User",
+        "id":ACCOUNT_ID ,
+        "email":viewer ["email"],
+        "role":"USER",
+        "isBlocked":False ,
+        "isVerified":True ,
+        "hasFrozenBalance":False ,
+        "unreadChatsCounter":0 ,
+        "balance":viewer ["balance"],
+        "stats":{
+        "items":{"total":len (self .items ),"finished":0 },
+        "deals":{
+        "incoming":{"total":0 ,"finished":0 },
+        "outgoing":{"total":len (self .deals ),"finished":0 }
+        }
+        },
+        "profile":{**self ._user (ACCOUNT_ID ,ACCOUNT_USERNAME ),"supportChatId":SUPPORT_CHAT_ID ,"systemChatId":SYSTEM_CHAT_ID }
+        }
+
+    def _item (self ,index :int )->dict :
+        return {
+        "__typename":"MyItem",
+        "id":f"item-{index }",
+        "slug":f"benchmark-item-{index }",
+        "name":f"Benchmark item #{index }",
+        "description":"Synthetic benchmark item",
+        "price":100 +index %900 ,
+        "rawPrice":100 +index %900 ,
+        "priority":"DEFAULT",
+        "priorityPosition":index ,
+        "status":"APPROVED",
+        "sellerType":"USER",
+        "attachment":{
+        "id":f"file-{index }",
+        "url":f"https://example.com/items/{index }.jpg",
+        "filename":f"{index }.jpg",
+        "mime":"image/jpeg"
+        },
+        "user":self ._user (ACCOUNT_ID ,ACCOUNT_USERNAME ),
+        "approvalDate":_iso (),
+        "viewsCounter":index %50 ,
+        "feeMultiplier":0.1 ,
+        "createdAt":_iso ()
+        }
+
+    def new_chat (self ,chat_id :str ,buyer :dict |None =None )->dict :
+        'Builds the chat data of the account with the buyer (the chat is not added).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param buyer: Buyer data, _optional_.\n        :type buyer: `dict` or `None`\n\n        :return: Chat data.\n        :rtype: `dict`'
+        return {
+        "__typename":"Chat",
+        "id":chat_id ,
+        "type":"PM",
+        "status":"NEW",
+        "unreadMessagesCounter":0 ,
+        "bookmarked":False ,
+        "isTextingAllowed":True ,
+        "owner":None ,
+        "deals":[],
+        "startedAt":_iso (),
+        "finishedAt":None ,
+        "lastMessage":None ,
+        "participants":[
+        self ._user (ACCOUNT_ID ,ACCOUNT_USERNAME ),
+        buyer or self ._user ("buyer","buyer")
+        ]
+        }
+
+    def put_chat (self ,chat :dict ):
+        'Adds the chat data as is (an existing chat with the same ID is replaced).\n\n        :param chat: Chat data.\n        :type chat: `dict`'
+        with self ._lock :
+            self .chats .pop (chat ["id"],None )
+            self .chats [chat ["id"]]=chat 
+            self .messages .setdefault (chat ["id"],[])
+
+    def add_chat (self ,buyer_id :str ,buyer_username :str )->dict :
+        'Adds the chat of the account with the buyer.\n\n        :param buyer_id: Buyer ID.\n        :type buyer_id: `str`\n\n        :param buyer_username: Buyer nickname.\n        :type buyer_username: `str`\n\n        :return: Chat data.\n        :rtype: `dict`'
+        chat =self .new_chat (f"chat-{buyer_id }",self ._user (buyer_id ,buyer_username ))
+        self .put_chat (chat )
+        self .add_message (chat ["id"],"Hello!",created_at =datetime .now (timezone .utc )-timedelta (hours =1 ))
+        return chat 
+
+    def add_items (self ,count :int ):
+        'Adds the account items.\n\n        :param count: Number of items.\n        :type count: `int`'
+        with self ._lock :
+            start =len (self .items )
+            self .items .extend (self ._item (i )for i in range (start ,start +count ))
+
+    def get_buyer (self ,chat_id :str )->dict :
+        'Returns the buyer of the chat.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :return: User data.\n        :rtype: `dict`'
+        return self .chats [chat_id ]["participants"][1 ]
+
+    def new_message (self ,chat_id :str ,text :str ,user :dict |None =None ,deal :dict |None =None ,
+    created_at :datetime |None =None )->dict :
+        'Builds the message data of the chat (the message is not added).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param text: Message text.\n        :type text: `str`\n\n        :param user: Message author (the buyer by default), _optional_.\n        :type user: `dict` or `None`\n\n        :param deal: Deal of the system message, _optional_.\n        :type deal: `dict` or `None`\n\n        :return: Message data.\n        :rtype: `dict`'
+        return {
+        "__typename":"ChatMessage",
+        "id":str (uuid .uuid4 ()),
+        "text":text ,
+        "createdAt":_iso (created_at ),
+        "deletedAt":None ,
+        "isRead":False ,
+        "isSuspicious":False ,
+        "isBulkMessaging":False ,
+        "file":None ,
+        "user":user or self .get_buyer (chat_id ),
+        "deal":deal ,
+        "item":deal ["item"]if deal else None ,
+        "isAutoResponse":False ,
+        "buttons":[]
+        }
+
+    def push_message (self ,chat_id :str ,message :dict )->dict :
+        'Adds the ready message data to the chat (it becomes the last message of the chat).\n        The missing chat is created with the message author as the buyer, the missing deal of the message is added too.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param message: Message data.\n        :type message: `dict`\n\n        :return: Message data.\n        :rtype: `dict`'
+        if chat_id not in self .chats :
+            self .put_chat (self .new_chat (chat_id ,message .get ("user")))
+        deal =message .get ("deal")
+        with self ._lock :
+            if deal and not any (deal_ ["id"]==deal ["id"]for deal_ in self .deals ):
+                self .deals .insert (0 ,deal )
+                self .chats [chat_id ]["deals"]=[deal ]
+            self .messages [chat_id ].insert (0 ,message )
+            chat =self .chats .pop (chat_id )
+            chat ["lastMessage"]=message 
+            self .chats [chat_id ]=chat 
+        return message 
+
+    def add_message (self ,chat_id :str ,text :str ,user :dict |None =None ,deal :dict |None =None ,
+    created_at :datetime |None =None )->dict :
+        'Adds the message to the chat (it becomes the last message of the chat).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param text: Message text.\n        :type text: `str`\n\n        :param user: Message author (the buyer by default), _optional_.\n        :type user: `dict` or `None`\n\n        :param deal: Deal of the system message, _optional_.\n        :type deal: `dict` or `None`\n\n        :return: Message data.\n        :rtype: `dict`'
+        return self .push_message (chat_id ,self .new_message (chat_id ,text ,user ,deal ,created_at ))
+
+    def new_deal (self ,chat_id :str ,item :dict |None =None )->dict :
+        'Builds the paid deal data of an account item in the chat (the deal is not added).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param item: Item data (the next account item by default), _optional_.\n        :type item: `dict` or `None`\n\n        :return: Deal data.\n        :rtype: `dict`'
+        if item is None :
+            if not self .items :
+                self .add_items (1 )
+            item =self .items [len (self .deals )%len (self .items )]
+        return {
+        "__typename":"ItemDeal",
+        "id":str (uuid .uuid4 ()),
+        "status":"PAID",
+        "direction":"OUT",
+        "hasProblem":False ,
+        "reportProblemEnabled":True ,
+        "createdAt":_iso (),
+        "user":self .get_buyer (chat_id ),
+        "chat":{"__typename":"Chat","id":chat_id },
+        "item":{**item ,"__typename":"Item"},
+        "transaction":None ,
+        "testimonial":None 
+        }
+
+    def create_deal (self ,chat_id :str )->tuple [dict ,dict ]:
+        'Creates the paid deal of an account item in the chat and adds its `{{ITEM_PAID}}` message.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :return: Deal data and the message data.\n        :rtype: `tuple[dict, dict]`'
+        deal =self .new_deal (chat_id )
+        message =self .add_message (chat_id ,"{{ITEM_PAID}}",user =self ._user (ACCOUNT_ID ,ACCOUNT_USERNAME ),deal =deal )
+        return deal ,message 
+
+    def resolve (self ,operation :str ,variables :dict )->dict :
+        'Answers the GraphQL operation.\n\n        :param operation: Operation name.\n        :type operation: `str`\n\n        :param variables: Operation variables.\n        :type variables: `dict`\n\n        :return: Response body (`{"data": ...}` or `{"errors": ...}`).\n        :rtype: `dict`'
+        if operation in self .recorded :
+            return self .recorded [operation ]
+
+        root =ROOT_KEYS .get (operation ,operation )
+        data_input =variables .get ("input")or {}
+        data_filter =variables .get ("filter")or {}
+
+        if operation in ("viewer","viewerBalance"):
+            data =self ._viewer ()
+        elif operation =="user":
+            if variables .get ("id")in (None ,ACCOUNT_ID )and variables .get ("username")in (None ,ACCOUNT_USERNAME ):
+                data =self ._account_user ()
+            else :
+                buyer =self ._user (variables .get ("id")or "buyer",variables .get ("username")or "buyer")
+                data ={"__typename":"User","id":buyer ["id"],"profile":buyer }
+        elif operation =="userChats":
+            with self ._lock :
+                chats =list (reversed (self .chats .values ()))
+            data =_page (chats ,variables )
+        elif operation in ("chat","markChatAsRead"):
+            data =self .chats .get (variables .get ("id")or data_input .get ("chatId"))
+        elif operation =="chatMessages":
+            with self ._lock :
+                messages =list (self .messages .get (data_filter .get ("chatId"),[]))
+            data =_page (messages ,variables )
+        elif operation =="createChatMessage":
+            data =self .add_message (data_input .get ("chatId"),data_input .get ("text")or "",user =self ._user (ACCOUNT_ID ,ACCOUNT_USERNAME ))
+        elif operation =="items":
+            statuses =data_filter .get ("status")
+            items =[item for item in self .items if not statuses or item ["status"]in statuses ]
+            data =_page (items ,variables )
+        elif operation in ("item","increaseItemPriorityStatus","publishItem","updateItem"):
+            item_id =variables .get ("id")or data_input .get ("itemId")or data_input .get ("id")
+            data =next ((item for item in self .items if item ["id"]==item_id ),None )
+        elif operation =="deals":
+            statuses =data_filter .get ("status")
+            with self ._lock :
+                deals =[deal for deal in self .deals if not statuses or deal ["status"]in statuses ]
+            data =_page (deals ,variables )
+        elif operation in ("deal","updateDeal"):
+            deal_id =variables .get ("id")or data_input .get ("id")
+            data =next ((deal for deal in self .deals if deal ["id"]==deal_id ),None )
+            if data and data_input .get ("status"):
+                data ["status"]=data_input ["status"]
+        elif operation in ("games","verifiedCards","transactions","testimonials"):
+            data =_page ([],variables )
+        elif operation in ("itemPriorityStatuses","transactionProviders","SbpBankMembers"):
+            data =[]
+        else :
+            return {"errors":[{"message":f"Operation {operation } is not supported by the mock server"}]}
+        return {"data":{root :data }}
@@ -0,0 +1,340 @@
+import re 
+import json 
+import time 
+import zlib 
+import base64 
+import random 
+import socket 
+import hashlib 
+from threading import Thread ,Lock ,Condition 
+from urllib .parse import urlsplit ,parse_qs 
+from http .server import ThreadingHTTPServer ,BaseHTTPRequestHandler 
+from logging import getLogger 
+
+from .fixtures import MockPlayerok 
+
+
+logger =getLogger ("universal.benchmarks")
+
+WS_GUID ="258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_SUBPROTOCOL ="graphql-transport-ws"
+DEFLATE_TAIL =b"\x00\x00\xff\xff"
+
+
+class WSConnection :
+    'Server side of the WebSocket connection (RFC 6455) with the `graphql-transport-ws` protocol.\n    Compresses the sent messages with permessage-deflate if the client offers it.\n\n    :param handler: Request handler of the connection.\n    :type handler: `benchmarks.mock_server._MockRequestHandler`\n\n    :param deflate: Whether to compress the sent messages.\n    :type deflate: `bool`'
+
+    def __init__ (self ,handler :"_MockRequestHandler",deflate :bool ):
+        self .handler =handler 
+        self .deflate =deflate 
+
+        self .subscriptions :dict [str ,tuple [str ,dict ]]={}
+        "Active subscriptions: ID → (operation name, variables)."
+        self .is_closed :bool =False 
+        "Whether the connection has been closed."
+
+        self ._compressor =zlib .compressobj (zlib .Z_DEFAULT_COMPRESSION ,zlib .DEFLATED ,-zlib .MAX_WBITS )
+        self ._send_lock =Lock ()
+
+    def _send_frame (self ,opcode :int ,payload :bytes ,compressed :bool =False ):
+        header =bytearray ([0x80 |(0x40 if compressed else 0 )|opcode ])
+        if len (payload )<126 :
+            header .append (len (payload ))
+        elif len (payload )<65536 :
+            header .append (126 )
+            header +=len (payload ).to_bytes (2 ,"big")
+        else :
+            header .append (127 )
+            header +=len (payload ).to_bytes (8 ,"big")
+        self .handler .connection .sendall (bytes (header )+payload )
+
+    def _recv_frame (self )->tuple [int ,bytes ]|None :
+        rfile =self .handler .rfile 
+        head =rfile .read (2 )
+        if len (head )<2 :
+            return None 
+        opcode ,length =head [0 ]&0x0F ,head [1 ]&0x7F 
+        if length ==126 :
+            length =int .from_bytes (rfile .read (2 ),"big")
+        elif length ==127 :
+            length =int .from_bytes (rfile .read (8 ),"big")
+        mask =rfile .read (4 )if head [1 ]&0x80 else None 
+        payload =rfile .read (length )
+        if mask :
+            key =int .from_bytes ((mask *(length //4 +1 ))[:length ],"big")
+            payload =(int .from_bytes (payload ,"big")^key ).to_bytes (length ,"big")
+        return opcode ,payload 
+
+    def send_json (self ,data :dict ):
+        'Sends the protocol message.\n\n        :param data: Message.\n        :type data: `dict`'
+        payload =json .dumps (data ).encode ("utf-8")
+        with self ._send_lock :
+            if self .is_closed :
+                return 
+            try :
+                if self .deflate :
+                    payload =self ._compressor .compress (payload )+self ._compressor .flush (zlib .Z_SYNC_FLUSH )
+                    self ._send_frame (0x1 ,payload [:-len (DEFLATE_TAIL )],compressed =True )
+                else :
+                    self ._send_frame (0x1 ,payload )
+            except OSError :
+                self .is_closed =True 
+
+    def close (self ):
+        'Closes the connection.'
+        with self ._send_lock :
+            if self .is_closed :
+                return 
+            self .is_closed =True 
+            try :
+                self ._send_frame (0x8 ,(1000 ).to_bytes (2 ,"big"))
+                self .handler .connection .shutdown (socket .SHUT_RDWR )
+            except OSError :
+                pass 
+
+    def run (self ):
+        'Reads the client messages until the connection is closed.'
+        server :MockPlayerokServer =self .handler .server 
+        while not self .is_closed :
+            try :
+                frame =self ._recv_frame ()
+            except (OSError ,ValueError ):
+                frame =None 
+            if frame is None :
+                break 
+
+            opcode ,payload =frame 
+            if opcode ==0x8 :
+                self .close ()
+                break 
+            if opcode ==0x9 :
+                try :
+                    with self ._send_lock :
+                        self ._send_frame (0xA ,payload )
+                except OSError :
+                    break 
+                continue 
+            if opcode !=0x1 :
+                continue 
+
+            try :
+                msg =json .loads (payload )
+            except ValueError :
+                continue 
+            if msg .get ("type")=="connection_init":
+                self .send_json ({"type":"connection_ack"})
+            elif msg .get ("type")=="ping":
+                self .send_json ({"type":"pong"})
+            elif msg .get ("type")=="subscribe":
+                subscription =msg .get ("payload")or {}
+                self .subscriptions [msg .get ("id")]=(subscription .get ("operationName"),subscription .get ("variables")or {})
+                server ._notify_subscription ()
+            elif msg .get ("type")=="complete":
+                self .subscriptions .pop (msg .get ("id"),None )
+        self .is_closed =True 
+
+
+class _MockRequestHandler (BaseHTTPRequestHandler ):
+    protocol_version ="HTTP/1.1"
+    server :"MockPlayerokServer"
+
+    def _send (self ,status :int ,body :dict |str ,headers :dict |None =None ):
+        data =(body if isinstance (body ,str )else json .dumps (body )).encode ("utf-8")
+        self .send_response (status )
+        self .send_header ("Content-Type","application/json"if isinstance (body ,dict )else "text/plain")
+        self .send_header ("Content-Length",str (len (data )))
+        for k ,v in (headers or {}).items ():
+            self .send_header (k ,v )
+        self .end_headers ()
+        self .wfile .write (data )
+
+    def _graphql (self ,operation :str ,variables :dict ):
+        status ,body ,headers =self .server .handle_operation (operation ,variables )
+        self ._send (status ,body ,headers )
+
+    def _websocket (self ):
+        key =self .headers .get ("Sec-WebSocket-Key","")
+        accept =base64 .b64encode (hashlib .sha1 ((key +WS_GUID ).encode ()).digest ()).decode ()
+        deflate =self .server .ws_deflate and "permessage-deflate"in self .headers .get ("Sec-WebSocket-Extensions","")
+
+        self .send_response (101 )
+        self .send_header ("Upgrade","websocket")
+        self .send_header ("Connection","Upgrade")
+        self .send_header ("Sec-WebSocket-Accept",accept )
+        if WS_SUBPROTOCOL in self .headers .get ("Sec-WebSocket-Protocol",""):
+            self .send_header ("Sec-WebSocket-Protocol",WS_SUBPROTOCOL )
+        if deflate :
+            self .send_header ("Sec-WebSocket-Extensions","permessage-deflate")
+        self .end_headers ()
+        self .wfile .flush ()
+
+        connection =WSConnection (self ,deflate )
+        self .server ._add_ws_connection (connection )
+        try :
+            connection .run ()
+        finally :
+            self .server ._remove_ws_connection (connection )
+            self .close_connection =True 
+
+    def do_GET (self ):
+        if self .headers .get ("Upgrade","").lower ()=="websocket":
+            return self ._websocket ()
+        query =parse_qs (urlsplit (self .path ).query )
+        try :
+            variables =json .loads (query .get ("variables",["{}"])[0 ])
+        except ValueError :
+            variables ={}
+        self ._graphql (query .get ("operationName",[""])[0 ],variables )
+
+    def do_POST (self ):
+        body =self .rfile .read (int (self .headers .get ("Content-Length")or 0 ))
+        if self .headers .get ("Content-Type","").startswith ("multipart/"):# file uploads, only the operation is needed
+            match =re .search (rb'"operationName"\s*:\s*"(\w+)"',body )
+            return self ._graphql (match .group (1 ).decode ()if match else "",{})
+        try :
+            payload =json .loads (body or b"{}")
+        except ValueError :
+            payload ={}
+        self ._graphql (payload .get ("operationName",""),payload .get ("variables")or {})
+
+    def log_message (self ,format ,*args ):
+        pass 
+
+
+class MockPlayerokServer (ThreadingHTTPServer ):
+    'Local stand-in of playerok.com and ws.playerok.com.\n    Serves the persisted-query GET and the POST requests of `/graphql` and the `graphql-transport-ws`\n    subscriptions on the same port, the answers come from `benchmarks.fixtures.MockPlayerok`.\n\n    :param state: State of the stand-in Playerok.\n    :type state: `benchmarks.fixtures.MockPlayerok`\n\n    :param latency: Delay before each HTTP answer in seconds, _optional_.\n    :type latency: `float`\n\n    :param jitter: Random addition to the delay in seconds (up to), _optional_.\n    :type jitter: `float`\n\n    :param error_rate: Share of the requests answered with a GraphQL error, _optional_.\n    :type error_rate: `float`\n\n    :param rate_limit_rate: Share of the requests answered with 429 Too Many Requests, _optional_.\n    :type rate_limit_rate: `float`\n\n    :param retry_after: `Retry-After` of the 429 answers in seconds, _optional_.\n    :type retry_after: `float`\n\n    :param ws_deflate: Compress the WebSocket messages if the client offers permessage-deflate, _optional_.\n    :type ws_deflate: `bool`\n\n    :param seed: Seed of the injected errors, _optional_.\n    :type seed: `int` or `None`'
+
+    daemon_threads =True 
+
+    def __init__ (self ,state :MockPlayerok ,latency :float =0 ,jitter :float =0 ,error_rate :float =0 ,
+    rate_limit_rate :float =0 ,retry_after :float =0.1 ,ws_deflate :bool =True ,
+    seed :int |None =None ,host :str ="127.0.0.1",port :int =0 ):
+        super ().__init__ ((host ,port ),_MockRequestHandler )
+        self .state =state 
+        self .latency =latency 
+        self .jitter =jitter 
+        self .error_rate =error_rate 
+        self .rate_limit_rate =rate_limit_rate 
+        self .retry_after =retry_after 
+        self .ws_deflate =ws_deflate 
+
+        self .stats :dict [str ,dict [str ,int ]]={}
+        "Answers by the operation name: ok, errors, rate_limited."
+
+        self ._random =random .Random (seed )
+        self ._stats_lock =Lock ()
+        self ._ws_connections :list [WSConnection ]=[]
+        self ._ws_condition =Condition ()
+
+    @property 
+    def base_url (self )->str :
+        "Base URL of the HTTP requests."
+        return f"http://{self .server_address [0 ]}:{self .server_address [1 ]}"
+
+    @property 
+    def ws_url (self )->str :
+        "WebSocket URL of the subscriptions."
+        return f"ws://{self .server_address [0 ]}:{self .server_address [1 ]}/graphql"
+
+    def _count (self ,operation :str ,key :str ):
+        with self ._stats_lock :
+            stats =self .stats .setdefault (operation ,{"ok":0 ,"errors":0 ,"rate_limited":0 })
+            stats [key ]+=1 
+
+    def _add_ws_connection (self ,connection :WSConnection ):
+        with self ._ws_condition :
+            self ._ws_connections .append (connection )
+
+    def _remove_ws_connection (self ,connection :WSConnection ):
+        with self ._ws_condition :
+            if connection in self ._ws_connections :
+                self ._ws_connections .remove (connection )
+
+    def _notify_subscription (self ):
+        with self ._ws_condition :
+            self ._ws_condition .notify_all ()
+
+    def handle_operation (self ,operation :str ,variables :dict )->tuple [int ,dict |str ,dict ]:
+        'Answers the GraphQL operation with the configured latency and the injected errors.\n\n        :param operation: Operation name.\n        :type operation: `str`\n\n        :param variables: Operation variables.\n        :type variables: `dict`\n\n        :return: HTTP status, body and headers.\n        :rtype: `tuple[int, dict | str, dict]`'
+        if self .latency or self .jitter :
+            time .sleep (self .latency +self ._random .uniform (0 ,self .jitter ))
+
+        roll =self ._random .random ()
+        if roll <self .rate_limit_rate :
+            self ._count (operation ,"rate_limited")
+            return 429 ,"Too Many Requests",{"Retry-After":str (self .retry_after )}
+        if roll <self .rate_limit_rate +self .error_rate :
+            self ._count (operation ,"errors")
+            return 200 ,{"errors":[{"message":"Injected error","extensions":{"code":"INTERNAL_SERVER_ERROR"}}]},{}
+
+        try :
+            body =self .state .resolve (operation ,variables )
+        except Exception as e :
+            logger .debug (f"Mock server failed to answer {operation }: {e }")
+            self ._count (operation ,"errors")
+            return 500 ,"Internal Server Error",{}
+        self ._count (operation ,"errors"if "errors"in body else "ok")
+        if operation =="createChatMessage"and "data"in body :# own messages come back through the subscriptions too
+            self .publish_message (variables ["input"]["chatId"],body ["data"]["createChatMessage"])
+        return 200 ,body ,{}
+
+    def get_subscriptions (self ,operation :str )->list [tuple [WSConnection ,str ,dict ]]:
+        'Returns the active subscriptions to the operation.\n\n        :param operation: Subscription operation name.\n        :type operation: `str`\n\n        :return: Tuples (connection, subscription ID, variables).\n        :rtype: `list[tuple[benchmarks.mock_server.WSConnection, str, dict]]`'
+        with self ._ws_condition :
+            connections =list (self ._ws_connections )
+        return [
+        (connection ,sub_id ,variables )
+        for connection in connections 
+        for sub_id ,(name ,variables )in list (connection .subscriptions .items ())
+        if name ==operation 
+        ]
+
+    def wait_for_subscriptions (self ,operation :str ,count :int =1 ,timeout :float =30 )->bool :
+        'Waits until the clients subscribe to the operation.\n\n        :param operation: Subscription operation name.\n        :type operation: `str`\n\n        :param count: Number of subscriptions, _optional_.\n        :type count: `int`\n\n        :param timeout: Timeout in seconds, _optional_.\n        :type timeout: `float`\n\n        :return: Whether the subscriptions have been made in time.\n        :rtype: `bool`'
+        deadline =time .time ()+timeout 
+        with self ._ws_condition :
+            while len (self .get_subscriptions (operation ))<count :
+                left =deadline -time .time ()
+                if left <=0 :
+                    return False 
+                self ._ws_condition .wait (left )
+        return True 
+
+    def publish (self ,operation :str ,data :dict ,match :callable =None )->int :
+        'Sends the data to the subscribers of the operation.\n\n        :param operation: Subscription operation name.\n        :type operation: `str`\n\n        :param data: Subscription data.\n        :type data: `dict`\n\n        :param match: Function that receives the subscription variables and returns whether to send to it, _optional_.\n        :type match: `callable` or `None`\n\n        :return: Number of the sent messages.\n        :rtype: `int`'
+        sent =0 
+        for connection ,sub_id ,variables in self .get_subscriptions (operation ):
+            if match is None or match (variables ):
+                connection .send_json ({"id":sub_id ,"type":"next","payload":{"data":{operation :data }}})
+                sent +=1 
+        return sent 
+
+    def publish_message (self ,chat_id :str ,message :dict )->int :
+        'Sends the new chat message the way Playerok does: `chatMessageCreated` to the subscribers of the chat\n        and `chatUpdated` to the subscribers of the account chats.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param message: Message data.\n        :type message: `dict`\n\n        :return: Number of the sent messages.\n        :rtype: `int`'
+        sent =self .publish ("chatMessageCreated",message ,lambda v :(v .get ("filter")or {}).get ("chatId")==chat_id )
+        chat =self .state .chats .get (chat_id )
+        if chat :
+            sent +=self .publish ("chatUpdated",chat )
+        return sent 
+
+    def broadcast (self ,data :dict )->int :
+        'Sends the protocol message (for example, `ping`) to every WebSocket connection.\n\n        :param data: Message.\n        :type data: `dict`\n\n        :return: Number of the sent messages.\n        :rtype: `int`'
+        with self ._ws_condition :
+            connections =list (self ._ws_connections )
+        for connection in connections :
+            connection .send_json (data )
+        return len (connections )
+
+    def start (self )->"MockPlayerokServer":
+        'Starts serving in a background thread.\n\n        :return: The server itself.\n        :rtype: `benchmarks.mock_server.MockPlayerokServer`'
+        Thread (target =self .serve_forever ,daemon =True ).start ()
+        return self 
+
+    def stop (self ):
+        'Stops serving and closes the WebSocket connections.'
+        self .shutdown ()
+        with self ._ws_condition :
+            connections =list (self ._ws_connections )
+        for connection in connections :
+            connection .close ()
+        self .server_close ()
@@ -0,0 +1,180 @@
+import json 
+import time 
+import random 
+import threading 
+import tracemalloc 
+from threading import Thread ,Event 
+
+from playerokapi .listener .events import EventTypes 
+
+from .fixtures import MockPlayerok 
+
+
+REPLAYED_TYPES =("next","ping")# the rest (connection_ack, pong, complete) are answers to the listener itself
+DEAL_MESSAGE_EVENTS ={
+"{{ITEM_PAID}}":(EventTypes .NEW_DEAL ,EventTypes .ITEM_PAID )
+}
+CHECKED_EVENT_TYPES =(EventTypes .NEW_MESSAGE ,EventTypes .NEW_DEAL ,EventTypes .ITEM_PAID )
+THREADS_SAMPLE_INTERVAL =0.005 
+TOP_ALLOCATIONS =10 
+
+
+def load_capture (path :str )->list [dict ]:
+    'Loads the WebSocket messages captured by `EventListener.start_ws_capture`\n    (JSON lines `{"t": receive time, "chat_id": ..., "frame": message text}`).\n\n    :param path: Path to the capture file.\n    :type path: `str`\n\n    :return: Captured messages sorted by the receive time.\n    :rtype: `list[dict]`'
+    with open (path ,"r",encoding ="utf-8")as f :
+        records =[json .loads (line )for line in f if line .strip ()]
+    return sorted (records ,key =lambda record :record ["t"])
+
+
+def save_capture (records :list [dict ],path :str ):
+    'Saves the captured WebSocket messages in the format of `load_capture`.\n\n    :param records: Captured messages.\n    :type records: `list[dict]`\n\n    :param path: Path to the capture file.\n    :type path: `str`'
+    with open (path ,"w",encoding ="utf-8")as f :
+        for record in records :
+            f .write (json .dumps (record ,ensure_ascii =False )+"\n")
+
+
+def generate_capture (messages :int =5000 ,chats :int =24 ,rate :float =100 ,deals_share :float =0.02 ,
+duplicates_share :float =0 ,seed :int |None =None )->list [dict ]:
+    'Generates the capture of the chat traffic the way Playerok sends it: each message comes\n    with `chatMessageCreated` to the chat subscription and with `chatUpdated` to the account subscription.\n    The messages arrive as a Poisson flow with the given average rate.\n\n    :param messages: Number of the chat messages, _optional_.\n    :type messages: `int`\n\n    :param chats: Number of the chats, _optional_.\n    :type chats: `int`\n\n    :param rate: Average number of the messages per second, _optional_.\n    :type rate: `float`\n\n    :param deals_share: Share of the `{{ITEM_PAID}}` messages, _optional_.\n    :type deals_share: `float`\n\n    :param duplicates_share: Share of the `chatMessageCreated` messages delivered twice, _optional_.\n    :type duplicates_share: `float`\n\n    :return: Captured messages.\n    :rtype: `list[dict]`'
+    rnd =random .Random (seed )
+    state =MockPlayerok (chats =chats ,items =50 )
+    chat_ids =list (state .chats )
+
+    records =[]
+    t =time .time ()
+    for i in range (messages ):
+        chat_id =rnd .choice (chat_ids )
+        if rnd .random ()<deals_share :
+            deal =state .new_deal (chat_id ,state .items [i %len (state .items )])
+            account_user =state .chats [chat_id ]["participants"][0 ]
+            message =state .new_message (chat_id ,"{{ITEM_PAID}}",user =account_user ,deal =deal )
+        else :
+            message =state .new_message (chat_id ,f"Replay message #{i }")
+
+        created ={"t":t ,"chat_id":chat_id ,"frame":json .dumps ({
+        "id":f"capture-{chat_id }",
+        "type":"next",
+        "payload":{"data":{"chatMessageCreated":message }}
+        })}
+        records .append (created )
+        records .append ({"t":t ,"chat_id":None ,"frame":json .dumps ({
+        "id":"capture-chats",
+        "type":"next",
+        "payload":{"data":{"chatUpdated":{**state .chats [chat_id ],"lastMessage":message }}}
+        })})
+        if rnd .random ()<duplicates_share :
+            records .append (dict (created ))
+        t +=rnd .expovariate (rate )
+    return records 
+
+
+def prepare_capture (records :list [dict ])->tuple [list [dict ],int ]:
+    'Parses the captured messages for the replay.\n\n    :param records: Captured messages.\n    :type records: `list[dict]`\n\n    :return: Messages to replay (`offset` from the first message in seconds, `type`, `operation`, `data`, `chat_id`)\n        and the number of the skipped messages.\n    :rtype: `tuple[list[dict], int]`'
+    prepared =[]
+    skipped =0 
+    first_t =records [0 ]["t"]if records else 0 
+    for record in records :
+        try :
+            frame =json .loads (record ["frame"])
+        except (json .JSONDecodeError ,TypeError ):
+            skipped +=1 
+            continue 
+        if frame .get ("type")not in REPLAYED_TYPES :
+            skipped +=1 
+            continue 
+
+        operation ,data =None ,None 
+        if frame ["type"]=="next":
+            payload_data =(frame .get ("payload")or {}).get ("data")or {}
+            operation =next (iter (payload_data ),None )
+            if operation is None :
+                skipped +=1 
+                continue 
+            data =payload_data [operation ]
+        prepared .append ({
+        "offset":record ["t"]-first_t ,
+        "type":frame ["type"],
+        "operation":operation ,
+        "data":data ,
+        "chat_id":record .get ("chat_id")
+        })
+    return prepared ,skipped 
+
+
+def seed_state (prepared :list [dict ])->MockPlayerok :
+    'Creates the state of the stand-in Playerok with the chats of the capture.\n    The chats are added without messages: the messages are added while they are replayed,\n    so the chat history requests of the listener see what Playerok had at that moment.\n\n    :param prepared: Messages to replay (see `prepare_capture`).\n    :type prepared: `list[dict]`\n\n    :return: State of the stand-in Playerok.\n    :rtype: `benchmarks.fixtures.MockPlayerok`'
+    state =MockPlayerok (chats =0 )
+    for item in prepared :
+        if item ["operation"]=="chatUpdated"and item ["data"]["id"]not in state .chats :
+            state .put_chat ({**item ["data"],"lastMessage":None ,"deals":[]})
+        elif item ["operation"]=="chatMessageCreated"and item ["chat_id"]and item ["chat_id"]not in state .chats :
+            state .put_chat (state .new_chat (item ["chat_id"],item ["data"].get ("user")))
+    return state 
+
+
+def get_expected_events (message :dict )->list [tuple [EventTypes ,str ]]:
+    'Returns the events the listener must produce for the chat message exactly once.\n\n    :param message: Message data.\n    :type message: `dict`\n\n    :return: Pairs (event type, deal ID for the deal events or message ID).\n    :rtype: `list[tuple[playerokapi.listener.events.EventTypes, str]]`'
+    deal =message .get ("deal")
+    if message .get ("text")in DEAL_MESSAGE_EVENTS and deal :
+        return [(event_type ,deal ["id"])for event_type in DEAL_MESSAGE_EVENTS [message ["text"]]]
+    return [(EventTypes .NEW_MESSAGE ,message ["id"])]
+
+
+def get_event_key (event )->tuple [EventTypes ,str |None ]:
+    'Returns the key of the event to match it with the expected events (see `get_expected_events`).\n\n    :param event: Listener event.\n\n    :return: Pair (event type, deal ID for the deal events, message ID or chat ID).\n    :rtype: `tuple[playerokapi.listener.events.EventTypes, str | None]`'
+    if getattr (event ,"deal",None ):
+        return event .type ,event .deal .id 
+    if getattr (event ,"message",None ):
+        return event .type ,event .message .id 
+    return event .type ,event .chat .id if event .chat else None 
+
+
+class ThreadsSampler :
+    'Samples the number of the process threads in the background.\n\n    :param interval: Interval between the samples in seconds, _optional_.\n    :type interval: `float`'
+
+    def __init__ (self ,interval :float =THREADS_SAMPLE_INTERVAL ):
+        self .interval =interval 
+
+        self .before :int =0 
+        "Number of the threads when the sampling was started."
+        self .peak :int =0 
+        "Maximum number of the threads."
+
+        self ._stop =Event ()
+        self ._thread :Thread |None =None 
+
+    def _run (self ):
+        while not self ._stop .wait (self .interval ):
+            self .peak =max (self .peak ,threading .active_count ()-1 )# without the sampler itself
+
+    def start (self )->"ThreadsSampler":
+        'Starts the sampling.\n\n        :return: The sampler itself.\n        :rtype: `benchmarks.replay.ThreadsSampler`'
+        self .before =self .peak =threading .active_count ()
+        self ._thread =Thread (target =self ._run ,daemon =True )
+        self ._thread .start ()
+        return self 
+
+    def stop (self )->dict [str ,int ]:
+        'Stops the sampling.\n\n        :return: Number of the threads: before, peak and after the sampling.\n        :rtype: `dict[str, int]`'
+        self ._stop .set ()
+        if self ._thread :
+            self ._thread .join ()
+        return {"before":self .before ,"peak":self .peak ,"after":threading .active_count ()}
+
+
+def summarize_allocations (before :tracemalloc .Snapshot ,after :tracemalloc .Snapshot ,
+limit :int =TOP_ALLOCATIONS )->dict :
+    'Compares the tracemalloc snapshots taken before and after the replay.\n\n    :param before: Snapshot taken before the replay.\n    :type before: `tracemalloc.Snapshot`\n\n    :param after: Snapshot taken after the replay.\n    :type after: `tracemalloc.Snapshot`\n\n    :param limit: Number of the top allocation lines of `playerokapi`, _optional_.\n    :type limit: `int`\n\n    :return: Peak and retained memory of the replay and the top allocation lines by the retained size.\n    :rtype: `dict`'
+    _ ,peak =tracemalloc .get_traced_memory ()
+    stats =after .compare_to (before ,"lineno")
+    api_filter =[tracemalloc .Filter (True ,"*playerokapi*")]
+    api_stats =after .filter_traces (api_filter ).compare_to (before .filter_traces (api_filter ),"lineno")
+    return {
+    "peak_bytes":peak ,
+    "retained_bytes":sum (stat .size_diff for stat in stats ),
+    "retained_blocks":sum (stat .count_diff for stat in stats ),
+    "top_playerokapi":[
+    {"line":str (stat .traceback [0 ]),"size_diff":stat .size_diff ,"count_diff":stat .count_diff }
+    for stat in api_stats [:limit ]
+    ]
+    }
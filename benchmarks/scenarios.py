@@ -0,0 +1,396 @@
+import os 
+import time 
+import shutil 
+import asyncio 
+import tempfile 
+import tracemalloc 
+from threading import Thread ,Event ,Lock 
+from contextlib import contextmanager 
+
+from playerokapi import account as account_module 
+from playerokapi .account import Account 
+from playerokapi .listener .events import EventTypes 
+from playerokapi .listener .listener import EventListener ,WS_MAX_CHAT_SUBSCRIPTIONS 
+
+from .fixtures import MockPlayerok ,generate_orders 
+from .mock_server import MockPlayerokServer 
+from .replay import (
+CHECKED_EVENT_TYPES ,
+ThreadsSampler ,
+load_capture ,
+save_capture ,
+generate_capture ,
+prepare_capture ,
+seed_state ,
+get_expected_events ,
+get_event_key ,
+summarize_allocations 
+)
+
+
+BENCH_COOKIES ="token=benchmark"
+SUBSCRIBE_TIMEOUT =30 
+REPLAY_SETTLE_TIME =1 # late duplicates are waited for after the last expected event
+
+
+def _summary (values :list [float ])->dict [str ,float |None ]:
+    if not values :
+        return {"min":None ,"p50":None ,"p95":None ,"max":None ,"mean":None }
+    values =sorted (values )
+    return {
+    "min":round (values [0 ],6 ),
+    "p50":round (values [int (len (values )*0.5 )],6 ),
+    "p95":round (values [min (int (len (values )*0.95 ),len (values )-1 )],6 ),
+    "max":round (values [-1 ],6 ),
+    "mean":round (sum (values )/len (values ),6 )
+    }
+
+
+@contextmanager 
+def _workdir ():
+    cwd =os .getcwd ()
+    path =tempfile .mkdtemp (prefix ="playerok-bench-")
+    os .chdir (path )# settings and data files are relative to the working directory
+    try :
+        yield path 
+    finally :
+        os .chdir (cwd )
+        shutil .rmtree (path ,ignore_errors =True )
+
+
+@contextmanager 
+def _mock_playerok (state :MockPlayerok ,server_options :dict |None ):
+    server =MockPlayerokServer (state ,**(server_options or {})).start ()
+    urls =account_module .BASE_URL ,account_module .WS_URL 
+    account_module .BASE_URL ,account_module .WS_URL =server .base_url ,server .ws_url 
+    try :
+        yield server 
+    finally :
+        account_module .BASE_URL ,account_module .WS_URL =urls 
+        server .stop ()
+
+
+def _configure_bot ():
+    from settings import Settings as sett 
+
+    config =sett .get ("config")
+    config ["playerok"]["api"]["cookies"]=BENCH_COOKIES 
+    config ["playerok"]["tg_logging"]["enabled"]=False # there is no Telegram bot in the benchmarks
+    config ["playerok"]["auto_restore_items"]["sold"]=False 
+    sett .set ("config",config )
+
+
+def bench_get_stats (orders :int =100000 ,repeat :int =5 ,seed :int |None =None )->dict :
+    'Measures `utils.get_stats` on the cached orders.\n\n    :param orders: Number of the cached orders, _optional_.\n    :type orders: `int`\n\n    :param repeat: Number of the measured calls, _optional_.\n    :type repeat: `int`\n\n    :return: Scenario results.\n    :rtype: `dict`'
+    from data import Data as data 
+    from utils import get_stats 
+
+    with _workdir ():
+        data .get ("cached_orders")# creates the data folder
+        data .set ("cached_orders",generate_orders (orders ,seed =seed ))
+        file_size =os .path .getsize ("bot_data/cached_orders.json")
+
+        durations =[]
+        for _ in range (repeat ):
+            started =time .perf_counter ()
+            get_stats ()
+            durations .append (time .perf_counter ()-started )
+
+    return {
+    "orders":orders ,
+    "file_bytes":file_size ,
+    "seconds":_summary (durations )
+    }
+
+
+def bench_get_my_items (items :int =5000 ,recorded :dict [str ,dict ]|None =None ,
+server_options :dict |None =None )->dict :
+    'Measures `PlayerokBot.get_my_items` on the account items (the pauses between the pages are included).\n\n    :param items: Number of the account items, _optional_.\n    :type items: `int`\n\n    :param recorded: Recorded responses by the operation name, _optional_.\n    :type recorded: `dict[str, dict]` or `None`\n\n    :param server_options: Options of `benchmarks.mock_server.MockPlayerokServer`, _optional_.\n    :type server_options: `dict`\n\n    :return: Scenario results.\n    :rtype: `dict`'
+    from plbot .playerokbot import PlayerokBot 
+
+    state =MockPlayerok (items =items ,recorded =recorded )
+    with _workdir (),_mock_playerok (state ,server_options )as server :
+        _configure_bot ()
+        bot =PlayerokBot ()
+
+        started =time .perf_counter ()
+        my_items =bot .get_my_items ()
+        elapsed =time .perf_counter ()-started 
+
+    return {
+    "items":len (my_items ),
+    "pages":server .stats .get ("items",{}).get ("ok",0 ),
+    "seconds":round (elapsed ,3 ),
+    "items_per_second":round (len (my_items )/elapsed ,1 ),
+    "requests":server .stats 
+    }
+
+
+def bench_listener (frames :int =5000 ,chats :int =24 ,timeout :float =120 ,recorded :dict [str ,dict ]|None =None ,
+server_options :dict |None =None )->dict :
+    'Measures how fast `EventListener` turns the WebSocket messages into events.\n\n    :param frames: Number of the sent chat messages, _optional_.\n    :type frames: `int`\n\n    :param chats: Number of the account chats, _optional_.\n    :type chats: `int`\n\n    :param timeout: Maximum time to wait for the events in seconds, _optional_.\n    :type timeout: `float`\n\n    :param recorded: Recorded responses by the operation name, _optional_.\n    :type recorded: `dict[str, dict]` or `None`\n\n    :param server_options: Options of `benchmarks.mock_server.MockPlayerokServer`, _optional_.\n    :type server_options: `dict`\n\n    :return: Scenario results.\n    :rtype: `dict`'
+    state =MockPlayerok (chats =chats ,recorded =recorded )
+    with _workdir (),_mock_playerok (state ,server_options )as server :
+        account =Account (cookies =BENCH_COOKIES ).get ()
+        listener =EventListener (account )
+
+        sent_at :dict [str ,float ]={}
+        received_at :dict [str ,float ]={}
+        done =Event ()
+
+        def consume ():
+            for event in listener .listen (get_new_review_events =False ):
+                if event .type is EventTypes .NEW_MESSAGE and event .message .id in sent_at :
+                    received_at [event .message .id ]=time .perf_counter ()
+                    if len (received_at )>=frames :
+                        done .set ()
+                        return 
+
+        Thread (target =consume ,daemon =True ).start ()
+        if not server .wait_for_subscriptions ("chatMessageCreated",min (chats ,WS_MAX_CHAT_SUBSCRIPTIONS ),SUBSCRIBE_TIMEOUT ):
+            raise RuntimeError ("The listener has not subscribed to the chats")
+
+        chat_ids =list (state .chats )
+        ws_messages =0 
+        started =time .perf_counter ()
+        for i in range (frames ):
+            chat_id =chat_ids [i %len (chat_ids )]
+            message =state .add_message (chat_id ,f"Benchmark message #{i }")
+            sent_at [message ["id"]]=time .perf_counter ()
+            ws_messages +=server .publish_message (chat_id ,message )
+        sent =time .perf_counter ()-started 
+
+        done .wait (timeout )
+        received =dict (received_at )
+        elapsed =(max (received .values ())if received else time .perf_counter ())-started 
+
+    return {
+    "frames":frames ,
+    "ws_messages":ws_messages ,
+    "events":len (received ),
+    "send_seconds":round (sent ,3 ),
+    "seconds":round (elapsed ,3 ),
+    "frames_per_second":round (len (received )/elapsed ,1 ),
+    "latency_seconds":_summary ([received [msg_id ]-sent_at [msg_id ]for msg_id in received ]),
+    "ws_stats":listener .ws_stats 
+    }
+
+
+def bench_deals (deals :int =200 ,chats :int =24 ,timeout :float =300 ,recorded :dict [str ,dict ]|None =None ,
+server_options :dict |None =None )->dict :
+    'Measures the deals handled per minute by `PlayerokBot`: the `{{ITEM_PAID}}` messages come through\n    the WebSocket to `EventListener`, its events go to the bot handlers, the bot messages are sent through\n    the outbox. The deal is done when its `NEW_DEAL` handlers have finished and the outbox has been flushed.\n\n    :param deals: Number of the deals, _optional_.\n    :type deals: `int`\n\n    :param chats: Number of the account chats (the deals are spread over them), _optional_.\n    :type chats: `int`\n\n    :param timeout: Maximum time to wait for the deals in seconds, _optional_.\n    :type timeout: `float`\n\n    :param recorded: Recorded responses by the operation name, _optional_.\n    :type recorded: `dict[str, dict]` or `None`\n\n    :param server_options: Options of `benchmarks.mock_server.MockPlayerokServer`, _optional_.\n    :type server_options: `dict`\n\n    :return: Scenario results.\n    :rtype: `dict`'
+    from core .handlers import call_playerok_event 
+    from plbot .playerokbot import PlayerokBot 
+
+    state =MockPlayerok (chats =chats ,items =50 ,recorded =recorded )
+    with _workdir (),_mock_playerok (state ,server_options )as server :
+        _configure_bot ()
+        bot =PlayerokBot ()
+        PlayerokBot .add_event_handlers ()
+        bot .listener =listener =EventListener (bot .account )
+
+        created_at :dict [str ,float ]={}
+        handled_at :dict [str ,float ]={}
+        done =Event ()
+
+        async def consume ():
+            for event in listener .listen (get_new_review_events =False ):
+                await call_playerok_event (event .type ,[bot ,event ])
+                if event .type is EventTypes .NEW_DEAL and event .deal .id in created_at :
+                    handled_at [event .deal .id ]=time .perf_counter ()
+                    if len (handled_at )>=deals :
+                        done .set ()
+                        return 
+
+        Thread (target =asyncio .run ,args =(consume (),),daemon =True ).start ()
+        if not server .wait_for_subscriptions ("chatMessageCreated",min (chats ,WS_MAX_CHAT_SUBSCRIPTIONS ),SUBSCRIBE_TIMEOUT ):
+            raise RuntimeError ("The listener has not subscribed to the chats")
+
+        chat_ids =list (state .chats )
+        started =time .perf_counter ()
+        for i in range (deals ):
+            chat_id =chat_ids [i %len (chat_ids )]
+            deal ,message =state .create_deal (chat_id )
+            created_at [deal ["id"]]=time .perf_counter ()
+            server .publish_message (chat_id ,message )
+
+        done .wait (timeout )
+        for chat_id in chat_ids :
+            bot .outbox .flush (chat_id )
+        elapsed =time .perf_counter ()-started 
+        handled =dict (handled_at )
+
+    return {
+    "deals":deals ,
+    "handled":len (handled ),
+    "seconds":round (elapsed ,3 ),
+    "deals_per_minute":round (len (handled )/elapsed *60 ,1 ),
+    "latency_seconds":_summary ([handled [deal_id ]-created_at [deal_id ]for deal_id in handled ]),
+    "outbox":dict (bot .outbox .stats ),
+    "requests":server .stats 
+    }
+
+
+def _replay_at (prepared :list [dict ],rate :float ,timeout :float ,trace_allocations :bool ,
+server_options :dict |None )->dict :
+    from core .handlers import call_playerok_event ,register_playerok_event_handlers ,remove_playerok_event_handlers 
+
+    state =seed_state (prepared )
+    with _workdir (),_mock_playerok (state ,server_options )as server :
+        account =Account (cookies =BENCH_COOKIES ).get ()
+        listener =EventListener (account )
+
+        sent_at :dict [tuple ,float ]={}
+        handled_at :dict [tuple ,list [float ]]={}
+        handled_lock =Lock ()
+
+        async def on_event (bot ,event ):
+            key =get_event_key (event )
+            with handled_lock :
+                handled_at .setdefault (key ,[]).append (time .perf_counter ())
+
+        handlers ={event_type :[on_event ]for event_type in CHECKED_EVENT_TYPES }
+        register_playerok_event_handlers (handlers )
+
+        async def consume ():
+            for event in listener .listen (get_new_review_events =False ):
+                await call_playerok_event (event .type ,[None ,event ])
+
+        try :
+            Thread (target =asyncio .run ,args =(consume (),),daemon =True ).start ()
+            if not server .wait_for_subscriptions ("chatMessageCreated",min (len (state .chats ),24 ,WS_MAX_CHAT_SUBSCRIPTIONS ),SUBSCRIBE_TIMEOUT ):# the listener starts with the first 24 chats
+                raise RuntimeError ("The listener has not subscribed to the chats")
+
+            if trace_allocations :
+                tracemalloc .start ()
+                allocations_before =tracemalloc .take_snapshot ()
+            threads =ThreadsSampler ().start ()
+            cpu_started =time .process_time ()
+
+            pushed_ids =set ()
+            ws_messages =unrouted =0 
+            started =time .perf_counter ()
+            for item in prepared :
+                delay =started +item ["offset"]/rate -time .perf_counter ()
+                if delay >0 :
+                    time .sleep (delay )
+
+                if item ["type"]=="ping":
+                    ws_messages +=server .broadcast ({"type":"ping"})
+                    continue 
+
+                operation ,data =item ["operation"],item ["data"]
+                message ,chat_id ,is_delivered =None ,None ,False 
+                if operation =="chatMessageCreated":
+                    message ,chat_id =data ,item ["chat_id"]
+                    sent =server .publish (operation ,data ,lambda v :(v .get ("filter")or {}).get ("chatId")==chat_id )
+                    is_delivered =sent >0 
+                elif operation =="chatUpdated":
+                    message ,chat_id =data .get ("lastMessage"),data ["id"]
+                    is_delivered =not listener ._is_chat_subscribed (chat_id )# the listener skips the updates of the subscribed chats
+                    sent =server .publish (operation ,data )
+                    is_delivered =is_delivered and sent >0 
+                else :
+                    sent =server .publish (operation ,data )
+                ws_messages +=sent 
+                if not sent :
+                    unrouted +=1 
+
+                if message and message ["id"]not in pushed_ids :
+                    pushed_ids .add (message ["id"])
+                    state .push_message (chat_id ,message )# the chat history requests see the message from now on
+                if message and is_delivered :
+                    sent_time =time .perf_counter ()
+                    for key in get_expected_events (message ):
+                        sent_at .setdefault (key ,sent_time )
+            send_seconds =time .perf_counter ()-started 
+
+            deadline =time .perf_counter ()+timeout 
+            while time .perf_counter ()<deadline :
+                with handled_lock :
+                    if all (key in handled_at for key in sent_at ):
+                        break 
+                time .sleep (0.05 )
+            time .sleep (REPLAY_SETTLE_TIME )
+            elapsed =time .perf_counter ()-started 
+
+            cpu_seconds =time .process_time ()-cpu_started 
+            threads_stats =threads .stop ()
+            allocations =None 
+            if trace_allocations :
+                allocations =summarize_allocations (allocations_before ,tracemalloc .take_snapshot ())
+        finally :
+            if tracemalloc .is_tracing ():
+                tracemalloc .stop ()
+            remove_playerok_event_handlers (handlers )
+
+        with handled_lock :
+            handled ={key :list (times )for key ,times in handled_at .items ()}
+
+    latencies :dict [str ,list [float ]]={}
+    for key ,send_time in sent_at .items ():
+        if key in handled :
+            latencies .setdefault (key [0 ].name ,[]).append (handled [key ][0 ]-send_time )
+    return {
+    "rate":rate ,
+    "ws_messages":ws_messages ,
+    "unrouted_messages":unrouted ,
+    "send_seconds":round (send_seconds ,3 ),
+    "messages_per_second":round (len (prepared )/send_seconds ,1 )if send_seconds else None ,
+    "expected_events":len (sent_at ),
+    "events":sum (len (times )for times in handled .values ()),
+    "lost_events":sum (1 for key in sent_at if key not in handled ),
+    "duplicated_events":sum (len (times )-1 for times in handled .values ()),
+    "unexpected_events":sum (1 for key in handled if key not in sent_at ),
+    "seconds":round (elapsed ,3 ),
+    "latency_seconds":{name :_summary (values )for name ,values in latencies .items ()},
+    "cpu_seconds":round (cpu_seconds ,3 ),
+    "cpu_percent":round (cpu_seconds /elapsed *100 ,1 ),
+    "threads":threads_stats ,
+    "allocations":allocations ,
+    "ws_stats":listener .ws_stats 
+    }
+
+
+def bench_replay (capture :str |None =None ,rates :tuple [float ,...]=(1 ,10 ,100 ),messages :int =5000 ,chats :int =24 ,
+capture_rate :float =100 ,deals_share :float =0.02 ,duplicates_share :float =0 ,
+timeout :float =120 ,trace_allocations :bool =True ,save_capture_path :str |None =None ,
+seed :int |None =None ,server_options :dict |None =None )->dict :
+    'Replays the captured WebSocket traffic (see `EventListener.start_ws_capture`) into `EventListener`\n    at the given speeds and measures the latency from the message to the event handler, the CPU time,\n    the allocations and the threads. Each message must produce its events exactly once: the lost\n    and the duplicated events make the scenario fail. The mock server runs in the same process,\n    so the CPU time and the threads include its share.\n\n    :param capture: Path to the capture file (a synthetic capture is generated by default), _optional_.\n    :type capture: `str` or `None`\n\n    :param rates: Replay speeds relative to the capture, _optional_.\n    :type rates: `tuple[float, ...]`\n\n    :param messages: Number of the chat messages of the synthetic capture, _optional_.\n    :type messages: `int`\n\n    :param chats: Number of the chats of the synthetic capture, _optional_.\n    :type chats: `int`\n\n    :param capture_rate: Messages per second of the synthetic capture, _optional_.\n    :type capture_rate: `float`\n\n    :param deals_share: Share of the `{{ITEM_PAID}}` messages of the synthetic capture, _optional_.\n    :type deals_share: `float`\n\n    :param duplicates_share: Share of the messages of the synthetic capture delivered twice, _optional_.\n    :type duplicates_share: `float`\n\n    :param timeout: Maximum wait for the events after the replay of each speed in seconds, _optional_.\n    :type timeout: `float`\n\n    :param trace_allocations: Trace the allocations with tracemalloc (slows the replay down), _optional_.\n    :type trace_allocations: `bool`\n\n    :param save_capture_path: Path to save the replayed capture to, _optional_.\n    :type save_capture_path: `str` or `None`\n\n    :param server_options: Options of `benchmarks.mock_server.MockPlayerokServer`, _optional_.\n    :type server_options: `dict`\n\n    :return: Scenario results.\n    :rtype: `dict`'
+    if capture :
+        records =load_capture (capture )
+    else :
+        records =generate_capture (messages ,chats ,capture_rate ,deals_share ,duplicates_share ,seed )
+    if save_capture_path :
+        save_capture (records ,save_capture_path )
+    prepared ,skipped =prepare_capture (records )
+
+    results ={}
+    for rate in rates :
+        results [f"{rate :g}x"]=_replay_at (prepared ,rate ,timeout ,trace_allocations ,server_options )
+
+    result ={
+    "capture":capture or "synthetic",
+    "records":len (records ),
+    "skipped_records":skipped ,
+    "lost_events":sum (rate_result ["lost_events"]for rate_result in results .values ()),
+    "duplicated_events":sum (rate_result ["duplicated_events"]for rate_result in results .values ()),
+    "rates":results 
+    }
+    problems =[
+    f"{name }: {rate_result ['lost_events']} lost and {rate_result ['duplicated_events']} duplicated events"
+    for name ,rate_result in results .items ()
+    if rate_result ["lost_events"]or rate_result ["duplicated_events"]
+    ]
+    if problems :
+        result ["error"]="; ".join (problems )
+    return result 
+
+
+SCENARIOS ={
+"get_stats":bench_get_stats ,
+"get_my_items":bench_get_my_items ,
+"listener":bench_listener ,
+"deals":bench_deals ,
+"replay":bench_replay 
+}
@@ -1,5 +1,7 @@
 import os 
+import re 
 import sys 
+import atexit 
 import asyncio 
 import traceback 
 from colorama import Fore ,init as init_colorama 
@@ -20,11 +22,18 @@ set_modules ,
 connect_modules 
 )
 from core .handlers import call_bot_event 
-from updater import check_for_updates 
+from core .startup import Startup 
+from core .snapshot import set_snapshot_path 
+from core .scheduler import init_scheduler 
+from core .metrics import init_metrics 
+from core .profiling import init_profiling 
+from core .supervisor import Supervisor ,WorkerClient ,is_in_shard 
+from updater import check_for_updates ,install_pending_update 
 from utils import configure_config 
 
 
 logger =getLogger ("universal")
+ACCOUNT_NAME_MAX_SIZE =10 
 
 try :
     main_loop =asyncio .get_running_loop ()
@@ -52,23 +61,121 @@ async def clear_logs_task ():
         await asyncio .sleep (30 )
 
 
+async def start_modules ():
+    modules =await asyncio .to_thread (load_modules )
+    set_modules (modules )
+    await connect_modules (modules )
+
+
 async def start_telegram_bot (from_tg =False ):
     from tgbot .telegrambot import TelegramBot 
     run_async_in_thread (TelegramBot ().run_bot ,(from_tg ,))
 
 
+def init_playerok_bot ():
+    from plbot .playerokbot import PlayerokBot 
+    PlayerokBot ()
+
+
 async def start_playerok_bot ():
+    from plbot .playerokbot import get_playerok_bot 
+    await get_playerok_bot ().run_bot ()
+
+
+async def start_playerok_accounts (worker_index =None ,workers_count =0 ):
+    from settings import Settings as sett 
     from plbot .playerokbot import PlayerokBot 
-    await PlayerokBot ().run_bot ()
+
+    for i ,namespace in enumerate (sett .get ("accounts")or []):
+        if not is_in_shard (i ,worker_index ,workers_count ):
+            continue 
+        if not re .fullmatch (r"[\w-]+",str (namespace )):
+            logger .error (f"{Fore .LIGHTRED_EX }Invalid account name \"{namespace }\", only letters, digits, _ and - are allowed")
+            continue 
+        if len (str (namespace ).encode ())>ACCOUNT_NAME_MAX_SIZE :# it is a part of the Telegram buttons data
+            logger .error (f"{Fore .LIGHTRED_EX }Account name \"{namespace }\" is too long, the maximum is {ACCOUNT_NAME_MAX_SIZE } characters")
+            continue 
+        try :
+            plbot =await asyncio .to_thread (PlayerokBot ,namespace )
+            await plbot .run_bot ()
+        except Exception as e :
+            logger .error (
+            f"{Fore .LIGHTRED_EX }Failed to start the bot of account \"{namespace }\" "
+            f"(check bot_settings/accounts/{namespace }/config.json): {Fore .WHITE }{e }"
+            )
+
+
+def start_supervisor (workers_count ):
+    supervisor =Supervisor (workers_count )
+    supervisor .start ()
+    atexit .register (supervisor .stop )
+
+
+def get_worker_stats ()->dict :
+    from plbot .playerokbot import get_playerok_bots 
+    return {
+    "accounts":[
+    {
+    "namespace":plbot .namespace ,
+    "username":plbot .account .username ,
+    "new_deals":dict (plbot .listener .new_deals_stats )if plbot .listener else {},
+    "outbox":dict (plbot .outbox .stats ),
+    "reference_cache":dict (plbot .account .reference_cache .stats )
+    }
+    for plbot in get_playerok_bots ()
+    ]
+    }
+
+
+def call_worker_account (namespace :str ,method :str ,args :tuple ,kwargs :dict ):
+    from plbot .playerokbot import get_playerok_bot 
+    target =get_playerok_bot (namespace )
+    if target is None :
+        raise Exception (f"Account \"{namespace }\" is not running in this worker process")
+    for name in method .split ("."):
+        target =getattr (target ,name )
+    return target (*args ,**kwargs )
+
+
+def get_int_arg (name :str ,default :int |None =None )->int |None :
+    if name in sys .argv :
+        try :return int (sys .argv [sys .argv .index (name )+1 ])
+        except (IndexError ,ValueError ):pass 
+    return default 
+
+
+def run_worker (worker_index :int ,workers_count :int ):
+    patch_requests ()
+    setup_logger (f"logs/worker{worker_index }.log")
+    init_metrics (worker_index +1 )# each worker serves its metrics on its own port
+    init_profiling ()
+    set_snapshot_path (f"bot_data/snapshot.worker{worker_index }.pkl")
+    init_scheduler (f"bot_data/scheduler.worker{worker_index }.json")
+    WorkerClient (worker_index ,get_worker_stats ,call_worker_account ).start ()
+
+    startup =Startup ()
+    startup .add_step ("modules",start_modules )
+    startup .add_step ("playerok_accounts",start_playerok_accounts ,[worker_index ,workers_count ],requires =["modules"])
+
+    main_loop .run_until_complete (startup .run ())
+    main_loop .run_forever ()
 
 
 if __name__ =="__main__":
+    worker_index =get_int_arg ("--worker")
+    workers_count =get_int_arg ("--workers",0 )
+    if worker_index is not None :
+        run_worker (worker_index ,workers_count )
+        sys .exit ()
+
     try :
         from_tg ="--from_tg"in sys .argv 
 
         install_requirements ("requirements.txt")# installing missing dependencies, if any
         patch_requests ()
         setup_logger ()
+        init_metrics ()
+        init_profiling ()
 
         set_title (f"Playerok Universal v{VERSION } by @alleexxeeyy")
         print (
@@ -82,19 +189,23 @@ if __name__ =="__main__":
         f"\n\n\n"
         )
 
-        check_for_updates ()
-        configure_config ()
-
-        modules =load_modules ()
-        set_modules (modules )
-        asyncio .run (connect_modules (modules ))
-
-        main_loop .run_until_complete (start_telegram_bot (from_tg ))
-        main_loop .run_until_complete (start_playerok_bot ())
+        startup =Startup ()
+        startup .add_step ("config",configure_config )# may ask for the settings on the console, so nothing else runs meanwhile
+        startup .add_step ("updates",check_for_updates ,requires =["config"],background =True )
+        startup .add_step ("modules",start_modules ,requires =["config"])
+        startup .add_step ("telegram_bot",start_telegram_bot ,[from_tg ],requires =["config","modules"])
+        startup .add_step ("playerok_account",init_playerok_bot ,requires =["config"])
+        startup .add_step ("playerok_bot",start_playerok_bot ,requires =["playerok_account","telegram_bot","modules"])
+        startup .add_step ("playerok_accounts",start_playerok_accounts ,[None ,workers_count ],requires =["playerok_bot"])
+        if workers_count >0 :
+            startup .add_step ("workers",start_supervisor ,[workers_count ],requires =["config","telegram_bot"])
+        startup .add_step ("on_init",call_bot_event ,["ON_INIT"],requires =["playerok_bot"])
+        # the update replaces the source files and restarts the bot, so it waits for the whole launch
+        startup .add_step ("install_update",install_pending_update ,requires =list (startup .steps ),background =True )
+
+        main_loop .run_until_complete (startup .run ())
         main_loop .create_task (clear_logs_task ())
 
-        asyncio .run (call_bot_event ("ON_INIT"))
-
         main_loop .run_forever ()
     except Exception as e :
         traceback .print_exc ()
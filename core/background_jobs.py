@@ -0,0 +1,141 @@
+import time 
+from threading import Thread ,Lock ,Event 
+from collections import OrderedDict 
+from colorama import Fore 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.jobs")
+
+FINISHED_JOBS_LIMIT =50 
+
+_job_runner =None 
+
+
+class JobAlreadyRunningError (Exception ):
+    'Job with the same name is already running.\n\n    :param job: Running job.\n    :type job: `core.background_jobs.BackgroundJob`'
+
+    def __init__ (self ,job :"BackgroundJob"):
+        self .job =job 
+
+    def __str__ (self ):
+        return f"Job \"{self .job .name }\" is already running"
+
+
+class BackgroundJob :
+    'Long action running in its own thread.\n    The job function receives the job object as the first argument and reports the progress with\n    `set_total` / `advance`, it should check `is_cancelled` between the steps and stop if it is set.\n\n    :param name: Unique job name.\n    :type name: `str`\n\n    :param title: Job title shown to the user.\n    :type title: `str`'
+
+    def __init__ (self ,name :str ,title :str ):
+        self .name :str =name 
+        'Unique job name.'
+        self .title :str =title 
+        'Job title shown to the user.'
+        self .status :str ="running"
+        'Job status: running, done, cancelled or failed.'
+        self .total :int |None =None 
+        'Total number of steps (None - unknown).'
+        self .processed :int =0 
+        'Number of processed steps.'
+        self .errors :int =0 
+        'Number of steps that ended with an error.'
+        self .result =None 
+        'Result of the job function.'
+        self .error :Exception |None =None 
+        'Error the job has failed with.'
+        self .started_at :float =time .time ()
+        'Start time (timestamp).'
+        self .finished_at :float |None =None 
+        'Finish time (timestamp).'
+
+        self ._cancel_event =Event ()
+
+    @property 
+    def is_running (self )->bool :
+        'Whether the job is running now.'
+        return self .status =="running"
+
+    @property 
+    def is_cancelled (self )->bool :
+        'Whether the job cancellation has been requested.'
+        return self ._cancel_event .is_set ()
+
+    @property 
+    def eta (self )->float |None :
+        'Estimated time left in seconds (None - unknown).'
+        if not self .is_running or not self .total or not self .processed :
+            return None 
+        elapsed =time .time ()-self .started_at 
+        return elapsed /self .processed *max (self .total -self .processed ,0 )
+
+    def set_total (self ,total :int ):
+        'Sets the total number of steps.\n\n        :param total: Total number of steps.\n        :type total: `int`'
+        self .total =total 
+
+    def advance (self ,count :int =1 ,error :bool =False ):
+        'Marks the steps as processed.\n\n        :param count: Number of the processed steps, _optional_.\n        :type count: `int`\n\n        :param error: Whether the steps ended with an error, _optional_.\n        :type error: `bool`'
+        self .processed +=count 
+        if error :
+            self .errors +=count 
+
+    def cancel (self ):
+        'Requests the job cancellation (the job stops at its next check).'
+        self ._cancel_event .set ()
+
+
+class BackgroundJobRunner :
+    'Runner of the long actions (e.g. triggered from Telegram) off the calling thread or event loop.\n    Only one job with the same name can run at a time.'
+
+    def __init__ (self ):
+        self ._jobs :OrderedDict [str ,BackgroundJob ]=OrderedDict ()
+        self ._lock =Lock ()
+
+    def _run (self ,job :BackgroundJob ,func :callable ,args :tuple ,kwargs :dict ):
+        try :
+            job .result =func (job ,*args ,**kwargs )
+            job .status ="cancelled"if job .is_cancelled else "done"
+        except Exception as e :
+            job .error =e 
+            job .status ="failed"
+            logger .error (f"{Fore .LIGHTRED_EX }Error in job \"{job .title }\": {Fore .WHITE }{e }")
+        finally :
+            job .finished_at =time .time ()
+
+    def submit (self ,name :str ,func :callable ,*args ,title :str |None =None ,**kwargs )->BackgroundJob :
+        'Starts the job in a new thread.\n\n        :param name: Unique job name.\n        :type name: `str`\n\n        :param func: Job function, receives the job object and the passed arguments.\n        :type func: `callable`\n\n        :param title: Job title shown to the user (defaults to the name), _optional_.\n        :type title: `str` or `None`\n\n        :return: Started job.\n        :rtype: `core.background_jobs.BackgroundJob`\n\n        :raises: `core.background_jobs.JobAlreadyRunningError` if a job with the same name is running.'
+        with self ._lock :
+            running =self ._jobs .get (name )
+            if running and running .is_running :
+                raise JobAlreadyRunningError (running )
+
+            job =self ._jobs [name ]=BackgroundJob (name ,title or name )
+            self ._jobs .move_to_end (name )
+            finished =[n for n ,j in self ._jobs .items ()if not j .is_running ]
+            for old_name in finished [:max (len (finished )-FINISHED_JOBS_LIMIT ,0 )]:
+                del self ._jobs [old_name ]
+
+        Thread (target =self ._run ,args =(job ,func ,args ,kwargs ),name =f"job-{name }",daemon =True ).start ()
+        return job 
+
+    def get_job (self ,name :str )->BackgroundJob |None :
+        'Returns the last job with the name.\n\n        :param name: Job name.\n        :type name: `str`\n\n        :return: Job object.\n        :rtype: `core.background_jobs.BackgroundJob` or `None`'
+        return self ._jobs .get (name )
+
+    def get_jobs (self )->list [BackgroundJob ]:
+        'Returns the running and the recently finished jobs.\n\n        :return: Jobs list.\n        :rtype: `list[core.background_jobs.BackgroundJob]`'
+        return list (self ._jobs .values ())
+
+    def cancel (self ,name :str )->bool :
+        'Requests the job cancellation.\n\n        :param name: Job name.\n        :type name: `str`\n\n        :return: Whether the running job was found.\n        :rtype: `bool`'
+        job =self ._jobs .get (name )
+        if not job or not job .is_running :
+            return False 
+        job .cancel ()
+        return True 
+
+
+def get_job_runner ()->BackgroundJobRunner :
+    'Returns the background jobs runner of the process (creates it on the first call).\n\n    :return: Background jobs runner.\n    :rtype: `core.background_jobs.BackgroundJobRunner`'
+    global _job_runner 
+    if _job_runner is None :
+        _job_runner =BackgroundJobRunner ()
+    return _job_runner 
@@ -1,7 +1,11 @@
+import time 
 from colorama import Fore 
 from logging import getLogger 
 
 from playerokapi .listener .events import EventTypes 
+from playerokapi .metrics import get_metrics 
+
+from .profiling import get_slow_handler_threshold 
 
 
 logger =getLogger ("universal.handlers")
@@ -29,6 +33,28 @@ EventTypes .ITEM_SENT :[]
 }
 
 
+def _observe_handler (event :str ,handler :callable ,started :float ,failed :bool ):
+    metrics =get_metrics ()
+    if not metrics .enabled :
+        return 
+    name =f"{handler .__module__ }.{handler .__qualname__ }"
+    metrics .observe ("bot_handler_duration_seconds",time .perf_counter ()-started ,event =event ,handler =name )
+    if failed :
+        metrics .inc ("bot_handler_errors_total",event =event ,handler =name )
+
+
+def _log_slow_handler (event :str ,handler :callable ,started :float ):
+    threshold =get_slow_handler_threshold ()
+    if not threshold :
+        return 
+    duration =time .perf_counter ()-started 
+    if duration >=threshold :
+        logger .warning (
+        f'{Fore .YELLOW }Slow handler "{handler .__module__ }.{handler .__qualname__ }" '
+        f'for the Playerok event "{event }": {Fore .WHITE }{duration :.2f} sec.'
+        )
+
+
 def get_bot_event_handlers ()->dict [str ,list [callable ]]:
     "Returns the bot's event handlers.\n\n    :return: Dictionary with events and lists of handlers.\n    :rtype: `dict[str, list[callable]]`"
     return _bot_event_handlers 
@@ -109,23 +135,40 @@ async def call_bot_event (event :str ,args :list =[],func =None ):
     else :
         handlers =[func ]
     for handler in handlers :
+        started =time .perf_counter ()
         try :
             await handler (*args )
+            _observe_handler (event ,handler ,started ,False )
         except Exception as e :
+            _observe_handler (event ,handler ,started ,True )
             logger .error (
             f'{Fore .LIGHTRED_EX }Error processing handler "{handler .__module__ }.{handler .__qualname__ }" '
             f'for bot event "{event }": {Fore .WHITE }{e }'
             )
 
 
-async def call_playerok_event (event :EventTypes ,args :list =[]):
-    'Calls an event bot.\n\n    :param event: Event type.\n    :type event: `playerokapi.enums.EventTypes`\n\n    :param args: Arguments.\n    :type args: `list`'
-    handlers =get_playerok_event_handlers ().get (event ,[])
+async def call_playerok_event (event :EventTypes ,args :list =[],handlers :list [callable ]|None =None ,
+on_handled =None )->bool :
+    'Calls an event bot.\n\n    :param event: Event type.\n    :type event: `playerokapi.enums.EventTypes`\n\n    :param args: Arguments.\n    :type args: `list`\n\n    :param handlers: Handlers to call (if only specific ones need to be called), _optional_.\n    :type handlers: `list[callable]` or `None`\n\n    :param on_handled: Function called with each handler that has processed the event without an error, _optional_.\n    :type on_handled: `callable` or `None`\n\n    :return: True if every handler has processed the event without an error.\n    :rtype: `bool`'
+    if handlers is None :
+        handlers =get_playerok_event_handlers ().get (event ,[])
+    is_all_handled =True 
     for handler in handlers :
+        started =time .perf_counter ()
+        is_failed =False 
         try :
             await handler (*args )
+            _observe_handler (event .name ,handler ,started ,False )
         except Exception as e :
+            is_failed =True 
+            _observe_handler (event .name ,handler ,started ,True )
             logger .error (
             f'{Fore .LIGHTRED_EX }Error processing handler "{handler .__module__ }.{handler .__qualname__ }" '
             f'for the Playerok event "{event .name }": {Fore .WHITE }{e }'
             )
+        _log_slow_handler (event .name ,handler ,started )
+        if is_failed :
+            is_all_handled =False 
+        elif on_handled :
+            on_handled (handler )
+    return is_all_handled 
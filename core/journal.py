@@ -0,0 +1,244 @@
+import os 
+import json 
+import atexit 
+import time 
+import zlib 
+import struct 
+import pickle 
+import tempfile 
+from threading import Lock 
+from logging import getLogger 
+from typing import Generator 
+
+from core .handlers import call_playerok_event ,get_playerok_event_handlers 
+from core .scheduler import IntervalTrigger ,get_scheduler 
+
+
+logger =getLogger ("universal.journal")
+
+JOURNAL_DIR ="bot_data/journal"
+SEGMENT_MAX_SIZE =4 *1024 *1024 
+SEGMENTS_KEEP =8 
+RECORD_HEADER =struct .Struct ("<QII")# offset, payload length, payload crc32
+FLUSH_INTERVAL =5 
+
+_journals :dict [str ,"EventJournal"]={}
+
+
+def get_journal (path :str =JOURNAL_DIR )->"EventJournal":
+    'Returns the Playerok event journal (creates it on the first call).\n\n    :param path: Path to the journal folder (each account has its own journal).\n    :type path: `str`\n\n    :return: Event journal object.\n    :rtype: `core.journal.EventJournal`'
+    if path not in _journals :
+        journal =EventJournal (path )
+        get_scheduler ().add_job (f"flush_journal.{path }",journal .flush ,IntervalTrigger (FLUSH_INTERVAL ))
+        _journals [path ]=journal 
+    return _journals [path ]
+
+
+def flush_journals ():
+    'Syncs and saves all opened journals (see `EventJournal.flush`).'
+    for journal in list (_journals .values ()):
+        journal .flush ()
+
+
+atexit .register (flush_journals )
+
+
+def get_handler_name (handler :callable )->str :
+    'Returns the handler name under which its acknowledgements are stored.\n\n    :param handler: Event handler.\n    :type handler: `callable`\n\n    :return: Handler name.\n    :rtype: `str`'
+    return f"{handler .__module__ }.{handler .__qualname__ }"
+
+
+class EventJournal :
+    'Append-only journal of Playerok events.\n    Every event is written to disk before it is dispatched to the handlers,\n    handlers acknowledge the events they have processed, so events\n    interrupted by a crash can be delivered again, and any part\n    of the journal can be replayed.\n    The segment is synced to disk and the acknowledgements are saved by `flush`, which is called\n    periodically and on exit: losing the last acknowledgements only means the events are delivered again.\n\n    :param path: Path to the journal folder.\n    :type path: `str`\n\n    :param segment_max_size: Maximum size of one segment file in bytes.\n    :type segment_max_size: `int`\n\n    :param segments_keep: Number of segment files to keep, older ones are deleted.\n    :type segments_keep: `int`'
+
+    def __init__ (self ,path :str =JOURNAL_DIR ,segment_max_size :int =SEGMENT_MAX_SIZE ,
+    segments_keep :int =SEGMENTS_KEEP ):
+        self .path =path 
+        self .segment_max_size =segment_max_size 
+        self .segments_keep =segments_keep 
+
+        self .last_offset =0 
+        'Offset of the last written event.'
+        self .acks :dict [str ,int ]={}
+        'Offsets of the last events processed by each handler.'
+
+        self ._lock =Lock ()
+        self ._file =None 
+        self ._is_synced =True 
+        self ._is_acks_saved =True 
+        self ._acks_path =os .path .join (self .path ,"acks.json")
+
+        os .makedirs (self .path ,exist_ok =True )
+        self ._open ()
+
+    def _segments (self )->list [str ]:
+        return sorted (
+        os .path .join (self .path ,name )
+        for name in os .listdir (self .path )
+        if name .endswith (".seg")
+        )
+
+    def _read_segment (self ,segment :str )->Generator [tuple [int ,int ,bytes ],None ,None ]:
+        with open (segment ,"rb")as f :
+            while True :
+                pos =f .tell ()
+                header =f .read (RECORD_HEADER .size )
+                if len (header )<RECORD_HEADER .size :
+                    return 
+                offset ,length ,crc =RECORD_HEADER .unpack (header )
+                payload =f .read (length )
+                if len (payload )<length or zlib .crc32 (payload )!=crc :
+                    return # the record was cut off by a crash
+                yield pos ,offset ,payload 
+
+    def _open (self ):
+        segments =self ._segments ()
+        if segments :
+            segment =segments [-1 ]
+            end =0 
+            for pos ,offset ,payload in self ._read_segment (segment ):
+                end =pos +RECORD_HEADER .size +len (payload )
+                self .last_offset =offset 
+            if end !=os .path .getsize (segment ):
+                with open (segment ,"r+b")as f :
+                    f .truncate (end )
+            self ._file =open (segment ,"ab")
+
+        try :
+            with open (self ._acks_path ,"r",encoding ="utf-8")as f :
+                self .acks =json .load (f )
+        except :
+            self .acks ={}
+
+    def _rotate (self ):
+        if self ._file :
+            if not self ._is_synced :
+                os .fsync (self ._file .fileno ())
+                self ._is_synced =True 
+            self ._file .close ()
+        segment =os .path .join (self .path ,f"{self .last_offset +1 :020d}.seg")
+        self ._file =open (segment ,"ab")
+
+        for old_segment in self ._segments ()[:-self .segments_keep ]:
+            try :os .remove (old_segment )
+            except OSError :pass 
+
+    def append (self ,event )->int |None :
+        'Writes the event to the journal.\n\n        :param event: Playerok event object.\n        :type event: `playerokapi.listener.events.BaseEvent`\n\n        :return: Event offset in the journal or None if the event could not be written.\n        :rtype: `int` or `None`'
+        try :
+            payload =pickle .dumps (event ,protocol =pickle .HIGHEST_PROTOCOL )
+        except Exception as e :
+            logger .debug (f"Failed to serialize event {event .type .name } for the journal: {e }")
+            return None 
+
+        with self ._lock :
+            if not self ._file or self ._file .tell ()>=self .segment_max_size :
+                self ._rotate ()
+            offset =self .last_offset +1 
+            self ._file .write (RECORD_HEADER .pack (offset ,len (payload ),zlib .crc32 (payload ))+payload )
+            self ._file .flush ()# survives a crash of the process, synced to disk by flush
+            self ._is_synced =False 
+            self .last_offset =offset 
+        return offset 
+
+    def read (self ,from_offset :int =0 )->Generator [tuple [int ,object ],None ,None ]:
+        'Reads the events from the journal.\n\n        :param from_offset: Offset from which to start reading (inclusive).\n        :type from_offset: `int`\n\n        :return: Generator of pairs (offset, event).\n        :rtype: `Generator[tuple[int, playerokapi.listener.events.BaseEvent]]`'
+        segments =self ._segments ()
+        for i ,segment in enumerate (segments ):
+            if i +1 <len (segments )and int (os .path .basename (segments [i +1 ])[:-4 ])<=from_offset :
+                continue # the whole segment is before the required offset
+            for _ ,offset ,payload in self ._read_segment (segment ):
+                if offset <from_offset :
+                    continue 
+                try :yield offset ,pickle .loads (payload )
+                except Exception as e :
+                    logger .debug (f"Failed to read event {offset } from the journal: {e }")
+
+    def ack (self ,handler :callable ,offset :int ):
+        'Marks the event as processed by the handler.\n\n        :param handler: Event handler.\n        :type handler: `callable`\n\n        :param offset: Event offset in the journal.\n        :type offset: `int`'
+        with self ._lock :
+            name =get_handler_name (handler )
+            if name in self .acks and self .acks [name ]>=offset :
+                return 
+            self .acks [name ]=offset 
+            self ._is_acks_saved =False 
+
+    def flush (self ):
+        'Syncs the written events to disk and saves the acknowledgements.'
+        with self ._lock :
+            try :
+                if not self ._is_synced and self ._file :
+                    os .fsync (self ._file .fileno ())
+                    self ._is_synced =True 
+                if not self ._is_acks_saved :
+                    with tempfile .NamedTemporaryFile (# atomic file write
+                    "w",
+                    encoding ="utf-8",
+                    dir =self .path ,
+                    delete =False 
+                    )as tmp :
+                        json .dump (self .acks ,tmp )
+                    os .replace (tmp .name ,self ._acks_path )
+                    self ._is_acks_saved =True 
+            except Exception as e :
+                logger .debug (f"Failed to flush the journal {self .path }: {e }")
+
+    async def dispatch (self ,event ,args :list =[])->bool :
+        'Writes the event to the journal and calls its handlers, acknowledging each of them.\n\n        :param event: Playerok event object.\n        :type event: `playerokapi.listener.events.BaseEvent`\n\n        :param args: Handler arguments.\n        :type args: `list`\n\n        :return: True if every handler has processed the event without an error.\n        :rtype: `bool`'
+        offset =self .append (event )
+        if offset is None :
+            return await call_playerok_event (event .type ,args )
+        return await call_playerok_event (
+        event .type ,args ,
+        on_handled =lambda handler :self .ack (handler ,offset )
+        )
+
+    async def redeliver (self ,args :list =[],filter_func =None ,on_processed =None ,max_age :int =3600 )->int :
+        'Delivers the events that were not acknowledged by their handlers (e.g. because of a crash)\n        again. Handlers that have never acknowledged anything only receive new events.\n\n        :param args: Handler arguments preceding the event.\n        :type args: `list`\n\n        :param filter_func: Function called with each event before it is redelivered, if it returns False\n        the event is considered a duplicate and is only acknowledged, _optional_.\n        :type filter_func: `callable` or `None`\n\n        :param on_processed: Function called with each redelivered event that every handler has processed\n        without an error, _optional_.\n        :type on_processed: `callable` or `None`\n\n        :param max_age: Maximum age of the redelivered events in seconds.\n        :type max_age: `int`\n\n        :return: Number of redelivered events.\n        :rtype: `int`'
+        all_handlers =get_playerok_event_handlers ()
+        for handlers in all_handlers .values ():
+            for handler in handlers :
+                if get_handler_name (handler )not in self .acks :
+                    self .ack (handler ,self .last_offset )
+
+        if not self .acks :
+            return 0 
+        from_offset =min (self .acks .values ())+1 
+        redelivered =0 
+
+        for offset ,event in self .read (from_offset ):
+            if time .time ()-event .time >max_age :
+                continue 
+            handlers =[
+            handler for handler in all_handlers .get (event .type ,[])
+            if self .acks .get (get_handler_name (handler ),0 )<offset 
+            ]
+            if not handlers :
+                continue 
+
+            if filter_func and not filter_func (event ):
+                logger .debug (f"Event {event .type .name } ({offset }) has already been processed, it will not be redelivered")
+                for handler in handlers :
+                    self .ack (handler ,offset )
+                continue 
+
+            is_processed =await call_playerok_event (
+            event .type ,[*args ,event ],
+            handlers =handlers ,
+            on_handled =lambda handler :self .ack (handler ,offset )
+            )
+            if is_processed and on_processed :
+                on_processed (event )
+            redelivered +=1 
+
+        if redelivered :
+            logger .info (f"Redelivered {redelivered } unprocessed events from the journal")
+        return redelivered 
+
+    async def replay (self ,from_offset :int =0 ,args :list =[])->int :
+        'Replays the events from the journal to the current handlers without acknowledging them.\n\n        :param from_offset: Offset from which to start replaying (inclusive).\n        :type from_offset: `int`\n\n        :param args: Handler arguments preceding the event.\n        :type args: `list`\n\n        :return: Number of replayed events.\n        :rtype: `int`'
+        replayed =0 
+        for _ ,event in self .read (from_offset ):
+            await call_playerok_event (event .type ,[*args ,event ])
+            replayed +=1 
+        return replayed 
@@ -0,0 +1,141 @@
+import os 
+from string import Formatter 
+from threading import Lock 
+from colorama import Fore 
+from logging import getLogger 
+
+from settings import Settings as sett ,SettingsFile 
+
+
+logger =getLogger ("universal.templates")
+
+_formatter =Formatter ()
+
+
+class MessageTemplate :
+    'Message compiled into a render plan: pairs (literal text, placeholder).\n\n    :param name: Message name.\n    :type name: `str`\n\n    :param message: Message settings (`enabled` and `text` lines).\n    :type message: `dict`'
+
+    def __init__ (self ,name :str ,message :dict ):
+        self .name :str =name 
+        "Message name."
+        self .enabled :bool =bool (message .get ("enabled"))
+        "Whether the message is enabled."
+        self .is_empty :bool =not message .get ("text")
+        "Whether the message has no text."
+        self .error :str |None =None 
+        "Template error (None - the template is valid)."
+        self .fields :set [str ]=set ()
+        "Names of the placeholders."
+        self .parts :list [tuple [str ,str |None ,str |None ,str |None ]]=[]
+        "Render plan: (literal text, field name, format string of a complex placeholder, placeholder text)."
+
+        try :
+            self ._compile ("\n".join (message .get ("text")or []))
+        except (ValueError ,TypeError )as e :
+            self .error =str (e )
+            self .parts =[]
+
+    def _compile (self ,text :str ):
+        for literal ,field ,spec ,conversion in _formatter .parse (text ):
+            if field is None :
+                self .parts .append ((literal ,None ,None ,None ))
+                continue 
+
+            root =field .split (".",1 )[0 ].split ("[",1 )[0 ]
+            if not root .isidentifier ():
+                raise ValueError (f"positional placeholder {{{field }}}")
+            placeholder ="{"+field +(f"!{conversion }"if conversion else "")+(f":{spec }"if spec else "")+"}"
+            list (_formatter .parse (spec or ""))# nested placeholders of the format spec must be valid too
+            self .fields .add (root )
+            self .parts .append ((literal ,root ,None if placeholder =="{"+root +"}"else placeholder ,placeholder ))
+
+    def render (self ,values :dict )->str :
+        'Renders the message, unknown placeholders are left as they are.\n\n        :param values: Placeholder values.\n        :type values: `dict`\n\n        :return: Message text.\n        :rtype: `str`'
+        result =[]
+        for literal ,field ,fmt ,placeholder in self .parts :
+            result .append (literal )
+            if field is None :
+                continue 
+            if field not in values :
+                result .append (placeholder )
+            elif fmt is None :
+                result .append (format (values [field ]))
+            else :
+                result .append (fmt .format_map (values ))
+        return "".join (result )
+
+
+class MessageTemplates :
+    'Registry of the compiled message templates.\n    Each messages settings file is compiled once and recompiled only when the file changes.'
+
+    def __init__ (self ):
+        self ._sets :dict [str ,tuple [tuple ,dict [str ,MessageTemplate ]]]={}
+        self ._lock =Lock ()
+
+    @staticmethod 
+    def _get_file (config_name :str ,data :list [SettingsFile ])->SettingsFile |None :
+        return next ((file for file in data if file .name ==config_name ),None )
+
+    @staticmethod 
+    def _get_version (path :str )->tuple :
+        try :
+            stat =os .stat (path )
+            return (stat .st_mtime_ns ,stat .st_size )
+        except OSError :
+            return ()
+
+    def _compile (self ,file :SettingsFile )->dict [str ,MessageTemplate ]:
+        messages =sett .get (file .name ,[file ])or {}
+        templates ={name :MessageTemplate (name ,message )for name ,message in messages .items ()if isinstance (message ,dict )}
+        for template in templates .values ():
+            if template .error :
+                logger .error (f"{Fore .LIGHTRED_EX }Message \"{template .name }\" in {file .path } is invalid and will not be sent: {Fore .WHITE }{template .error }")
+        return templates 
+
+    def get_set (self ,config_name :str ,data :list [SettingsFile ])->dict [str ,MessageTemplate ]:
+        'Returns the compiled templates of the messages settings file, recompiles them if the file has changed.\n\n        :param config_name: Name of the messages settings file.\n        :type config_name: `str`\n\n        :param data: Settings files list.\n        :type data: `list[settings.SettingsFile]`\n\n        :return: Templates by message names.\n        :rtype: `dict[str, core.message_templates.MessageTemplate]`'
+        file =self ._get_file (config_name ,data )
+        if not file :
+            return {}
+
+        version =self ._get_version (file .path )
+        cached =self ._sets .get (file .path )
+        if cached and version and cached [0 ]==version :
+            return cached [1 ]
+
+        with self ._lock :
+            version =self ._get_version (file .path )
+            cached =self ._sets .get (file .path )
+            if cached and version and cached [0 ]==version :
+                return cached [1 ]
+            templates =self ._compile (file )
+            self ._sets [file .path ]=(version or self ._get_version (file .path ),templates )# the file is created on the first read
+            return templates 
+
+    def register (self ,config_name :str ,data :list [SettingsFile ])->dict [str ,MessageTemplate ]:
+        'Compiles the messages settings file in advance (e.g. when a module is loaded), errors are logged at once.\n\n        :param config_name: Name of the messages settings file.\n        :type config_name: `str`\n\n        :param data: Settings files list.\n        :type data: `list[settings.SettingsFile]`\n\n        :return: Templates by message names.\n        :rtype: `dict[str, core.message_templates.MessageTemplate]`'
+        return self .get_set (config_name ,data )
+
+    def render (self ,message_name :str ,config_name :str ,data :list [SettingsFile ],**kwargs )->str |None :
+        'Renders the message.\n\n        :param message_name: Message name.\n        :type message_name: `str`\n\n        :param config_name: Name of the messages settings file.\n        :type config_name: `str`\n\n        :param data: Settings files list.\n        :type data: `list[settings.SettingsFile]`\n\n        :return: Message text or None if the message is disabled or invalid.\n        :rtype: `str` or `None`'
+        template =self .get_set (config_name ,data ).get (message_name )
+        if not template or not template .enabled :
+            return None 
+        if template .is_empty :
+            return f"Message{message_name }empty"
+        if template .error :
+            return None 
+
+        try :
+            return template .render (kwargs )
+        except Exception as e :
+            logger .error (f"{Fore .LIGHTRED_EX }Error rendering message \"{message_name }\": {Fore .WHITE }{e }")
+            return None 
+
+
+_message_templates =MessageTemplates ()
+
+
+def get_message_templates ()->MessageTemplates :
+    'Returns the registry of the message templates.\n\n    :return: Message templates registry.\n    :rtype: `core.message_templates.MessageTemplates`'
+    return _message_templates 
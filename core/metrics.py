@@ -0,0 +1,73 @@
+from http .server import ThreadingHTTPServer ,BaseHTTPRequestHandler 
+from threading import Thread 
+from colorama import Fore 
+from logging import getLogger 
+
+from playerokapi .metrics import Metrics ,get_metrics 
+from settings import Settings as sett 
+
+
+logger =getLogger ("universal.metrics")
+
+METRICS_HOST ="127.0.0.1"
+METRICS_DESCRIPTIONS ={
+"playerok_requests_total":("counter","Requests to the Playerok API by GraphQL operation and HTTP status."),
+"playerok_request_duration_seconds":("histogram","Duration of the Playerok API requests (with the retries)."),
+"playerok_request_retries_total":("counter","Retried Playerok API requests by the reason (send error, 429, 5xx)."),
+"playerok_ws_messages_total":("counter","WebSocket messages by the subscription."),
+"playerok_ws_frames_total":("counter","WebSocket frames by the subscription."),
+"playerok_ws_received_bytes_total":("counter","WebSocket bytes received by the subscription (as transferred)."),
+"playerok_ws_reconnects_total":("counter","WebSocket reconnections."),
+"playerok_events_total":("counter","Events produced by the listener by the event type."),
+"playerok_event_lag_seconds":("histogram","Time from detecting the event to handing it to the bot."),
+"playerok_listener_queue_depth":("gauge","Events waiting in the listener queue."),
+"bot_handler_duration_seconds":("histogram","Duration of the event handlers."),
+"bot_handler_errors_total":("counter","Event handlers that raised an error.")
+}
+
+_server =None 
+
+
+class _MetricsRequestHandler (BaseHTTPRequestHandler ):
+    def do_GET (self ):
+        if self .path .split ("?",1 )[0 ]!="/metrics":
+            self .send_error (404 )
+            return 
+        body =get_metrics ().export ().encode ("utf-8")
+        self .send_response (200 )
+        self .send_header ("Content-Type","text/plain; version=0.0.4; charset=utf-8")
+        self .send_header ("Content-Length",str (len (body )))
+        self .end_headers ()
+        self .wfile .write (body )
+
+    def log_message (self ,format ,*args ):
+        pass 
+
+
+def start_metrics_server (port :int ,host :str =METRICS_HOST )->ThreadingHTTPServer |None :
+    'Starts the local HTTP endpoint with the metrics in the Prometheus format (`/metrics`).\n\n    :param port: Port.\n    :type port: `int`\n\n    :param host: Host, _optional_.\n    :type host: `str`\n\n    :return: Server object or None if it failed to start.\n    :rtype: `http.server.ThreadingHTTPServer` or `None`'
+    global _server 
+    if _server is not None :
+        return _server 
+    try :
+        _server =ThreadingHTTPServer ((host ,port ),_MetricsRequestHandler )
+    except OSError as e :
+        logger .error (f"{Fore .LIGHTRED_EX }Failed to start the metrics endpoint on {host }:{port }: {Fore .WHITE }{e }")
+        return None 
+    _server .daemon_threads =True 
+    Thread (target =_server .serve_forever ,daemon =True ).start ()
+    logger .info (f"Metrics are available at http://{host }:{port }/metrics")
+    return _server 
+
+
+def init_metrics (port_offset :int =0 )->Metrics :
+    'Enables or disables the metrics collection by the config and starts the HTTP endpoint if its port is set.\n\n    :param port_offset: Offset of the endpoint port (for the worker processes), _optional_.\n    :type port_offset: `int`\n\n    :return: Metrics registry.\n    :rtype: `playerokapi.metrics.Metrics`'
+    config =sett .get ("config")["metrics"]
+    metrics =get_metrics ()
+    for name ,(metric_type ,description )in METRICS_DESCRIPTIONS .items ():
+        metrics .describe (name ,metric_type ,description )
+
+    metrics .enabled =bool (config ["enabled"])
+    if metrics .enabled and config ["port"]:
+        start_metrics_server (int (config ["port"])+port_offset )
+    return metrics 
@@ -0,0 +1,138 @@
+import os 
+import time 
+import tempfile 
+from threading import Lock 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.processed_deals")
+
+PROCESSED_DEALS_PATH ="bot_data/processed_deals.log"
+PROCESSED_DEALS_TTL =30 *24 *3600 
+
+_processed_deals :dict [str ,"ProcessedDeals"]={}
+
+
+def get_processed_deals (path :str =PROCESSED_DEALS_PATH )->"ProcessedDeals":
+    'Returns the processed deals store (creates it on the first call).\n\n    :param path: Path to the log file (each account has its own store).\n    :type path: `str`\n\n    :return: Processed deals store object.\n    :rtype: `core.processed_deals.ProcessedDeals`'
+    if path not in _processed_deals :
+        _processed_deals [path ]=ProcessedDeals (path )
+    return _processed_deals [path ]
+
+
+class ProcessedDeals :
+    'Durable store of processed deal events.\n    Keeps an append-only log on disk and an in-memory index of it,\n    so that a deal event is processed exactly once, even across restarts.\n    A deal event is first claimed as pending and becomes processed only when it is committed after\n    its handlers have succeeded. Claims left pending by a crash or a failed handler can be claimed again\n    after a restart (see `get_stale`).\n\n    :param path: Path to the log file.\n    :type path: `str`\n\n    :param ttl: Lifetime of the records in seconds, older records are removed on compaction.\n    :type ttl: `int`'
+
+    def __init__ (self ,path :str =PROCESSED_DEALS_PATH ,ttl :int =PROCESSED_DEALS_TTL ):
+        self .path =path 
+        self .ttl =ttl 
+
+        self ._index :dict [str ,float ]={}
+        self ._pending :dict [str ,float ]={}
+        self ._stale :set [str ]=set ()
+        self ._compacted_at =0 
+        self ._lock =Lock ()
+        self ._file =None 
+
+        self ._load ()
+
+    def _load (self ):
+        os .makedirs (os .path .dirname (self .path ),exist_ok =True )
+        if os .path .exists (self .path ):
+            with open (self .path ,"r",encoding ="utf-8")as f :
+                for line in f :
+                    try :
+                        key ,ts ,*state =line .rstrip ("\n").split ("\t")
+                        if state ==["pending"]:
+                            if key not in self ._index :
+                                self ._pending [key ]=float (ts )
+                        else :
+                            self ._index [key ]=float (ts )
+                            self ._pending .pop (key ,None )
+                    except ValueError :
+                        continue # the last line may be cut off by a crash
+        self ._stale =set (self ._pending )
+        self ._compact ()
+
+    def _compact (self ):
+        now =time .time ()
+        self ._index ={key :ts for key ,ts in self ._index .items ()if now -ts <=self .ttl }
+        self ._pending ={key :ts for key ,ts in self ._pending .items ()if now -ts <=self .ttl }
+        self ._stale &=set (self ._pending )
+
+        if self ._file :
+            self ._file .close ()
+
+        with tempfile .NamedTemporaryFile (# atomic file write
+        "w",
+        encoding ="utf-8",
+        dir =os .path .dirname (self .path ),
+        delete =False 
+        )as tmp :
+            tmp .writelines (f"{key }\t{ts }\n"for key ,ts in self ._index .items ())
+            tmp .writelines (f"{key }\t{ts }\tpending\n"for key ,ts in self ._pending .items ())
+            tmp .flush ()
+            os .fsync (tmp .fileno ())
+
+        os .replace (tmp .name ,self .path )
+        self ._compacted_at =now 
+        self ._file =open (self .path ,"a",encoding ="utf-8")
+
+    @staticmethod 
+    def _key (deal_id :str ,event :str )->str :
+        return f"{deal_id }:{event }"
+
+    def is_processed (self ,deal_id :str ,event :str )->bool :
+        'Checks whether the deal event has already been processed.\n\n        :param deal_id: Deal ID.\n        :type deal_id: `str`\n\n        :param event: Event name.\n        :type event: `str`\n\n        :return: True if processed, otherwise False.\n        :rtype: `bool`'
+        return self ._key (deal_id ,event )in self ._index 
+
+    def _write (self ,lines :list [str ]):
+        if not lines :
+            return 
+        try :
+            self ._file .writelines (lines )
+            self ._file .flush ()
+            os .fsync (self ._file .fileno ())
+        except Exception as e :
+            logger .error (f"Failed to write processed deals: {e }")
+
+    def claim (self ,*pairs :tuple [str ,str ])->list [bool ]:
+        'Claims deal events for processing, the claims stay pending until they are committed.\n        All new records are written with a single fsync before the method returns.\n\n        :param pairs: Pairs (deal ID, event name).\n        :type pairs: `tuple[str, str]`\n\n        :return: For each pair - True if it was claimed now, False if it has been processed or is being processed.\n        :rtype: `list[bool]`'
+        results =[]
+        with self ._lock :
+            now =time .time ()
+            lines =[]
+            for deal_id ,event in pairs :
+                key =self ._key (deal_id ,event )
+                if key in self ._index or (key in self ._pending and key not in self ._stale ):
+                    results .append (False )
+                    continue 
+                self ._stale .discard (key )# a claim left by the previous run is taken over
+                self ._pending [key ]=now 
+                lines .append (f"{key }\t{now }\tpending\n")
+                results .append (True )
+            self ._write (lines )
+
+            if now -self ._compacted_at >24 *3600 :
+                self ._compact ()
+        return results 
+
+    def commit (self ,*pairs :tuple [str ,str ]):
+        'Marks claimed deal events as processed.\n\n        :param pairs: Pairs (deal ID, event name).\n        :type pairs: `tuple[str, str]`'
+        with self ._lock :
+            now =time .time ()
+            lines =[]
+            for deal_id ,event in pairs :
+                key =self ._key (deal_id ,event )
+                if key in self ._index :
+                    continue 
+                self ._pending .pop (key ,None )
+                self ._stale .discard (key )
+                self ._index [key ]=now 
+                lines .append (f"{key }\t{now }\n")
+            self ._write (lines )
+
+    def get_stale (self )->list [tuple [str ,str ]]:
+        'Returns the deal events claimed by the previous run and not committed (the process crashed\n        or a handler failed), they can be claimed again.\n\n        :return: Pairs (deal ID, event name).\n        :rtype: `list[tuple[str, str]]`'
+        with self ._lock :
+            return [tuple (key .rsplit (":",1 ))for key in self ._stale ]
@@ -0,0 +1,180 @@
+import os 
+import re 
+import sys 
+import time 
+import signal 
+import threading 
+import tracemalloc 
+from datetime import datetime 
+from collections import Counter 
+from colorama import Fore 
+from logging import getLogger 
+
+from settings import Settings as sett 
+
+from .background_jobs import BackgroundJob ,JobAlreadyRunningError ,get_job_runner 
+
+
+logger =getLogger ("universal.profiling")
+
+PROFILES_DIR ="logs/profiles"
+CPU_SAMPLE_INTERVAL =0.01 
+MEMORY_TRACE_FRAMES =10 
+TOP_ALLOCATIONS =30 
+
+_slow_handler_threshold :float =0 
+
+
+def get_slow_handler_threshold ()->float :
+    'Returns the duration from which the event handler calls are logged as slow.\n\n    :return: Threshold in seconds (0 - disabled).\n    :rtype: `float`'
+    return _slow_handler_threshold 
+
+
+def set_slow_handler_threshold (seconds :float ):
+    'Sets the duration from which the event handler calls are logged as slow.\n\n    :param seconds: Threshold in seconds (0 - disabled).\n    :type seconds: `float`'
+    global _slow_handler_threshold 
+    _slow_handler_threshold =max (float (seconds ),0 )
+
+
+def _get_profile_path (kind :str )->str :
+    os .makedirs (PROFILES_DIR ,exist_ok =True )
+    return os .path .join (PROFILES_DIR ,f"{kind }-{datetime .now ().strftime ('%Y%m%d-%H%M%S')}-{os .getpid ()}.txt")
+
+
+def _wait (job :BackgroundJob |None ,duration :float ,step :float =1 )->float :
+    started =time .monotonic ()
+    while (elapsed :=time .monotonic ()-started )<duration :
+        if job and job .is_cancelled :
+            break 
+        time .sleep (min (step ,duration -elapsed ))
+        _advance (job ,time .monotonic ()-started )
+    return time .monotonic ()-started 
+
+
+def _advance (job :BackgroundJob |None ,elapsed :float ):
+    if job and int (elapsed )>job .processed :
+        job .advance (int (elapsed )-job .processed )
+
+
+def _get_thread_name (name :str |None )->str :
+    if not name :
+        return "unknown"
+    return re .sub (r"-\d+","",name )# Thread-12 (run) and Thread-31 (run) are the same loop
+
+
+def _format_frame (frame )->str :
+    code =frame .f_code 
+    filename =code .co_filename 
+    try :
+        filename =os .path .relpath (filename )
+    except ValueError :# another drive on Windows
+        pass 
+    if filename .startswith (".."):
+        filename =os .path .basename (filename )
+    name =getattr (code ,"co_qualname",code .co_name )
+    return f"{name } ({filename }:{code .co_firstlineno })".replace (";",",")
+
+
+def profile_cpu (job :BackgroundJob |None =None ,duration :float =30 ,interval :float =CPU_SAMPLE_INTERVAL )->str :
+    'Samples the stacks of all threads of the process (the listener threads, the scheduler, the event loops)\n    and saves them in the collapsed stack format (`thread;outer function;...;inner function count`),\n    that `flamegraph.pl` and speedscope open as is. It is a wall-clock profile: the waiting threads are counted too.\n\n    :param job: Background job to report the progress to (the seconds passed), _optional_.\n    :type job: `core.background_jobs.BackgroundJob` or `None`\n\n    :param duration: Profiling time in seconds, _optional_.\n    :type duration: `float`\n\n    :param interval: Interval between the samples in seconds, _optional_.\n    :type interval: `float`\n\n    :return: Path to the profile file.\n    :rtype: `str`'
+    own_ident =threading .get_ident ()
+    stacks =Counter ()
+    samples =0 
+    if job :
+        job .set_total (int (duration ))
+
+    started =time .monotonic ()
+    while (elapsed :=time .monotonic ()-started )<duration :
+        if job and job .is_cancelled :
+            break 
+        names ={thread .ident :thread .name for thread in threading .enumerate ()}
+        for ident ,frame in sys ._current_frames ().items ():
+            if ident ==own_ident :
+                continue 
+            stack =[]
+            while frame is not None :
+                stack .append (_format_frame (frame ))
+                frame =frame .f_back 
+            stack .append (_get_thread_name (names .get (ident )))
+            stacks [";".join (reversed (stack ))]+=1 
+        samples +=1 
+        _advance (job ,elapsed )
+        time .sleep (interval )
+    _advance (job ,time .monotonic ()-started )
+
+    path =_get_profile_path ("cpu")
+    with open (path ,"w",encoding ="utf-8")as f :
+        for stack ,count in stacks .most_common ():
+            f .write (f"{stack } {count }\n")
+    logger .info (f"CPU profile: {samples } samples in {time .monotonic ()-started :.1f} sec. saved to {Fore .LIGHTWHITE_EX }{path }")
+    return path 
+
+
+def profile_memory (job :BackgroundJob |None =None ,duration :float =30 ,limit :int =TOP_ALLOCATIONS )->str :
+    'Compares the tracemalloc snapshots taken at the start and at the end of the period\n    and saves the top allocations (by the size that is still allocated) with their tracebacks.\n    The tracing slows the bot down while it is on, it is stopped after the period.\n\n    :param job: Background job to report the progress to (the seconds passed), _optional_.\n    :type job: `core.background_jobs.BackgroundJob` or `None`\n\n    :param duration: Period in seconds, _optional_.\n    :type duration: `float`\n\n    :param limit: Number of the top allocations, _optional_.\n    :type limit: `int`\n\n    :return: Path to the report file.\n    :rtype: `str`'
+    if job :
+        job .set_total (int (duration ))
+
+    is_started =not tracemalloc .is_tracing ()
+    if is_started :
+        tracemalloc .start (MEMORY_TRACE_FRAMES )
+    try :
+        before =tracemalloc .take_snapshot ()
+        elapsed =_wait (job ,duration )
+        after =tracemalloc .take_snapshot ()
+        current ,peak =tracemalloc .get_traced_memory ()
+    finally :
+        if is_started :
+            tracemalloc .stop ()
+
+    filters =[
+    tracemalloc .Filter (False ,tracemalloc .__file__ ),
+    tracemalloc .Filter (False ,"<frozen importlib._bootstrap*>")
+    ]
+    stats =after .filter_traces (filters ).compare_to (before .filter_traces (filters ),"traceback")
+    size_diff =sum (stat .size_diff for stat in stats )
+    count_diff =sum (stat .count_diff for stat in stats )
+
+    lines =[
+    f"Allocations diff over {elapsed :.1f} sec.",
+    f"Traced memory: {current /1024 :.1f} KiB, peak {peak /1024 :.1f} KiB",
+    f"Total change: {size_diff /1024 :+.1f} KiB in {count_diff :+d} blocks",
+    ""
+    ]
+    for i ,stat in enumerate (sorted (stats ,key =lambda stat :stat .size_diff ,reverse =True )[:limit ],start =1 ):
+        lines .append (f"#{i }: {stat .size_diff /1024 :+.1f} KiB in {stat .count_diff :+d} blocks (now {stat .size /1024 :.1f} KiB)")
+        lines .extend (f"    {line }"for line in stat .traceback .format (most_recent_first =True ))
+        lines .append ("")
+
+    path =_get_profile_path ("memory")
+    with open (path ,"w",encoding ="utf-8")as f :
+        f .write ("\n".join (lines ))
+    logger .info (f"Allocations diff saved to {Fore .LIGHTWHITE_EX }{path }")
+    return path 
+
+
+def _on_signal (signum ,frame ):
+    config =sett .get ("config")["profiling"]
+    func ,name ,title =(
+    (profile_cpu ,"profile_cpu","🔥 CPU profile")if signum ==signal .SIGUSR1 
+    else (profile_memory ,"profile_memory","🧠 Allocations diff")
+    )
+    try :
+        get_job_runner ().submit (name ,func ,config ["duration"],title =title )
+        logger .info (f"{title } has been started by the signal for {config ['duration']} sec.")
+    except JobAlreadyRunningError as e :
+        logger .info (str (e ))
+
+
+def init_profiling ():
+    'Sets the slow handlers threshold by the config and, where the signals are available (not on Windows),\n    starts the CPU profile on SIGUSR1 and the allocations diff on SIGUSR2 (the results are saved to `logs/profiles`).'
+    config =sett .get ("config")["profiling"]
+    set_slow_handler_threshold (config ["slow_handler_threshold"])
+
+    if not hasattr (signal ,"SIGUSR1")or threading .current_thread ()is not threading .main_thread ():
+        return 
+    try :
+        signal .signal (signal .SIGUSR1 ,_on_signal )
+        signal .signal (signal .SIGUSR2 ,_on_signal )
+    except (OSError ,ValueError )as e :
+        logger .error (f"{Fore .LIGHTRED_EX }Failed to set the profiling signals: {Fore .WHITE }{e }")
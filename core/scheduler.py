@@ -0,0 +1,302 @@
+import os 
+import json 
+import time 
+import heapq 
+import random 
+import itertools 
+import tempfile 
+from datetime import datetime ,timedelta 
+from threading import Thread ,Condition 
+from concurrent .futures import ThreadPoolExecutor 
+from colorama import Fore 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.scheduler")
+
+SCHEDULER_STATE_PATH ="bot_data/scheduler.json"
+DISABLED_RECHECK_INTERVAL =60 
+
+_scheduler =None 
+
+
+def init_scheduler (state_path :str =SCHEDULER_STATE_PATH ,max_workers :int =4 )->"Scheduler":
+    'Creates the jobs scheduler of the process.\n\n    :param state_path: Path to the file with the last run times of the jobs.\n    :type state_path: `str`\n\n    :param max_workers: Maximum number of jobs running at the same time.\n    :type max_workers: `int`\n\n    :return: Scheduler object.\n    :rtype: `core.scheduler.Scheduler`'
+    global _scheduler 
+    _scheduler =Scheduler (state_path ,max_workers )
+    return _scheduler 
+
+
+def get_scheduler ()->"Scheduler":
+    'Returns the jobs scheduler of the process (creates it on the first call).\n\n    :return: Scheduler object.\n    :rtype: `core.scheduler.Scheduler`'
+    if _scheduler is None :
+        return init_scheduler ()
+    return _scheduler 
+
+
+class IntervalTrigger :
+    'Trigger that runs the job at a fixed interval.\n\n    :param seconds: Interval in seconds or a function that returns it (e.g. from the config).\n    :type seconds: `int` or `float` or `callable`\n\n    :param jitter: Maximum random delay in seconds added to each run.\n    :type jitter: `int` or `float`'
+
+    def __init__ (self ,seconds :int |float ,jitter :int |float =0 ):
+        self .seconds =seconds 
+        self .jitter =jitter 
+
+    def get_next_run (self ,last_run :float |None ,now :float )->float :
+        if last_run is None :
+            return now 
+        interval =self .seconds ()if callable (self .seconds )else self .seconds 
+        return last_run +interval +random .uniform (0 ,self .jitter )
+
+
+class CronTrigger :
+    'Trigger that runs the job by a cron expression\n    (`minute hour day month weekday`, supports `*`, `*/n`, `a-b`, `a-b/n` and lists `a,b`).\n    Weekdays are numbered from 0 (Monday) to 6 (Sunday).\n\n    :param expression: Cron expression.\n    :type expression: `str`\n\n    :param jitter: Maximum random delay in seconds added to each run.\n    :type jitter: `int` or `float`'
+
+    RANGES =((0 ,59 ),(0 ,23 ),(1 ,31 ),(1 ,12 ),(0 ,6 ))
+
+    def __init__ (self ,expression :str ,jitter :int |float =0 ):
+        fields =expression .split ()
+        if len (fields )!=5 :
+            raise ValueError (f"Invalid cron expression \"{expression }\": 5 fields expected")
+
+        self .expression =expression 
+        self .jitter =jitter 
+        self .minutes ,self .hours ,self .days ,self .months ,self .weekdays =(
+        self ._parse_field (field ,low ,high )for field ,(low ,high )in zip (fields ,self .RANGES )
+        )
+
+    @staticmethod 
+    def _parse_field (field :str ,low :int ,high :int )->set [int ]:
+        values =set ()
+        for part in field .split (","):
+            step =1 
+            if "/"in part :
+                part ,step =part .split ("/")
+                step =int (step )
+            if part =="*":
+                start ,end =low ,high 
+            elif "-"in part :
+                start ,end =map (int ,part .split ("-"))
+            else :
+                start =end =int (part )
+            if start <low or end >high or step <1 :
+                raise ValueError (f"Invalid cron field \"{field }\"")
+            values .update (range (start ,end +1 ,step ))
+        return values 
+
+    def get_next_run (self ,last_run :float |None ,now :float )->float :
+        dt =datetime .fromtimestamp (now ).replace (second =0 ,microsecond =0 )+timedelta (minutes =1 )
+        limit =dt +timedelta (days =366 )
+        while dt <limit :
+            if dt .month not in self .months or dt .day not in self .days or dt .weekday ()not in self .weekdays :
+                dt =dt .replace (hour =0 ,minute =0 )+timedelta (days =1 )
+            elif dt .hour not in self .hours :
+                dt =dt .replace (minute =0 )+timedelta (hours =1 )
+            elif dt .minute not in self .minutes :
+                dt +=timedelta (minutes =1 )
+            else :
+                return dt .timestamp ()+random .uniform (0 ,self .jitter )
+        raise ValueError (f"Cron expression \"{self .expression }\" never fires")
+
+
+class Job :
+    'Scheduler job.\n\n    :param name: Unique job name.\n    :type name: `str`\n\n    :param func: Function to call (executed in the scheduler thread pool).\n    :type func: `callable`\n\n    :param trigger: Job trigger.\n    :type trigger: `core.scheduler.IntervalTrigger` or `core.scheduler.CronTrigger`\n\n    :param enabled: Function that returns whether the job is enabled now, _optional_.\n    :type enabled: `callable` or `None`\n\n    :param persist: Whether to save the last run time of the job between bot launches.\n    :type persist: `bool`\n\n    :param delay: Delay of the first run in seconds (if the job has never been run).\n    :type delay: `int` or `float`\n\n    :param pool: Name of the separate single-thread pool to run the job in, _optional_.\n    :type pool: `str` or `None`'
+
+    def __init__ (self ,name :str ,func :callable ,trigger :IntervalTrigger |CronTrigger ,
+    enabled :callable =None ,persist :bool =False ,delay :int |float =0 ,pool :str |None =None ):
+        self .name =name 
+        self .func =func 
+        self .trigger =trigger 
+        self .enabled =enabled 
+        self .persist =persist 
+        self .delay =delay 
+        self .pool =pool 
+
+        self .next_run :float |None =None 
+        'Next run time (timestamp).'
+        self .last_run :float |None =None 
+        'Last run time (timestamp).'
+        self .last_duration :float |None =None 
+        'Duration of the last run in seconds.'
+        self .max_duration :float =0 
+        'Longest run duration in seconds.'
+        self .runs :int =0 
+        'Number of runs.'
+        self .errors :int =0 
+        'Number of runs that ended with an error.'
+        self .overruns :int =0 
+        'Number of runs skipped because the previous run was still in progress.'
+        self .is_running :bool =False 
+        'Whether the job is running now.'
+
+
+class Scheduler :
+    'Jobs scheduler.\n    Keeps the jobs in a queue ordered by the next run time and sleeps\n    in a single thread until the nearest of them, jobs are run in a limited thread pool.\n    Long jobs are given their own pools (e.g. one per account), so they run one at a time\n    and do not take up the common pool from the short ones.\n\n    :param state_path: Path to the file with the last run times of the jobs.\n    :type state_path: `str`\n\n    :param max_workers: Maximum number of jobs running at the same time.\n    :type max_workers: `int`'
+
+    def __init__ (self ,state_path :str =SCHEDULER_STATE_PATH ,max_workers :int =4 ):
+        self .state_path =state_path 
+        self .jobs :dict [str ,Job ]={}
+
+        self ._queue :list [tuple [float ,int ,Job ]]=[]
+        self ._counter =itertools .count ()
+        self ._cond =Condition ()
+        self ._executor =ThreadPoolExecutor (max_workers =max_workers ,thread_name_prefix ="scheduler")
+        self ._pools :dict [str ,ThreadPoolExecutor ]={}
+        self ._thread :Thread |None =None 
+
+        try :
+            with open (self .state_path ,"r",encoding ="utf-8")as f :
+                self ._state :dict [str ,float ]=json .load (f )
+        except :
+            self ._state ={}
+
+    def _save_state (self ):
+        try :
+            dir_name =os .path .dirname (self .state_path )
+            os .makedirs (dir_name ,exist_ok =True )
+            with tempfile .NamedTemporaryFile (# atomic file write
+            "w",
+            encoding ="utf-8",
+            dir =dir_name ,
+            delete =False 
+            )as tmp :
+                json .dump (self ._state ,tmp ,indent =4 )
+            os .replace (tmp .name ,self .state_path )
+        except Exception as e :
+            logger .debug (f"Failed to save the scheduler state: {e }")
+
+    def _push (self ,job :Job ,run_at :float ):
+        job .next_run =run_at 
+        heapq .heappush (self ._queue ,(run_at ,next (self ._counter ),job ))
+        self ._cond .notify ()
+
+    def add_job (self ,name :str ,func :callable ,trigger :IntervalTrigger |CronTrigger ,
+    enabled :callable =None ,persist :bool =False ,delay :int |float =0 ,
+    last_run :float |None =None ,pool :str |None =None )->Job :
+        'Adds a job to the scheduler (a job with the same name is replaced).\n\n        :param name: Unique job name.\n        :type name: `str`\n\n        :param func: Function to call.\n        :type func: `callable`\n\n        :param trigger: Job trigger.\n        :type trigger: `core.scheduler.IntervalTrigger` or `core.scheduler.CronTrigger`\n\n        :param enabled: Function that returns whether the job is enabled now, _optional_.\n        :type enabled: `callable` or `None`\n\n        :param persist: Whether to save the last run time of the job between bot launches.\n        :type persist: `bool`\n\n        :param delay: Delay of the first run in seconds (if the job has never been run).\n        :type delay: `int` or `float`\n\n        :param last_run: Last run time, if it is known from elsewhere (used if there is no saved one), _optional_.\n        :type last_run: `float` or `None`\n\n        :param pool: Name of the separate single-thread pool to run the job in (for long jobs), _optional_.\n        :type pool: `str` or `None`\n\n        :return: Job object.\n        :rtype: `core.scheduler.Job`'
+        job =Job (name ,func ,trigger ,enabled ,persist ,delay ,pool )
+        if persist :
+            job .last_run =self ._state .get (name ,last_run )
+
+        with self ._cond :
+            if name in self .jobs :
+                self .jobs [name ].next_run =None # the old job is dropped from the queue
+            self .jobs [name ]=job 
+
+            now =time .time ()
+            if job .last_run is None and delay :
+                self ._push (job ,now +delay )
+            else :
+                self ._push (job ,max (now ,job .trigger .get_next_run (job .last_run ,now )))
+        return job 
+
+    def remove_job (self ,name :str ):
+        'Removes the job from the scheduler.\n\n        :param name: Job name.\n        :type name: `str`'
+        with self ._cond :
+            job =self .jobs .pop (name ,None )
+            if job :
+                job .next_run =None 
+
+    def get_job (self ,name :str )->Job |None :
+        'Returns the job by its name.\n\n        :param name: Job name.\n        :type name: `str`\n\n        :return: Job object.\n        :rtype: `core.scheduler.Job` or `None`'
+        return self .jobs .get (name )
+
+    def run_job_now (self ,name :str ):
+        'Moves the next run of the job to the current moment.\n\n        :param name: Job name.\n        :type name: `str`'
+        with self ._cond :
+            job =self .jobs .get (name )
+            if job :
+                self ._push (job ,time .time ())
+
+    def _run_job (self ,job :Job ):
+        started_at =time .time ()
+        try :
+            job .func ()
+        except Exception as e :
+            job .errors +=1 
+            logger .error (f"{Fore .LIGHTRED_EX }Error in scheduled job \"{job .name }\": {Fore .WHITE }{e }")
+        finally :
+            job .last_duration =time .time ()-started_at 
+            job .max_duration =max (job .max_duration ,job .last_duration )
+            job .runs +=1 
+            with self ._cond :
+                job .is_running =False 
+
+    def _get_executor (self ,job :Job )->ThreadPoolExecutor :
+        if job .pool is None :
+            return self ._executor 
+        if job .pool not in self ._pools :
+            self ._pools [job .pool ]=ThreadPoolExecutor (max_workers =1 ,thread_name_prefix =f"scheduler.{job .pool }")
+        return self ._pools [job .pool ]
+
+    def _dispatch (self ,job :Job ,now :float ):
+        try :enabled =not job .enabled or job .enabled ()
+        except Exception as e :
+            enabled =False 
+            logger .debug (f"Failed to check whether scheduled job \"{job .name }\" is enabled: {e }")
+        if not enabled :# disabled jobs are checked again from time to time
+            next_run =job .trigger .get_next_run (job .last_run ,now )
+            self ._push (job ,max (next_run ,now +DISABLED_RECHECK_INTERVAL ))
+            return 
+
+        if job .is_running :
+            job .overruns +=1 
+            logger .debug (f"Scheduled job \"{job .name }\" is still running, skipping its run")
+        else :
+            job .is_running =True 
+            job .last_run =now 
+            if job .persist :
+                self ._state [job .name ]=now 
+                self ._save_state ()
+            try :self ._get_executor (job ).submit (self ._run_job ,job )
+            except RuntimeError :# the interpreter is shutting down
+                job .is_running =False 
+                return 
+
+        next_run =job .trigger .get_next_run (job .last_run ,now )
+        if next_run <=now :# missed runs are skipped, not caught up
+            next_run =job .trigger .get_next_run (now ,now )
+        self ._push (job ,next_run )
+
+    def _loop (self ):
+        with self ._cond :
+            while True :
+                if not self ._queue :
+                    self ._cond .wait ()
+                    continue 
+
+                run_at ,_ ,job =self ._queue [0 ]
+                if job .next_run !=run_at or self .jobs .get (job .name )is not job :
+                    heapq .heappop (self ._queue )# outdated queue entry
+                    continue 
+
+                now =time .time ()
+                if run_at >now :
+                    self ._cond .wait (run_at -now )
+                    continue 
+
+                heapq .heappop (self ._queue )
+                self ._dispatch (job ,now )
+
+    def start (self ):
+        'Starts the scheduler thread.'
+        if self ._thread :
+            return 
+        self ._thread =Thread (target =self ._loop ,name ="scheduler",daemon =True )
+        self ._thread .start ()
+
+    def get_stats (self )->list [dict ]:
+        'Returns the statistics of the jobs.\n\n        :return: List of dictionaries with the job statistics.\n        :rtype: `list[dict]`'
+        return [
+        {
+        "name":job .name ,
+        "next_run":job .next_run ,
+        "last_run":job .last_run ,
+        "last_duration":job .last_duration ,
+        "max_duration":job .max_duration ,
+        "runs":job .runs ,
+        "errors":job .errors ,
+        "overruns":job .overruns ,
+        "is_running":job .is_running 
+        }
+        for job in list (self .jobs .values ())
+        ]
@@ -0,0 +1,117 @@
+import os 
+import time 
+import pickle 
+import tempfile 
+from threading import Lock 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.snapshot")
+
+SNAPSHOT_PATH ="bot_data/snapshot.pkl"
+SNAPSHOT_VERSION =3 
+SNAPSHOT_MAX_AGE =900 
+
+_snapshot_path =SNAPSHOT_PATH 
+_snapshot_providers :dict [str ,tuple [str ,callable ,callable ]]={}
+_restored_accounts :set [str ]=set ()
+_snapshot_lock =Lock ()
+
+
+def set_snapshot_path (path :str ):
+    'Sets the path to the snapshot file (each process must have its own file).\n\n    :param path: Path to the snapshot file.\n    :type path: `str`'
+    global _snapshot_path 
+    _snapshot_path =path 
+
+
+def add_snapshot_provider (name :str ,account_id :str ,getter :callable ,setter :callable ):
+    'Adds a state provider to the warm-restart snapshot.\n\n    :param name: Provider name (key in the snapshot).\n    :type name: `str`\n\n    :param account_id: ID of the account the state belongs to (state of another account is not restored).\n    :type account_id: `str`\n\n    :param getter: Function that returns the provider state (must be picklable).\n    :type getter: `callable`\n\n    :param setter: Function that restores the provider state from the snapshot.\n    :type setter: `callable`'
+    _snapshot_providers [name ]=(account_id ,getter ,setter )
+
+
+def save_snapshot ()->bool :
+    'Saves the state of all providers to the snapshot file.\n    The stored states of the accounts that have not restored their state yet are kept as they are,\n    so a save made while a slower account is still starting does not lose its state.\n\n    :return: True if the snapshot was saved, otherwise False.\n    :rtype: `bool`'
+    if not _snapshot_providers :
+        return False 
+
+    with _snapshot_lock :
+        try :
+            now =time .time ()
+            states ={
+            name :(account_id ,getter (),now )
+            for name ,(account_id ,getter ,_ )in list (_snapshot_providers .items ())
+            if account_id in _restored_accounts 
+            }
+            stored =load_snapshot ()
+            for name ,(account_id ,state ,saved_at )in (stored ["states"].items ()if stored else ()):
+                if name not in states and account_id not in _restored_accounts and now -saved_at <=SNAPSHOT_MAX_AGE :
+                    states [name ]=(account_id ,state ,saved_at )
+            snapshot ={
+            "version":SNAPSHOT_VERSION ,
+            "saved_at":now ,
+            "states":states 
+            }
+
+            dir_name =os .path .dirname (_snapshot_path )
+            os .makedirs (dir_name ,exist_ok =True )
+            with tempfile .NamedTemporaryFile (# atomic file write
+            "wb",
+            dir =dir_name ,
+            delete =False 
+            )as tmp :
+                pickle .dump (snapshot ,tmp ,protocol =pickle .HIGHEST_PROTOCOL )
+                tmp .flush ()
+                os .fsync (tmp .fileno ())
+
+            os .replace (tmp .name ,_snapshot_path )
+            return True 
+        except Exception as e :
+            logger .debug (f"Failed to save state snapshot: {e }")
+            return False 
+
+
+def load_snapshot (max_age :int =SNAPSHOT_MAX_AGE )->dict |None :
+    'Loads the snapshot file and checks its validity.\n\n    :param max_age: Maximum snapshot age in seconds.\n    :type max_age: `int`\n\n    :return: Snapshot dictionary or None if the snapshot is missing or invalid.\n    :rtype: `dict` or `None`'
+    if not os .path .exists (_snapshot_path ):
+        return None 
+
+    try :
+        with open (_snapshot_path ,"rb")as f :
+            snapshot =pickle .load (f )
+    except Exception as e :
+        logger .debug (f"Failed to read state snapshot: {e }")
+        return None 
+
+    if not isinstance (snapshot ,dict )or snapshot .get ("version")!=SNAPSHOT_VERSION :
+        logger .debug ("State snapshot was made by another bot version, ignoring it")
+        return None 
+    age =time .time ()-snapshot .get ("saved_at",0 )
+    if age <0 or age >max_age :
+        logger .debug (f"State snapshot is too old ({int (age )} s), ignoring it")
+        return None 
+    return snapshot 
+
+
+def restore_snapshot (account_id :str ,max_age :int =SNAPSHOT_MAX_AGE )->list [str ]:
+    'Restores the state of the account providers from the snapshot.\n    The providers of the account must be added before, their state is saved to the snapshot\n    only after this call.\n\n    :param account_id: Account ID.\n    :type account_id: `str`\n\n    :param max_age: Maximum age of the restored states in seconds.\n    :type max_age: `int`\n\n    :return: Names of the providers whose state was restored.\n    :rtype: `list[str]`'
+    restored =[]
+    oldest_saved_at =None 
+    with _snapshot_lock :# a save does not take the state of the account in the middle of its restoring
+        snapshot =load_snapshot (max_age )
+        _restored_accounts .add (account_id )
+        for name ,(state_account_id ,state ,saved_at )in (snapshot ["states"].items ()if snapshot else ()):
+            if name not in _snapshot_providers or state_account_id !=account_id :
+                continue 
+            provider_account_id ,_ ,setter =_snapshot_providers [name ]
+            if provider_account_id !=account_id or time .time ()-saved_at >max_age :
+                continue 
+            try :
+                setter (state ,saved_at )
+                restored .append (name )
+                oldest_saved_at =min (oldest_saved_at or saved_at ,saved_at )
+            except Exception as e :
+                logger .debug (f"Failed to restore \"{name }\" state from snapshot: {e }")
+
+    if restored :
+        logger .info (f"State restored from the snapshot made {int (time .time ()-oldest_saved_at )} s ago")
+    return restored 
@@ -0,0 +1,134 @@
+import time 
+import asyncio 
+from colorama import Fore 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.startup")
+_startup =None 
+
+
+def get_startup ():
+    'Returns the current startup orchestrator.\n\n    :return: Startup orchestrator object.\n    :rtype: `core.startup.Startup` or `None`'
+    return _startup 
+
+
+class StartupStep :
+    'Bot launch step.\n\n    :param name: Step name.\n    :type name: `str`\n\n    :param func: Function to call. Regular functions are executed in a separate thread, coroutine functions in the main loop.\n    :type func: `callable`\n\n    :param args: Function arguments.\n    :type args: `list`\n\n    :param requires: Names of the steps that must be completed before this step.\n    :type requires: `list[str]`\n\n    :param background: Whether the step is executed in the background, without delaying the end of the launch.\n    :type background: `bool`'
+
+    def __init__ (self ,name :str ,func :callable ,args :list =[],
+    requires :list [str ]=[],background :bool =False ):
+        self .name =name 
+        self .func =func 
+        self .args =list (args )
+        self .requires =list (requires )
+        self .background =background 
+
+        self .started_at :float |None =None 
+        'Start time (relative to the start of the launch).'
+        self .finished_at :float |None =None 
+        'End time (relative to the start of the launch).'
+        self .error :Exception |None =None 
+        'Error that occurred during execution.'
+
+    @property 
+    def duration (self )->float |None :
+        if self .started_at is None or self .finished_at is None :
+            return None 
+        return self .finished_at -self .started_at 
+
+
+class Startup :
+    'Bot launch orchestrator.\n    Runs independent steps at the same time, respecting the dependencies between them,\n    and prints a timing report for each step.'
+
+    def __init__ (self ):
+        global _startup 
+        _startup =self 
+
+        self .steps :dict [str ,StartupStep ]={}
+        self .created_at =time .perf_counter ()
+        self .finished_at :float |None =None 
+        self .first_event_at :float |None =None 
+
+        self ._tasks :dict [str ,asyncio .Task ]={}
+
+    def add_step (self ,name :str ,func :callable ,args :list =[],
+    requires :list [str ]=[],background :bool =False )->StartupStep :
+        'Adds a launch step.\n        Dependencies must be added before the steps that require them.\n\n        :param name: Step name.\n        :type name: `str`\n\n        :param func: Function to call.\n        :type func: `callable`\n\n        :param args: Function arguments.\n        :type args: `list`\n\n        :param requires: Names of the steps that must be completed before this step.\n        :type requires: `list[str]`\n\n        :param background: Whether the step is executed in the background.\n        :type background: `bool`\n\n        :return: Step object.\n        :rtype: `core.startup.StartupStep`'
+        if name in self .steps :
+            raise ValueError (f'Step "{name }" has already been added')
+        for req in requires :
+            if req not in self .steps :
+                raise ValueError (f'Step "{name }" requires unknown step "{req }"')
+
+        step =StartupStep (name ,func ,args ,requires ,background )
+        self .steps [name ]=step 
+        return step 
+
+    def _now (self )->float :
+        return time .perf_counter ()-self .created_at 
+
+    async def _run_step (self ,step :StartupStep ):
+        for req in step .requires :
+            await asyncio .shield (self ._tasks [req ])
+
+        step .started_at =self ._now ()
+        try :
+            if asyncio .iscoroutinefunction (step .func ):
+                await step .func (*step .args )
+            else :
+                await asyncio .to_thread (step .func ,*step .args )
+        except Exception as e :
+            step .error =e 
+            raise 
+        finally :
+            step .finished_at =self ._now ()
+
+    def _on_background_done (self ,task :asyncio .Task ):
+        step =self .steps [task .get_name ()]
+        if task .cancelled ():
+            return 
+        if task .exception ():
+            logger .error (f"{Fore .LIGHTRED_EX }Background launch step \"{step .name }\" failed: {Fore .WHITE }{task .exception ()}")
+        else :
+            logger .debug (f"Background launch step \"{step .name }\" finished in {step .duration :.2f} s.")
+
+    async def run (self ):
+        'Runs all launch steps and waits for the completion of all non-background ones.'
+        for step in self .steps .values ():
+            task =asyncio .create_task (self ._run_step (step ),name =step .name )
+            if step .background :
+                task .add_done_callback (self ._on_background_done )
+            self ._tasks [step .name ]=task 
+
+        await asyncio .gather (*[
+        task for name ,task in self ._tasks .items ()
+        if not self .steps [name ].background 
+        ])
+
+        self .finished_at =self ._now ()
+        self .log_report ()
+
+    def log_report (self ):
+        'Prints the timing report of the launch steps.'
+        logger .info ("")
+        logger .info (f"{Fore .YELLOW }───────────────────────────────────────")
+        logger .info (f"{Fore .YELLOW }Launch timing:")
+        for step in self .steps .values ():
+            if step .duration is None :
+                status =f"{Fore .LIGHTBLACK_EX }in the background..."if step .background else f"{Fore .LIGHTBLACK_EX }not completed"
+                logger .info (f"· {step .name }: {status }")
+                continue 
+            logger .info (
+            f"· {step .name }: {Fore .LIGHTWHITE_EX }{step .duration :.2f} s "
+            f"{Fore .WHITE }({step .started_at :.2f} → {step .finished_at :.2f})"
+            )
+        logger .info (f"· Total: {Fore .LIGHTWHITE_EX }{self .finished_at :.2f} s")
+        logger .info (f"{Fore .YELLOW }───────────────────────────────────────")
+
+    def mark_first_event (self ):
+        'Marks the handling of the first Playerok event (only the first call is taken into account).'
+        if self .first_event_at is not None :
+            return 
+        self .first_event_at =self ._now ()
+        logger .info (f"{Fore .YELLOW }First Playerok event handled in {Fore .LIGHTWHITE_EX }{self .first_event_at :.2f} s {Fore .YELLOW }after launch")
@@ -0,0 +1,316 @@
+import os 
+import sys 
+import time 
+import asyncio 
+import secrets 
+import itertools 
+import subprocess 
+from threading import Thread ,Lock 
+from concurrent .futures import Future 
+from multiprocessing .connection import Listener ,Client ,Connection 
+from colorama import Fore 
+from logging import getLogger 
+
+
+logger =getLogger ("universal.supervisor")
+
+SUPERVISOR_ADDRESS_ENV ="PLAYEROK_SUPERVISOR_ADDRESS"
+SUPERVISOR_KEY_ENV ="PLAYEROK_SUPERVISOR_KEY"
+HEARTBEAT_INTERVAL =15 
+HEARTBEAT_TIMEOUT =90 
+ACCOUNT_CALL_TIMEOUT =60 
+
+_supervisor =None 
+_worker =None 
+
+
+def get_supervisor ()->"Supervisor | None":
+    'Returns the supervisor of the worker processes (only in the main process).\n\n    :return: Supervisor object.\n    :rtype: `core.supervisor.Supervisor` or `None`'
+    return _supervisor 
+
+
+def get_worker ()->"WorkerClient | None":
+    'Returns the connection of the worker process to the supervisor (only in the worker processes).\n\n    :return: Worker client object.\n    :rtype: `core.supervisor.WorkerClient` or `None`'
+    return _worker 
+
+
+def is_in_shard (index :int ,worker_index :int |None ,workers_count :int )->bool :
+    'Checks whether the additional account belongs to the shard of the process.\n    Without workers all accounts belong to the main process.\n\n    :param index: Account index in the accounts list.\n    :type index: `int`\n\n    :param worker_index: Index of the worker process (None - main process).\n    :type worker_index: `int` or `None`\n\n    :param workers_count: Number of worker processes.\n    :type workers_count: `int`\n\n    :return: True if the account must be started in this process.\n    :rtype: `bool`'
+    if workers_count <=0 :
+        return worker_index is None 
+    return worker_index is not None and index %workers_count ==worker_index 
+
+
+class AccountProxy :
+    'Proxy to the bot of an account run in a worker process.\n    Attributes are resolved and methods are called in the worker (e.g. `proxy.account.update_deal(...)`),\n    the call blocks until the worker returns the result.\n\n    :param supervisor: Supervisor of the worker processes.\n    :type supervisor: `core.supervisor.Supervisor`\n\n    :param namespace: Account name.\n    :type namespace: `str`\n\n    :param path: Path to the attribute of the bot, _optional_.\n    :type path: `str`'
+
+    def __init__ (self ,supervisor :"Supervisor",namespace :str ,path :str =""):
+        self ._supervisor =supervisor 
+        self ._namespace =namespace 
+        self ._path =path 
+
+    def __getattr__ (self ,name :str )->"AccountProxy":
+        if name .startswith ("_"):
+            raise AttributeError (name )
+        return AccountProxy (self ._supervisor ,self ._namespace ,f"{self ._path }.{name }"if self ._path else name )
+
+    def __call__ (self ,*args ,**kwargs ):
+        return self ._supervisor .call_account (self ._namespace ,self ._path ,args ,kwargs )
+
+
+class WorkerProcess :
+    'Worker process launched by the supervisor.\n\n    :param index: Worker index.\n    :type index: `int`'
+
+    def __init__ (self ,index :int ):
+        self .index =index 
+        self .process :subprocess .Popen |None =None 
+        self .conn :Connection |None =None 
+        self .started_at :float =0 
+        self .last_heartbeat :float =0 
+        self .restarts :int =0 
+        self .next_restart_at :float |None =None 
+        self .stats :dict ={}
+
+    @property 
+    def is_alive (self )->bool :
+        return self .process is not None and self .process .poll ()is None 
+
+
+class Supervisor :
+    'Supervisor of the worker processes.\n    Each worker runs its own shard of the additional accounts, sends heartbeats\n    and statistics, forwards Telegram bot calls to the main process\n    and handles the calls of the main process to the bots of its accounts.\n    A crashed or hung worker is restarted without touching the others.\n\n    :param workers_count: Number of worker processes.\n    :type workers_count: `int`'
+
+    def __init__ (self ,workers_count :int ):
+        global _supervisor 
+        _supervisor =self 
+
+        self .workers_count =workers_count 
+        self .workers :dict [int ,WorkerProcess ]={i :WorkerProcess (i )for i in range (workers_count )}
+
+        self ._authkey =secrets .token_bytes (32 )
+        self ._listener =Listener (("127.0.0.1",0 ),authkey =self ._authkey )
+        self ._lock =Lock ()
+        self ._is_stopped =False 
+        self ._send_lock =Lock ()
+        self ._calls :dict [int ,Future ]={}
+        self ._calls_counter =itertools .count ()
+
+    def _start_worker (self ,worker :WorkerProcess ):
+        env =os .environ .copy ()
+        env [SUPERVISOR_ADDRESS_ENV ]="%s:%d"%self ._listener .address 
+        env [SUPERVISOR_KEY_ENV ]=self ._authkey .hex ()
+
+        worker .process =subprocess .Popen (
+        [sys .executable ,sys .argv [0 ],"--worker",str (worker .index ),"--workers",str (self .workers_count )],
+        env =env 
+        )
+        worker .started_at =worker .last_heartbeat =time .time ()
+        logger .info (f"{Fore .YELLOW }Worker process #{worker .index } started (PID {worker .process .pid })")
+
+    def _stop_worker (self ,worker :WorkerProcess ):
+        if worker .conn :
+            try :worker .conn .close ()
+            except :pass 
+            worker .conn =None 
+        if worker .is_alive :
+            worker .process .terminate ()
+            try :worker .process .wait (10 )
+            except subprocess .TimeoutExpired :worker .process .kill ()
+
+    def _accept_loop (self ):
+        while True :
+            try :
+                conn =self ._listener .accept ()
+                hello =conn .recv ()
+                worker =self .workers [hello ["worker"]]
+            except Exception as e :
+                logger .debug (f"Failed to accept worker connection: {e }")
+                continue 
+            worker .conn =conn 
+            worker .last_heartbeat =time .time ()
+            Thread (target =self ._receive_loop ,args =(worker ,conn ),daemon =True ).start ()
+
+    def _receive_loop (self ,worker :WorkerProcess ,conn :Connection ):
+        while True :
+            try :msg =conn .recv ()
+            except (EOFError ,OSError ):return 
+
+            worker .last_heartbeat =time .time ()
+            if msg ["type"]=="heartbeat":
+                worker .stats =msg ["stats"]
+            elif msg ["type"]=="telegram":
+                self ._call_telegram_bot (msg ["method"],msg ["args"],msg ["kwargs"])
+            elif msg ["type"]=="result":
+                future =self ._calls .pop (msg ["id"],None )
+                if future :
+                    future .set_result (msg )
+
+    def _call_telegram_bot (self ,method :str ,args :tuple ,kwargs :dict ):
+        from tgbot .telegrambot import get_telegram_bot ,get_telegram_bot_loop 
+        try :
+            asyncio .run_coroutine_threadsafe (
+            getattr (get_telegram_bot (),method )(*args ,**kwargs ),
+            get_telegram_bot_loop ()
+            )
+        except Exception as e :
+            logger .error (f"{Fore .LIGHTRED_EX }Error calling the Telegram bot from a worker process: {Fore .WHITE }{e }")
+
+    def _health_loop (self ):
+        while True :
+            time .sleep (5 )
+            for worker in self .workers .values ():
+                with self ._lock :
+                    if self ._is_stopped :
+                        return 
+                    if worker .next_restart_at is not None :
+                        if time .time ()>=worker .next_restart_at :
+                            worker .next_restart_at =None 
+                            worker .restarts +=1 
+                            self ._start_worker (worker )
+                        continue 
+
+                    if not worker .is_alive :
+                        reason =f"exited with code {worker .process .returncode }"
+                    elif time .time ()-worker .last_heartbeat >HEARTBEAT_TIMEOUT :
+                        reason =f"has not responded for {HEARTBEAT_TIMEOUT } s"
+                    else :
+                        continue 
+
+                    logger .error (f"{Fore .LIGHTRED_EX }Worker process #{worker .index } {reason }, restarting it...")
+                    self ._stop_worker (worker )
+                    # a worker that keeps crashing is restarted less often, the others are checked meanwhile
+                    if time .time ()-worker .started_at <60 :
+                        worker .next_restart_at =time .time ()+min (60 ,5 *2 **min (worker .restarts ,4 ))
+                        continue 
+                    worker .restarts +=1 
+                    self ._start_worker (worker )
+
+    def start (self ):
+        'Starts the worker processes and their health checks.'
+        Thread (target =self ._accept_loop ,daemon =True ).start ()
+        for worker in self .workers .values ():
+            self ._start_worker (worker )
+        Thread (target =self ._health_loop ,daemon =True ).start ()
+
+    def stop (self ):
+        'Stops all worker processes.'
+        with self ._lock :
+            self ._is_stopped =True 
+            for worker in self .workers .values ():
+                self ._stop_worker (worker )
+
+    def get_account_worker (self ,namespace :str )->WorkerProcess |None :
+        'Returns the worker process that runs the additional account.\n\n        :param namespace: Account name.\n        :type namespace: `str`\n\n        :return: Worker process object or None if the account is not in the accounts list.\n        :rtype: `core.supervisor.WorkerProcess` or `None`'
+        from settings import Settings as sett 
+        accounts =[str (account )for account in sett .get ("accounts")or []]
+        if namespace not in accounts :
+            return None 
+        return self .workers [accounts .index (namespace )%self .workers_count ]
+
+    def get_account_proxy (self ,namespace :str )->AccountProxy |None :
+        'Returns the proxy to the bot of the additional account run in a worker process.\n\n        :param namespace: Account name.\n        :type namespace: `str`\n\n        :return: Account proxy object or None if no worker runs this account.\n        :rtype: `core.supervisor.AccountProxy` or `None`'
+        if self .get_account_worker (namespace )is None :
+            return None 
+        return AccountProxy (self ,namespace )
+
+    def call_account (self ,namespace :str ,method :str ,args :tuple =(),kwargs :dict ={},
+    timeout :float =ACCOUNT_CALL_TIMEOUT ):
+        'Calls the method of the bot of the additional account in its worker process.\n\n        :param namespace: Account name.\n        :type namespace: `str`\n\n        :param method: Path to the method of `plbot.playerokbot.PlayerokBot` (e.g. `account.update_deal`).\n        :type method: `str`\n\n        :param args: Method arguments.\n        :type args: `tuple`\n\n        :param kwargs: Method keyword arguments.\n        :type kwargs: `dict`\n\n        :param timeout: Maximum time to wait for the result in seconds.\n        :type timeout: `float`\n\n        :return: Result of the method.'
+        worker =self .get_account_worker (namespace )
+        if worker is None or not worker .conn :
+            raise Exception (f"Account \"{namespace }\" is not running in any worker process")
+
+        call_id =next (self ._calls_counter )
+        future =self ._calls [call_id ]=Future ()
+        try :
+            with self ._send_lock :
+                worker .conn .send ({
+                "type":"call","id":call_id ,"namespace":namespace ,
+                "method":method ,"args":args ,"kwargs":kwargs 
+                })
+            msg =future .result (timeout )
+        finally :
+            self ._calls .pop (call_id ,None )
+        if msg ["error"]:
+            raise Exception (msg ["error"])
+        return msg ["result"]
+
+    def get_stats (self )->dict :
+        'Returns the aggregated statistics of the worker processes.\n\n        :return: Dictionary with the statistics of each worker and their totals.\n        :rtype: `dict`'
+        workers ={
+        worker .index :{
+        "alive":worker .is_alive ,
+        "pid":worker .process .pid if worker .process else None ,
+        "uptime":int (time .time ()-worker .started_at )if worker .is_alive else 0 ,
+        "restarts":worker .restarts ,
+        **worker .stats 
+        }
+        for worker in self .workers .values ()
+        }
+        return {
+        "workers":workers ,
+        "alive":sum (1 for worker in workers .values ()if worker ["alive"]),
+        "accounts":sum (len (worker .get ("accounts",[]))for worker in workers .values ())
+        }
+
+
+class WorkerClient :
+    'Connection of the worker process to the supervisor.\n\n    :param index: Worker index.\n    :type index: `int`\n\n    :param stats_func: Function that returns the worker statistics for the heartbeats.\n    :type stats_func: `callable`\n\n    :param call_func: Function that calls the method of the account bot for the supervisor\n        (arguments: account name, path to the method, args, kwargs).\n    :type call_func: `callable`'
+
+    def __init__ (self ,index :int ,stats_func :callable ,call_func :callable ):
+        global _worker 
+        _worker =self 
+
+        self .index =index 
+        self .stats_func =stats_func 
+        self .call_func =call_func 
+
+        host ,port =os .environ [SUPERVISOR_ADDRESS_ENV ].split (":")
+        self ._conn =Client ((host ,int (port )),authkey =bytes .fromhex (os .environ [SUPERVISOR_KEY_ENV ]))
+        self ._lock =Lock ()
+        self .send ({"type":"hello","worker":index })
+
+    def send (self ,msg :dict ):
+        'Sends a message to the supervisor.\n        If the supervisor is gone, the worker process is stopped.\n\n        :param msg: Message.\n        :type msg: `dict`'
+        try :
+            with self ._lock :
+                self ._conn .send (msg )
+        except (OSError ,EOFError ):
+            logger .critical (f"{Fore .LIGHTRED_EX }Lost connection to the supervisor, stopping the worker process")
+            os ._exit (1 )
+
+    def call_telegram_bot (self ,method :str ,*args ,**kwargs ):
+        'Calls the Telegram bot method in the main process.\n\n        :param method: Name of the `tgbot.telegrambot.TelegramBot` method.\n        :type method: `str`'
+        self .send ({"type":"telegram","method":method ,"args":args ,"kwargs":kwargs })
+
+    def _call (self ,msg :dict ):
+        try :
+            result ={"result":self .call_func (msg ["namespace"],msg ["method"],msg ["args"],msg ["kwargs"]),"error":None }
+        except Exception as e :
+            result ={"result":None ,"error":str (e )or e .__class__ .__name__ }
+        try :
+            self .send ({"type":"result","id":msg ["id"],**result })
+        except Exception as e :# the result could not be pickled
+            self .send ({"type":"result","id":msg ["id"],"result":None ,"error":str (e )})
+
+    def _receive_loop (self ):
+        while True :
+            try :msg =self ._conn .recv ()
+            except (EOFError ,OSError ):
+                logger .critical (f"{Fore .LIGHTRED_EX }Lost connection to the supervisor, stopping the worker process")
+                os ._exit (1 )
+            if msg ["type"]=="call":
+                Thread (target =self ._call ,args =(msg ,),daemon =True ).start ()
+
+    def _heartbeat_loop (self ):
+        while True :
+            try :stats =self .stats_func ()
+            except Exception as e :
+                stats ={}
+                logger .debug (f"Failed to collect worker stats: {e }")
+            self .send ({"type":"heartbeat","stats":stats })
+            time .sleep (HEARTBEAT_INTERVAL )
+
+    def start (self ):
+        'Starts sending heartbeats to the supervisor and handling its calls.\n        If the supervisor is gone (e.g. the main process has exited or restarted), the worker process is stopped at once.'
+        Thread (target =self ._heartbeat_loop ,daemon =True ).start ()
+        Thread (target =self ._receive_loop ,daemon =True ).start ()
@@ -14,6 +14,11 @@ from colorlog import ColoredFormatter
 from threading import Thread 
 from logging import getLogger 
 
+from playerokapi .metrics import get_metrics 
+from core .snapshot import save_snapshot 
+from core .supervisor import get_supervisor 
+from core .journal import flush_journals 
+
 
 logger =getLogger ("universal.utils")
 main_loop =None 
@@ -29,6 +34,8 @@ def get_main_loop ():
 
 
 def shutdown ():
+    save_snapshot ()
+    flush_journals ()
     for task in asyncio .all_tasks (main_loop ):
         task .cancel ()
     main_loop .call_soon_threadsafe (main_loop .stop )
@@ -42,6 +49,10 @@ def restart (from_tg =False ):
         args .append ("--from_tg")
 
     logger .info ('Restarting the bot...')
+    save_snapshot ()
+    flush_journals ()
+    if get_supervisor ():# os.execv does not run the atexit handlers
+        get_supervisor ().stop ()
     os .execv (python ,[python ]+args )
 
 
@@ -178,6 +189,11 @@ def patch_requests ():
                 else :
                     return resp 
 
+            get_metrics ().inc (
+            "playerok_request_retries_total",
+            operation =(kwargs .get ("headers")or {}).get ("x-gql-op","unknown"),
+            reason =err 
+            )
             retry_hdr =resp .headers .get ("Retry-After")
             try :delay =float (retry_hdr )if retry_hdr else min (120.0 ,5.0 *(2 **attempt ))
             except :delay =min (120.0 ,5.0 *(2 **attempt ))
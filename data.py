@@ -1,6 +1,6 @@
 import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 
 @dataclass
@@ -36,6 +36,38 @@ LATEST_EVENTS_TIMES = DataFile(
 DATA = [INITIALIZED_USERS, SAVED_ITEMS, CACHED_ORDERS, LATEST_EVENTS_TIMES]
 
 
+def get_data_dir(namespace: str | None) -> str:
+    """Returns the data folder of the account namespace.
+
+    :param namespace: Account namespace (None - main account).
+    :type namespace: `str` or `None`
+
+    :return: Path to the data folder.
+    :rtype: `str`"""
+    if not namespace:
+        return "bot_data"
+    return os.path.join("bot_data", "accounts", namespace)
+
+
+def get_namespace_files(namespace: str | None, data: list[DataFile] = DATA) -> list[DataFile]:
+    """Returns the data files of the account namespace.
+
+    :param namespace: Account namespace (None - main account).
+    :type namespace: `str` or `None`
+
+    :param data: Data files.
+    :type data: `list[DataFile]`
+
+    :return: Data files of the namespace.
+    :rtype: `list[DataFile]`"""
+    if not namespace:
+        return data
+    return [
+        replace(file, path=os.path.join(get_data_dir(namespace), os.path.basename(file.path)))
+        for file in data
+    ]
+
+
 def get_json(path: str, default: dict | list) -> dict:
     """Gets the contents of a data file.
     Creates a data file if it does not exist.
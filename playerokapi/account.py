@@ -8,6 +8,11 @@ import os
 import tempfile 
 import shutil 
 import uuid 
+import hashlib 
+from threading import Lock 
+from collections import OrderedDict 
+from concurrent .futures import ThreadPoolExecutor 
+from datetime import datetime 
 
 import tls_requests 
 import curl_cffi 
@@ -16,6 +21,10 @@ from .import types
 from .exceptions import *
 from .parser import *
 from .enums import *
+from .chat_directory import ChatDirectory 
+from .account_state import AccountState 
+from .reference_cache import ReferenceCache ,reference_data 
+from .metrics import get_metrics 
 from .misc import (
 PERSISTED_QUERIES ,
 QUERIES 
@@ -24,19 +33,44 @@ QUERIES
 
 logger =getLogger ("playerokapi")
 
+BASE_URL ="https://playerok.com"
+WS_URL ="wss://ws.playerok.com/graphql"
+CHAT_SCAN_MAX_PAGES =20 
+IMAGE_UPLOAD_WORKERS =4 
+IMAGE_CACHE_MAX_SIZE =500 
+IMAGE_CACHE_TTL =3600 
+IMAGE_CACHE_EXPIRY_MARGIN =60 
+
+
+def _get_file_hash (file_path :str )->str :
+    file_hash =hashlib .sha256 ()
+    with open (file_path ,"rb")as f :
+        for chunk in iter (lambda :f .read (65536 ),b""):
+            file_hash .update (chunk )
+    return file_hash .hexdigest ()
+
+
+def _get_timestamp (iso_dt :str |None )->float :
+    if not iso_dt :
+        return 0 
+    if iso_dt .endswith ("Z"):
+        iso_dt =iso_dt [:-1 ]+"+00:00"
+    try :return datetime .fromisoformat (iso_dt ).timestamp ()
+    except ValueError :return 0 
+
 
 def get_account ()->Account |None :
     if hasattr (Account ,"instance"):
         return getattr (Account ,"instance")
 
 
+def set_account (account :Account ):
+    'Makes the account the default one (used by the types methods when no account is passed).\n\n    :param account: Account object.\n    :type account: `playerokapi.account.Account`'
+    Account .instance =account 
+
+
 class Account :
     'A class that describes Playerok account data and methods.\n\n    :param token: Account token.\n    :type token: `str` or `None`\n\n    :param ddg5: Cookie for bypassing DDoS-Guard protection (full name: `__ddg5_`).\n                \n **Note:** This Cookie "dies" every time:\n                \n - IP changes\n                \n - User-Agent / TLS fingerprint changes\n                \n - the server updated the keys/algorithm\n                \n For the API to work, this Cookie must be taken from the Cookie data of the account whose token you specified, and requests must come from the same IP address under which you logged in to Playerok.\n                \n If it is invalid, queries will throw a `BotCheckDetectedException` exception.\n    :type ddg5: `str`\n\n    :param user_agent: Browser user agent.\n    :type user_agent: `str` or `None`\n\n    :param cookies: Cookie data of the authorized account. You can specify instead of the parameters `token`, `ddg5`, `user_agent`.\n    :type cookies: `str` or `dict[str, str]` or `None`\n\n    :param proxy: IPV4 proxy in the format: `user:pass@ip:port` or `ip:port`, _optional_.\n    :type proxy: `str` or `None`\n\n    :param requests_timeout: Timeout for waiting for responses to requests.\n    :type requests_timeout: `int`'
-    def __new__ (cls ,*args ,**kwargs )->Account :
-        if not hasattr (cls ,"instance"):
-            cls .instance =super (Account ,cls ).__new__ (cls )
-        return getattr (cls ,"instance")
-
     def __init__ (
     self ,
     token :str =None ,
@@ -83,9 +117,12 @@ class Account :
         self .__proxy_string =f"http://{self .proxy .replace ('https://','').replace ('http://','')}"if self .proxy else None 
         'Proxy string.'
 
-        self .base_url ="https://playerok.com"
+        self .base_url =BASE_URL 
         'Base URL for all requests.'
 
+        self .ws_url =WS_URL 
+        'WebSocket URL of the subscriptions.'
+
         self .id :str |None =None 
         'Account ID. \n\n_Filled in when get() is used for the first time_'
         self .username :str |None =None 
@@ -117,9 +154,25 @@ class Account :
         self .profile :AccountProfile |None =None 
         'Account profile (not to be confused with user profile). \n\n_Filled in when get() is used for the first time_'
 
+        self .chat_directory =ChatDirectory ()
+        'Directory of the account chats (username → chat ID, chat ID → chat).'
+
+        self .state =AccountState (self )
+        'Cached account state (viewer data, profile and balance).'
+
+        self .reference_cache =ReferenceCache ()
+        'Cache of the reference data (games, categories, banks, transaction providers).'
+
+        self .image_upload_stats :dict [str ,int ]={"uploads":0 ,"cache_hits":0 }
+        'Statistics of the chat image uploads.'
+
         self ._is_initiated =False 
         'Whether the account has been initialized.'
 
+        self ._image_cache :OrderedDict [tuple [str ,str ],tuple [str ,float ]]=OrderedDict ()
+        'Uploaded temporary attachments: (chat ID, file hash) → (attachment ID, expiration timestamp).'
+        self ._image_cache_lock =Lock ()
+
         self ._cert_path =os .path .join (os .path .dirname (__file__ ),"cacert.pem")
         self ._tmp_cert_path =os .path .join (tempfile .gettempdir (),"cacert.pem")
         shutil .copyfile (self ._cert_path ,self ._tmp_cert_path )
@@ -212,6 +265,7 @@ class Account :
                     return r 
                 except Exception as e :
                     err =str (e )
+                    metrics .inc ("playerok_request_retries_total",operation =x_gql_op ,reason ="send_error")
                     logger .debug (f"Error sending request:{e }")
                     logger .debug (f"I'm sending the request again...")
 
@@ -226,7 +280,15 @@ class Account :
         "Cloudflare Ray ID"
         ]
 
-        resp =make_req ()
+        metrics =get_metrics ()
+        started =time .perf_counter ()
+        try :
+            resp =make_req ()
+        except RequestSendingError :
+            metrics .inc ("playerok_requests_total",operation =x_gql_op ,status ="error")
+            raise 
+        metrics .inc ("playerok_requests_total",operation =x_gql_op ,status =resp .status_code )
+        metrics .observe ("playerok_request_duration_seconds",time .perf_counter ()-started ,operation =x_gql_op )
         if any (sig in resp .text for sig in sigs ):
             raise BotCheckDetectedException ()
 
@@ -249,8 +311,8 @@ class Account :
 
         return resp 
 
-    def get (self )->Account :
-        'Retrieves/updates account information.\n\n        :return: Account object with updated data.\n        :rtype: `playerokapi.account.Account`'
+    def get (self ,with_profile :bool =True )->Account :
+        'Retrieves/updates account information.\n\n        :param with_profile: Also update the account profile (one more request), _optional_.\n        :type with_profile: `bool`\n\n        :return: Account object with updated data.\n        :rtype: `playerokapi.account.Account`'
         headers ={"accept":"*/*"}
         payload ={
         "operationName":"viewer",
@@ -278,7 +340,11 @@ class Account :
         self .has_confirmed_phone_number =data .get ("hasConfirmedPhoneNumber")
         self .can_publish_items =data .get ("canPublishItems")
         self .unread_chats_counter =data .get ("unreadChatsCounter")
+        self .chat_directory .owner_id =self .id 
+        self .state .viewer_updated_at =time .time ()
         self ._is_initiated =True 
+        if not with_profile and self .profile is not None :
+            return self 
 
         headers ={"accept":"*/*"}
         payload ={
@@ -300,9 +366,32 @@ class Account :
 
         if data .get ("__typename")=="User":
             self .profile =account_profile (data )
+            self .state .profile_updated_at =self .state .balance_updated_at =time .time ()
 
         return self 
 
+    def get_balance (self )->types .AccountBalance |None :
+        'Retrieves the account balance with the lightweight balance query\n        (the balance of `profile` is updated too).\n\n        :return: Account balance.\n        :rtype: `playerokapi.types.AccountBalance` or `None`'
+        headers ={"accept":"*/*"}
+        payload ={
+        "operationName":"viewerBalance",
+        "variables":json .dumps ({}),
+        "extensions":json .dumps ({
+        "persistedQuery":{
+        "version":1 ,
+        "sha256Hash":PERSISTED_QUERIES .get ("viewerBalance")
+        }
+        })
+        }
+
+        r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
+        balance =account_balance ((r ["data"]["viewer"]or {}).get ("balance"))
+        if balance is not None :
+            if self .profile is not None :
+                self .profile .balance =balance 
+            self .state .balance_updated_at =time .time ()
+        return balance 
+
     def get_user (
     self ,
     id :str |None =None ,
@@ -421,6 +510,7 @@ class Account :
         r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ).json ()
         return item_deal (r ["data"]["updateDeal"])
 
+    @reference_data ("games")
     def get_games (
     self ,
     count :int =24 ,
@@ -451,6 +541,7 @@ class Account :
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
         return game_list (r ["data"]["games"])
 
+    @reference_data ("game")
     def get_game (
     self ,
     id :str |None =None ,
@@ -478,6 +569,7 @@ class Account :
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
         return game (r ["data"]["game"])
 
+    @reference_data ("game_category")
     def get_game_category (
     self ,
     id :str |None =None ,
@@ -544,6 +636,7 @@ class Account :
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
         return game_category_agreement_list (r ["data"]["gameCategoryAgreements"])
 
+    @reference_data ("game_category_obtaining_types")
     def get_game_category_obtaining_types (
     self ,
     game_category_id :str ,
@@ -608,6 +701,7 @@ class Account :
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
         return game_category_instruction_list (r ["data"]["gameCategoryInstructions"])
 
+    @reference_data ("game_category_data_fields")
     def get_game_category_data_fields (
     self ,
     game_category_id :str ,
@@ -677,7 +771,9 @@ class Account :
         }
 
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
-        return chat_list (r ["data"]["chats"])
+        chats =chat_list (r ["data"]["chats"])
+        self .chat_directory .add_many (chats .chats )
+        return chats 
 
     def get_chat (
     self ,
@@ -700,19 +796,28 @@ class Account :
         }
 
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
-        return chat (r ["data"]["chat"])
+        chat_ =chat (r ["data"]["chat"])
+        self .chat_directory .add (chat_ )
+        return chat_ 
 
     def get_chat_by_username (
     self ,
-    username :str 
+    username :str ,
+    max_pages :int |None =CHAT_SCAN_MAX_PAGES 
     )->types .Chat |None :
-        'Receives a chat by the nickname of the interlocutor.\n\n        :param username: Nickname of the interlocutor.\n        :type username: `str`\n\n        :return: Chat object.\n        :rtype: `playerokapi.types.Chat` or `None`'
+        'Receives a chat by the nickname of the interlocutor.\n        The chat is looked up in the chat directory first, if the user is not there,\n        the latest chats are scanned (every scanned chat is added to the directory).\n\n        :param username: Nickname of the interlocutor.\n        :type username: `str`\n\n        :param max_pages: Maximum number of chat pages to scan (None - all), _optional_.\n        :type max_pages: `int` or `None`\n\n        :return: Chat object.\n        :rtype: `playerokapi.types.Chat` or `None`'
+        chat_id =self .chat_directory .get_chat_id (username )
+        if chat_id :
+            return self .chat_directory .get (chat_id )or self .get_chat (chat_id )
+
         next_cursor =None 
-        while True :
+        pages =0 
+        while max_pages is None or pages <max_pages :
             chats =self .get_chats (count =24 ,after_cursor =next_cursor )
-            for chat in chats .chats :
-                if any (user for user in chat .users if user .username .lower ()==username .lower ()):
-                    return chat 
+            pages +=1 
+            for chat_ in chats .chats :
+                if any (user for user in chat_ .users if user .username .lower ()==username .lower ()):
+                    return chat_ 
             if not chats .page_info .has_next_page :
                 break 
             next_cursor =chats .page_info .end_cursor 
@@ -787,16 +892,57 @@ class Account :
         }
         }
 
-        files ={"1":open (photo_file_path ,"rb")}
         map ={"1":["variables.file"]}if photo_file_path else None 
         payload ={
         "operations":json .dumps (operations ),
         "map":json .dumps (map )
         }
 
-        r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ,files ).json ()
+        with open (photo_file_path ,"rb")as f :
+            r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ,{"1":f }).json ()
         return temporary_attachment_upload_output (r ["data"]["uploadChatImageIntoTemporaryStore"])
 
+    def _upload_chat_image (self ,file_path :str ,file_hash :str ,chat_id :str ,
+    use_cache :bool =True )->tuple [str ,bool ]:
+        key =(chat_id ,file_hash )
+        if use_cache :
+            with self ._image_cache_lock :
+                cached =self ._image_cache .get (key )
+                if cached and cached [1 ]-IMAGE_CACHE_EXPIRY_MARGIN >time .time ():
+                    self ._image_cache .move_to_end (key )
+                    self .image_upload_stats ["cache_hits"]+=1 
+                    return cached [0 ],True 
+
+        image =self .upload_chat_image_into_temporary_store (file_path ,chat_id )
+        if not image or not image .id :
+            raise ImageUploadError (file_path )
+
+        expires_at =_get_timestamp (image .expires_at )or time .time ()+IMAGE_CACHE_TTL 
+        with self ._image_cache_lock :
+            self .image_upload_stats ["uploads"]+=1 
+            self ._image_cache [key ]=(image .id ,expires_at )
+            self ._image_cache .move_to_end (key )
+            while len (self ._image_cache )>IMAGE_CACHE_MAX_SIZE :
+                self ._image_cache .popitem (last =False )
+        return image .id ,False 
+
+    def _upload_chat_images (self ,photo_file_paths :list [str ],chat_id :str ,
+    use_cache :bool =True )->tuple [list [str ],bool ]:
+        file_hashes ={file_path :_get_file_hash (file_path )for file_path in photo_file_paths }
+        uploads ={file_hash :file_path for file_path ,file_hash in file_hashes .items ()}# one upload per file content
+        with ThreadPoolExecutor (max_workers =min (IMAGE_UPLOAD_WORKERS ,len (uploads )))as executor :
+            images =dict (zip (uploads ,executor .map (
+            lambda file_hash :self ._upload_chat_image (uploads [file_hash ],file_hash ,chat_id ,use_cache ),
+            uploads 
+            )))
+        images_ids =[images [file_hashes [file_path ]][0 ]for file_path in photo_file_paths ]
+        return images_ids ,any (is_cached for _ ,is_cached in images .values ())
+
+    def _evict_chat_images (self ,chat_id :str ):
+        with self ._image_cache_lock :
+            for key in [key for key in self ._image_cache if key [0 ]==chat_id ]:
+                del self ._image_cache [key ]
+
     def send_message (
     self ,
     chat_id :str ,
@@ -824,12 +970,18 @@ class Account :
         }
         }
 
-        for file_path in photo_file_paths :
-            image =self .upload_chat_image_into_temporary_store (file_path ,chat_id )
-            if image :
-                payload ["variables"]["input"]["imagesIds"].append (image .id )
+        is_cached =False 
+        if photo_file_paths :
+            payload ["variables"]["input"]["imagesIds"],is_cached =self ._upload_chat_images (photo_file_paths ,chat_id )
 
-        r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ).json ()
+        try :
+            r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ).json ()
+        except RequestPlayerokError :
+            if not is_cached :
+                raise 
+            self ._evict_chat_images (chat_id )# the cached attachments may have been used up or expired early
+            payload ["variables"]["input"]["imagesIds"],_ =self ._upload_chat_images (photo_file_paths ,chat_id ,use_cache =False )
+            r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ).json ()
         return chat_message (r ["data"]["createChatMessage"])
 
     def create_item (
@@ -1088,6 +1240,7 @@ class Account :
         r =self .request ("post",f"{self .base_url }/graphql",headers ,payload ).json ()
         return item (r ["data"]["increaseItemPriorityStatus"])
 
+    @reference_data ("transaction_providers")
     def get_transaction_providers (
     self ,
     direction :TransactionProviderDirections =TransactionProviderDirections .IN 
@@ -1161,6 +1314,7 @@ class Account :
         r =self .request ("get",f"{self .base_url }/graphql",headers ,payload ).json ()
         return transaction_list (r ["data"]["transactions"])
 
+    @reference_data ("sbp_bank_members")
     def get_sbp_bank_members (self )->list [SBPBankMember ]:
         'Receives all members of the SBP bank.\n\n        :return: Transaction provider object.\n        :rtype: `list` of `playerokapi.types.SBPBankMember`'
         headers ={"accept":"*/*"}
@@ -0,0 +1,94 @@
+from __future__ import annotations 
+import time 
+from threading import Lock 
+from typing import TYPE_CHECKING 
+from logging import getLogger 
+
+from .types import AccountProfile ,AccountBalance 
+from .parser import account_balance 
+
+if TYPE_CHECKING :
+    from .account import Account 
+
+
+logger =getLogger ("playerokapi")
+
+PROFILE_MAX_AGE =1800 
+BALANCE_MAX_AGE =60 
+
+
+class AccountState :
+    'Cached state of the account (viewer data, profile and balance).\n    Consumers read the cached snapshots, requests are made only when the data is older\n    than the requested age: the lightweight `viewerBalance` query for the money fields,\n    `Account.get()` for the rest. Changes pushed by the `userUpdated` subscription are applied as deltas.\n\n    :param account: Account object.\n    :type account: `playerokapi.account.Account`'
+
+    def __init__ (self ,account :Account ):
+        self .account =account 
+
+        self .viewer_updated_at :float =0 
+        "Time of the last viewer data update (timestamp)."
+        self .profile_updated_at :float =0 
+        "Time of the last profile update (timestamp)."
+        self .balance_updated_at :float =0 
+        "Time of the last balance update (timestamp)."
+        self .stats :dict [str ,int ]={
+        "full_refreshes":0 ,
+        "viewer_refreshes":0 ,
+        "balance_refreshes":0 ,
+        "user_updates":0 ,
+        "cache_hits":0 
+        }
+        "Statistics of the account state requests."
+
+        self ._lock =Lock ()
+
+    def refresh (self ,with_profile :bool =True )->Account :
+        'Updates the account data.\n\n        :param with_profile: Also update the profile (one more request), _optional_.\n        :type with_profile: `bool`\n\n        :return: Account object.\n        :rtype: `playerokapi.account.Account`'
+        with self ._lock :
+            self .stats ["full_refreshes"if with_profile else "viewer_refreshes"]+=1 
+            return self .account .get (with_profile =with_profile )
+
+    def get_profile (self ,max_age :float =PROFILE_MAX_AGE )->AccountProfile |None :
+        'Returns the account profile, updates it if it is older than `max_age` seconds.\n\n        :param max_age: Maximum age of the profile in seconds, _optional_.\n        :type max_age: `float`\n\n        :return: Account profile.\n        :rtype: `playerokapi.types.AccountProfile` or `None`'
+        if self .account .profile is None or time .time ()-self .profile_updated_at >max_age :
+            self .refresh ()
+        else :
+            self .stats ["cache_hits"]+=1 
+        return self .account .profile 
+
+    def get_balance (self ,max_age :float =BALANCE_MAX_AGE )->AccountBalance |None :
+        'Returns the account balance, updates it by the lightweight balance query if it is older than `max_age` seconds.\n\n        :param max_age: Maximum age of the balance in seconds, _optional_.\n        :type max_age: `float`\n\n        :return: Account balance.\n        :rtype: `playerokapi.types.AccountBalance` or `None`'
+        profile =self .account .profile 
+        if profile is not None and profile .balance is not None and time .time ()-self .balance_updated_at <=max_age :
+            self .stats ["cache_hits"]+=1 
+            return profile .balance 
+
+        balance =None 
+        try :
+            self .stats ["balance_refreshes"]+=1 
+            balance =self .account .get_balance ()
+        except Exception as e :
+            logger .debug (f"Failed to get the balance with the balance query: {e }")
+        if balance is None :
+            self .refresh ()
+        return self .account .profile .balance if self .account .profile else balance 
+
+    @property 
+    def is_blocked (self )->bool :
+        'Whether the account is blocked (by the cached data).'
+        profile =self .account .profile 
+        return bool (self .account .is_blocked or (profile and profile .is_blocked ))
+
+    def apply_user_update (self ,data :dict ):
+        'Applies the changes of the `userUpdated` subscription.\n\n        :param data: `userUpdated` payload.\n        :type data: `dict`'
+        self .stats ["user_updates"]+=1 
+        profile =self .account .profile 
+        if "unreadChatsCounter"in data :
+            self .account .unread_chats_counter =data ["unreadChatsCounter"]
+            if profile :
+                profile .unread_chats_counter =data ["unreadChatsCounter"]
+        if "isBlocked"in data :
+            self .account .is_blocked =data ["isBlocked"]
+            if profile :
+                profile .is_blocked =data ["isBlocked"]
+        if data .get ("balance")and profile :
+            profile .balance =account_balance (data ["balance"])
+            self .balance_updated_at =time .time ()
@@ -0,0 +1,90 @@
+import time 
+from threading import Lock 
+from collections import OrderedDict 
+
+from .types import Chat 
+
+
+CHAT_DIRECTORY_MAX_CHATS =5000 
+CHAT_DIRECTORY_TTL =600 
+
+
+class ChatDirectory :
+    'Bounded directory of the account chats: username → chat ID and chat ID → chat.\n    Filled by the fetched chat pages and chats, the chat objects become stale after `ttl` seconds\n    or when the chat is updated (the username → chat ID mapping is kept, so a stale chat\n    is refreshed by one request). The least recently used chats are evicted.\n\n    :param max_chats: Maximum number of chats in the directory.\n    :type max_chats: `int`\n\n    :param ttl: Lifetime of the chat objects in seconds.\n    :type ttl: `int`'
+
+    def __init__ (self ,max_chats :int =CHAT_DIRECTORY_MAX_CHATS ,ttl :int =CHAT_DIRECTORY_TTL ):
+        self .max_chats =max_chats 
+        self .ttl =ttl 
+
+        self .owner_id :str |None =None 
+        "ID of the account user (not indexed, the account is a participant of every chat)."
+        self .hits :int =0 
+        "Number of lookups served from the directory."
+        self .misses :int =0 
+        "Number of lookups that required an API request."
+
+        self ._chats :OrderedDict [str ,tuple [Chat ,float ]]=OrderedDict ()
+        self ._usernames :dict [str ,str ]={}
+        self ._lock =Lock ()
+
+    def _add (self ,chat :Chat ,indexed_at :float ):
+        self ._chats [chat .id ]=(chat ,indexed_at )
+        self ._chats .move_to_end (chat .id )
+        for user in chat .users or []:
+            if user and user .username and user .id !=self .owner_id :
+                self ._usernames [user .username .lower ()]=chat .id 
+
+        while len (self ._chats )>self .max_chats :
+            _ ,(old_chat ,_ )=self ._chats .popitem (last =False )
+            for user in old_chat .users or []:
+                if user and user .username and self ._usernames .get (user .username .lower ())==old_chat .id :
+                    del self ._usernames [user .username .lower ()]
+
+    def add (self ,chat :Chat ):
+        'Adds or refreshes the chat.\n\n        :param chat: Chat object.\n        :type chat: `playerokapi.types.Chat`'
+        if not chat or not chat .id :
+            return 
+        with self ._lock :
+            self ._add (chat ,time .time ())
+
+    def add_many (self ,chats :list [Chat ]):
+        'Adds or refreshes the chats of a page.\n\n        :param chats: Chat objects.\n        :type chats: `list[playerokapi.types.Chat]`'
+        with self ._lock :
+            now =time .time ()
+            for chat in reversed (chats ):# the page is newest first, keep the newest as the most recent
+                if chat and chat .id :
+                    self ._add (chat ,now )
+
+    def invalidate (self ,chat_id :str ):
+        'Marks the chat object as stale (e.g. after `chatUpdated`), its usernames stay indexed.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`'
+        with self ._lock :
+            if chat_id in self ._chats :
+                self ._chats [chat_id ]=(self ._chats [chat_id ][0 ],0 )
+
+    def get (self ,chat_id :str )->Chat |None :
+        'Returns the chat if it is in the directory and is not stale.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :return: Chat object or None.\n        :rtype: `playerokapi.types.Chat` or `None`'
+        with self ._lock :
+            chat ,indexed_at =self ._chats .get (chat_id ,(None ,0 ))
+            if not chat or time .time ()-indexed_at >self .ttl :
+                self .misses +=1 
+                return None 
+            self ._chats .move_to_end (chat_id )
+            self .hits +=1 
+            return chat 
+
+    def get_chat_id (self ,username :str )->str |None :
+        'Returns the ID of the chat with the user.\n\n        :param username: Nickname of the interlocutor.\n        :type username: `str`\n\n        :return: Chat ID or None if the user is not in the directory.\n        :rtype: `str` or `None`'
+        with self ._lock :
+            return self ._usernames .get (username .lower ())
+
+    def get_state (self )->list [tuple [Chat ,float ]]:
+        'Returns the directory state for the snapshot.\n\n        :return: Pairs (chat, indexing time).\n        :rtype: `list[tuple[playerokapi.types.Chat, float]]`'
+        with self ._lock :
+            return list (self ._chats .values ())
+
+    def set_state (self ,state :list [tuple [Chat ,float ]]):
+        'Restores the directory state from the snapshot.\n\n        :param state: Pairs (chat, indexing time).\n        :type state: `list[tuple[playerokapi.types.Chat, float]]`'
+        with self ._lock :
+            for chat ,indexed_at in state :
+                if chat .id not in self ._chats :
+                    self ._add (chat ,indexed_at )
@@ -62,6 +62,16 @@ class RequestSendingError (Exception ):
         return msg 
 
 
+class ImageUploadError (Exception ):
+    'The exception that is thrown if the image could not be uploaded to the temporary storage.\n\n    :param file_path: Path to the image file.\n    :type file_path: `str`'
+
+    def __init__ (self ,file_path :str ):
+        self .file_path =file_path 
+
+    def __str__ (self ):
+        return f"Failed to upload the image{self .file_path }"
+
+
 class UnauthorizedError (Exception ):
     'An exception that is raised if logging into the Playerok account failed.'
 
@@ -1,14 +1,17 @@
 import json 
 import uuid 
 import time 
+import heapq 
+import random 
 import traceback 
-from datetime import datetime ,timezone 
+from datetime import datetime ,timedelta ,timezone 
 from logging import getLogger 
 from typing import Generator 
-from threading import Thread 
+from threading import Thread ,Lock 
 from queue import Queue 
 from threading import Event as ThreadingEvent 
-from collections import deque 
+from collections import deque ,OrderedDict 
+from concurrent .futures import ThreadPoolExecutor 
 
 import websocket 
 
@@ -18,17 +21,51 @@ ChatMessage ,
 Chat ,
 ItemDeal 
 )
-from ..enums import ChatTypes 
+from ..enums import ChatTypes ,ItemDealStatuses 
 from ..parser import (
 chat ,
 chat_message 
 )
 from ..misc import QUERIES 
 from .events import *
+from .transport import DeflateWebSocket 
+from .message_store import ChatMessageStore 
+from ..metrics import get_metrics 
 
 
 logger =getLogger ("playerokapi.listener")
 
+DEALS_POLL_MIN_INTERVAL =2 
+DEALS_POLL_MAX_INTERVAL =120 
+DEALS_POLL_OFFLINE_INTERVAL =15 # without the WebSocket new deals are only found by polling
+DEALS_POLL_PAGE_SIZE =10 
+DEALS_POLL_MAX_PAGES =3 
+REVIEW_CHECK_MIN_INTERVAL =30 
+REVIEW_CHECK_MAX_INTERVAL =1800 
+REVIEW_CHECK_TTL =24 *3600 # deals are watched for a review for a day after the payment
+REVIEW_CHECK_BATCH_SIZE =50 
+WS_MAX_CHAT_SUBSCRIPTIONS =50 
+WS_PING_INTERVAL =20 
+WS_DEAD_TIMEOUT =60 
+WS_RECONNECT_MIN_DELAY =1 
+WS_RECONNECT_MAX_DELAY =60 
+WS_GAP_FILL_WORKERS =4 
+DEAL_STATUS_SYNC_INTERVAL =30 
+DEAL_STATUS_SYNC_MAX_PAGES =4 
+DEAL_STATUS_SYNC_MAX_LOOKUPS =10 
+DEAL_FINISHED_KEEP =24 *3600 
+DEAL_STATUS_TTL =14 *24 *3600 
+
+ACTIVE_DEAL_STATUSES =(ItemDealStatuses .PAID ,ItemDealStatuses .PENDING ,ItemDealStatuses .SENT )
+DEAL_STATUS_RANKS ={
+ItemDealStatuses .PAID :0 ,
+ItemDealStatuses .PENDING :1 ,
+ItemDealStatuses .SENT :2 ,
+ItemDealStatuses .CONFIRMED :3 ,
+ItemDealStatuses .CONFIRMED_AUTOMATICALLY :3 ,
+ItemDealStatuses .ROLLED_BACK :3 
+}
+
 
 class EventListener :
     'Event listener from Playerok.com.\n\n    :param account: Account object.\n    :type account: `playerokapi.account.Account`'
@@ -36,20 +73,115 @@ class EventListener :
     def __init__ (self ,account :Account ):
         self .account :Account =account 
 
-        self .chat_subscriptions ={}
-        self .review_check_deals =[]
-        self .review_deal_times ={}
+        self .chat_subscriptions ={}# subscription_id: chat_id
+        self .review_check_deals :dict [str ,dict ]={}# deal_id: {"added": timestamp, "tries": int}
         self .chats =[]
         self .processed_deals =[]
-        self .active_deals ={}# chat_id: [(deal_id, last_status, status_date), ...]
-        self .last_st_deal_times ={}
+        self .deal_states :dict [str ,dict ]={}# deal_id: {"status", "has_problem", "chat_id", "updated"}
         self .ws =None 
         self .q =None 
 
         self .processed_msgs =deque (maxlen =300 )
+        self ._processed_msgs_lock =Lock ()
+        self .message_store =ChatMessageStore ()
+
+        self ._chat_subscription_ids :OrderedDict [str ,str ]=OrderedDict ()# chat_id: subscription_id, least recently active first
+        self ._subscriptions_lock =Lock ()
+        self ._chat_last_seen :dict [str ,datetime ]={}
+        self ._ws_last_recv =0 
+        self ._ws_gap_start :float |None =None 
+        self ._ws_stats_lock =Lock ()
+        self .ws_stats :dict [str ,dict ]={}# subscription name: {"messages", "frames", "bytes", "raw_bytes"}
+        self ._ws_capture =None 
+        self ._ws_capture_lock =Lock ()
 
         self ._possible_new_chat =ThreadingEvent ()
         self ._last_chats_check =0 
+        self ._is_restored =False 
+        self ._deals_lookback =90 
+        self ._deals_watermark :datetime |None =None # time of the newest chat message seen by the new deals check
+        self ._deals_poll_interval =DEALS_POLL_MIN_INTERVAL 
+        self ._unread_chats_counter =0 
+
+        self ._review_queue :list [tuple [float ,str ]]=[]# (next_check, deal_id)
+        self ._review_lock =Lock ()
+
+        self ._deal_states_lock =Lock ()
+        self ._deal_sync_cursor :str |None =None 
+        self ._deal_sync_pass_ids :set [str ]=set ()
+        self ._deal_sync_seen_ids :set [str ]=set ()
+        self ._deal_sync_lookups :dict [str ,None ]={}# deals to check one by one, in the order they were found
+
+        self .deal_statuses_stats ={
+        "passes":0 ,
+        "transitions":0 ,
+        "requests":0 
+        }
+        self .reviews_stats ={
+        "checks":0 ,
+        "detections":0 ,
+        "evictions":0 ,
+        "requests":0 
+        }
+        self .new_deals_stats ={
+        "polls":0 ,
+        "fast_path_polls":0 ,
+        "wasted_polls":0 ,
+        "detections":0 ,
+        "requests":0 
+        }
+
+    def get_state (self )->dict :
+        'Returns the listener state for a warm-restart snapshot.\n\n        :return: Listener state dictionary.\n        :rtype: `dict`'
+        return {
+        "chats":list (self .chats ),
+        "processed_msgs":list (self .processed_msgs ),
+        "processed_deals":list (self .processed_deals )[-1000 :],
+        "review_check_deals":{deal_id :dict (info )for deal_id ,info in list (self .review_check_deals .items ())},
+        "deals_watermark":self ._deals_watermark ,
+        "deal_states":{deal_id :dict (state )for deal_id ,state in list (self .deal_states .items ())}
+        }
+
+    def set_state (self ,state :dict ,saved_at :float ):
+        'Restores the listener state from a warm-restart snapshot.\n        Must be called before `listen()`.\n\n        :param state: Listener state dictionary (see `get_state`).\n        :type state: `dict`\n\n        :param saved_at: Snapshot save time (timestamp).\n        :type saved_at: `float`'
+        self .chats =list (state ["chats"])
+        self .processed_msgs .extend (state ["processed_msgs"])
+        self .processed_deals =list (state ["processed_deals"])
+        review_check_deals =state ["review_check_deals"]
+        if isinstance (review_check_deals ,list ):# snapshot of the older version
+            review_check_deals ={deal_id :{"added":saved_at ,"tries":0 }for deal_id in review_check_deals }
+        for deal_id ,info in review_check_deals .items ():
+            self ._add_review_check_deal (deal_id ,info ["added"],info ["tries"])
+        self ._deals_watermark =state .get ("deals_watermark")
+        self .deal_states =dict (state .get ("deal_states",{}))
+
+        # deals paid while the bot was down must not be missed on the first check
+        self ._deals_lookback =max (90 ,time .time ()-saved_at +90 )
+        self ._ws_gap_start =saved_at # messages sent while the bot was down are received after connecting
+        self ._is_restored =True 
+
+    def start_ws_capture (self ,path :str ):
+        'Starts writing the received WebSocket messages to the file, one JSON object per line:\n        `{"t": receive time, "chat_id": chat of the chatMessageCreated subscription or null, "frame": message text}`.\n        The file can be replayed with `python -m benchmarks replay --capture <path>`.\n\n        :param path: Path to the file (the messages are appended).\n        :type path: `str`'
+        with self ._ws_capture_lock :
+            if self ._ws_capture :
+                self ._ws_capture .close ()
+            self ._ws_capture =open (path ,"a",encoding ="utf-8")
+
+    def stop_ws_capture (self ):
+        'Stops writing the received WebSocket messages to the file.'
+        with self ._ws_capture_lock :
+            if self ._ws_capture :
+                self ._ws_capture .close ()
+            self ._ws_capture =None 
+
+    def _capture_ws_message (self ,msg :str ,received_at :float ):
+        try :msg_id =json .loads (msg ).get ("id")
+        except (json .JSONDecodeError ,AttributeError ):msg_id =None 
+        record ={"t":received_at ,"chat_id":self .chat_subscriptions .get (msg_id ),"frame":msg }
+        with self ._ws_capture_lock :
+            if self ._ws_capture :
+                self ._ws_capture .write (json .dumps (record ,ensure_ascii =False )+"\n")
+                self ._ws_capture .flush ()
 
     def _parse_iso (self ,iso_dt :str ):
         if iso_dt .endswith ("Z"):
@@ -60,28 +192,56 @@ class EventListener :
     self ,message_id :str ,chat_id :str 
     ):
         for _ in range (3 ):
+            actual_msg =self .message_store .get (chat_id ,message_id ,actual_only =True )
+            if actual_msg :
+                return actual_msg 
             time .sleep (6 )
 
-            try :msg_list =self .account .get_chat_messages (chat_id ,count =12 )
+            try :self ._get_chat_messages (chat_id ,count =12 ,max_age =3 )
             except :return 
+        return self .message_store .get (chat_id ,message_id ,actual_only =True )
 
-            try :return [msg for msg in msg_list .messages if msg .id ==message_id ][0 ]
-            except :pass 
-
-    def _set_active_deal (
-    self ,chat :Chat ,deal :ItemDeal ,status_date :datetime 
-    ):
-        if chat .id not in self .active_deals :
-            self .active_deals [chat .id ]=[]
-
-        try :deal_tuple =[tuple for tuple in self .active_deals [chat .id ]if deal .id in tuple ][0 ]
-        except :deal_tuple =()
+    def _get_chat_messages (self ,chat_id :str ,count :int =24 ,max_age :float =0 )->list [ChatMessage ]:
+        messages =self .message_store .get_messages (chat_id ,count ,max_age )
+        if messages is None :
+            messages =self .account .get_chat_messages (chat_id ,count =count ).messages 
+            self .message_store .add_page (chat_id ,messages )
+        return messages 
 
-        if not deal_tuple :
-            self .active_deals [chat .id ].append ((deal .id ,deal .status ,status_date ))
-        else :
-            indx =self .active_deals [chat .id ].index (deal_tuple )
-            self .active_deals [chat .id ][indx ]=(deal .id ,deal .status ,status_date )
+    def _update_deal_state (self ,deal :ItemDeal ,chat_id :str |None =None ,
+    status :ItemDealStatuses |None =None ,has_problem :bool |None =None )->tuple [bool ,bool ]|None :
+        now =time .time ()
+        with self ._deal_states_lock :
+            state =self .deal_states .get (deal .id )
+            if state is None :
+                self .deal_states [deal .id ]={
+                "status":status or deal .status ,
+                "has_problem":bool (deal .has_problem if has_problem is None else has_problem ),
+                "chat_id":chat_id ,
+                "updated":now 
+                }
+                return None 
+
+            is_status_changed =(
+            status is not None 
+            and DEAL_STATUS_RANKS .get (status ,0 )>DEAL_STATUS_RANKS .get (state ["status"],0 )
+            )# statuses only move forward, older data is ignored
+            is_problem_changed =has_problem is not None and has_problem !=state ["has_problem"]
+
+            if is_status_changed :
+                state ["status"]=status 
+            if is_problem_changed :
+                state ["has_problem"]=has_problem 
+            if is_status_changed or is_problem_changed :
+                state ["updated"]=now 
+                self .deal_statuses_stats ["transitions"]+=1 
+            state ["chat_id"]=state ["chat_id"]or chat_id 
+            return is_status_changed ,is_problem_changed 
+
+    def _is_new_deal_transition (self ,deal :ItemDeal ,chat :Chat ,status :ItemDealStatuses |None =None ,
+    has_problem :bool |None =None )->bool :
+        changes =self ._update_deal_state (deal ,chat .id ,status ,has_problem )
+        return changes is None or any (changes )
 
     def _is_msg_processed (
     self ,message_id :str 
@@ -91,6 +251,15 @@ class EventListener :
         if msg .id ==message_id 
         ))
 
+    def _claim_msg (
+    self ,message ,chat_id :str 
+    )->bool :
+        with self ._processed_msgs_lock :# the WebSocket messages are processed in parallel threads
+            if self ._is_msg_processed (message .id ):
+                return False 
+            self .processed_msgs .append ((message ,chat_id ))
+            return True 
+
     def _get_chat_processed_msgs (
     self ,chat_id :str 
     ):
@@ -119,10 +288,8 @@ class EventListener :
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
                 deal_id =actual_msg .deal .id 
-                #status_date = self._parse_iso(actual_msg.created_at)
-                #self._set_active_deal(chat, actual_msg.deal, status_date)
-                if deal_id not in self .review_check_deals :
-                    self .review_check_deals .append (deal_id )
+                self ._update_deal_state (actual_msg .deal ,chat .id ,ItemDealStatuses .PAID )
+                self ._add_review_check_deal (deal_id )
                 if deal_id not in self .processed_deals :
                     self .processed_deals .append (deal_id )
                 else :
@@ -135,8 +302,8 @@ class EventListener :
         elif message .text =="{{ITEM_SENT}}":
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
-            #status_date = self._parse_iso(actual_msg.created_at)
-            #self._set_active_deal(chat, actual_msg.deal, status_date)
+                if not self ._is_new_deal_transition (actual_msg .deal ,chat ,status =ItemDealStatuses .SENT ):
+                    return []
                 return [
                 ItemSentEvent (actual_msg .deal ,chat ),
                 DealStatusChangedEvent (actual_msg .deal ,chat )
@@ -145,8 +312,8 @@ class EventListener :
         elif message .text =="{{DEAL_CONFIRMED}}":
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
-            #status_date = self._parse_iso(actual_msg.created_at)
-            #self._set_active_deal(chat, actual_msg.deal, status_date)
+                if not self ._is_new_deal_transition (actual_msg .deal ,chat ,status =ItemDealStatuses .CONFIRMED ):
+                    return []
                 return [
                 DealConfirmedEvent (actual_msg .deal ,chat ),
                 DealStatusChangedEvent (actual_msg .deal ,chat ),
@@ -155,8 +322,8 @@ class EventListener :
         elif message .text =="{{DEAL_ROLLED_BACK}}":
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
-            #status_date = self._parse_iso(actual_msg.created_at)
-            #self._set_active_deal(chat, actual_msg.deal, status_date)
+                if not self ._is_new_deal_transition (actual_msg .deal ,chat ,status =ItemDealStatuses .ROLLED_BACK ):
+                    return []
                 return [
                 DealRolledBackEvent (actual_msg .deal ,chat ),
                 DealStatusChangedEvent (actual_msg .deal ,chat ),
@@ -165,8 +332,8 @@ class EventListener :
         elif message .text =="{{DEAL_HAS_PROBLEM}}":
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
-            #status_date = self._parse_iso(actual_msg.created_at)
-            #self._set_active_deal(chat, actual_msg.deal, status_date)
+                if not self ._is_new_deal_transition (actual_msg .deal ,chat ,has_problem =True ):
+                    return []
                 return [
                 DealHasProblemEvent (actual_msg .deal ,chat ),
                 DealStatusChangedEvent (actual_msg .deal ,chat ),
@@ -175,8 +342,8 @@ class EventListener :
         elif message .text =="{{DEAL_PROBLEM_RESOLVED}}":
             actual_msg =self ._get_actual_message (message .id ,chat .id )or message 
             if actual_msg and actual_msg .deal :
-            #status_date = self._parse_iso(actual_msg.created_at)
-            #self._set_active_deal(chat, actual_msg.deal, status_date)
+                if not self ._is_new_deal_transition (actual_msg .deal ,chat ,has_problem =False ):
+                    return []
                 return [
                 DealProblemResolvedEvent (actual_msg .deal ,chat ),
                 DealStatusChangedEvent (actual_msg .deal ,chat ),
@@ -243,8 +410,21 @@ class EventListener :
         }))
 
     def _subscribe_chat_message_created (self ,chat_id ):
-        _uuid =str (uuid .uuid4 ())
-        self .chat_subscriptions [_uuid ]=chat_id 
+        with self ._subscriptions_lock :
+            if chat_id in self ._chat_subscription_ids :
+                self ._chat_subscription_ids .move_to_end (chat_id )# the chat is active, it is evicted last
+                return 
+
+            _uuid =str (uuid .uuid4 ())
+            self .chat_subscriptions [_uuid ]=chat_id 
+            self ._chat_subscription_ids [chat_id ]=_uuid 
+
+            evicted_uuids =[]
+            while len (self ._chat_subscription_ids )>WS_MAX_CHAT_SUBSCRIPTIONS :
+                _ ,evicted_uuid =self ._chat_subscription_ids .popitem (last =False )
+                self .chat_subscriptions .pop (evicted_uuid ,None )
+                evicted_uuids .append (evicted_uuid )
+
         self .ws .send (json .dumps ({
         "id":_uuid ,
         "payload":{
@@ -259,12 +439,16 @@ class EventListener :
         },
         "type":"subscribe"
         }))
+        for evicted_uuid in evicted_uuids :# messages of the idle chats still come with chatUpdated
+            self .ws .send (json .dumps ({"id":evicted_uuid ,"type":"complete"}))
 
     def _is_chat_subscribed (self ,chat_id ):
-        for _ ,sub_chat_id in self .chat_subscriptions .items ():
-            if chat_id ==sub_chat_id :
-                return True 
-        return False 
+        return chat_id in self ._chat_subscription_ids 
+
+    def _reset_chat_subscriptions (self ):
+        with self ._subscriptions_lock :
+            self .chat_subscriptions .clear ()
+            self ._chat_subscription_ids .clear ()
 
     def _proccess_new_chat_message (self ,chat ,message ):
         events =[]
@@ -279,8 +463,13 @@ class EventListener :
                     self .chats .append (chat )
                     break 
 
-        if not self ._is_msg_processed (message .id ):
-            self .processed_msgs .append ((message ,chat .id ))
+        self ._claim_msg (message ,chat .id )
+        self .message_store .add (chat .id ,message )
+        if message .created_at :
+            message_time =self ._parse_iso (message .created_at )
+            last_seen =self ._chat_last_seen .get (chat .id )
+            if last_seen is None or message_time >last_seen :
+                self ._chat_last_seen [chat .id ]=message_time 
 
         events .extend (self ._parse_message_events (message ,chat ))
         return events 
@@ -293,40 +482,68 @@ class EventListener :
             if (
             msg 
             and (now -self ._parse_iso (msg .created_at ).astimezone (timezone .utc )).total_seconds ()>90 
-            and not self ._is_msg_processed (msg .id )
             ):
-                self .processed_msgs .append ((msg ,chat .id ))
-
-    def proccess_ws_message (self ,msg ):
+                self ._claim_msg (msg ,chat .id )
+
+    def _count_ws_message (self ,msg_data :dict ,frames :int ,size :int ,raw_size :int ):
+        payload_data =(msg_data .get ("payload")or {}).get ("data")or {}
+        name =next (iter (payload_data ),None )or msg_data .get ("type","unknown")
+        with self ._ws_stats_lock :
+            stats =self .ws_stats .setdefault (name ,{"messages":0 ,"frames":0 ,"bytes":0 ,"raw_bytes":0 })
+            stats ["messages"]+=1 
+            stats ["frames"]+=frames 
+            stats ["bytes"]+=size 
+            stats ["raw_bytes"]+=raw_size 
+        metrics =get_metrics ()
+        metrics .inc ("playerok_ws_messages_total",subscription =name )
+        metrics .inc ("playerok_ws_frames_total",frames ,subscription =name )
+        metrics .inc ("playerok_ws_received_bytes_total",size ,subscription =name )
+
+    def proccess_ws_message (self ,msg ,frames :int =0 ,size :int =0 ,raw_size :int =0 ):
         try :
             try :msg_data =json .loads (msg )
             except json .JSONDecodeError :return 
 
+            self ._count_ws_message (msg_data ,frames ,size ,raw_size )
+
             logger .debug (f"WS -> {msg_data }")
 
             if msg_data ["type"]=="connection_ack":
+                self ._reset_chat_subscriptions ()
                 self ._subscribe_chat_updated ()
                 self ._subscribe_user_updated ()
 
-                for chat_ in self .chats :
+                for chat_ in self .chats [-WS_MAX_CHAT_SUBSCRIPTIONS :]:
                     self ._subscribe_chat_message_created (chat_ .id )
+
+                if self ._ws_gap_start :
+                    Thread (target =self ._fill_ws_gap ,args =(self ._ws_gap_start ,),daemon =True ).start ()
+                    self ._ws_gap_start =None 
+            elif msg_data ["type"]=="ping":
+                self .ws .send (json .dumps ({"type":"pong"}))
             else :
                 payload_data =(msg_data .get ("payload")or {}).get ("data")or {}
 
                 if "userUpdated"in payload_data :
+                    self .account .state .apply_user_update (payload_data ["userUpdated"])
                     unread_chats =payload_data ["userUpdated"].get ("unreadChatsCounter",0 )
-                    if unread_chats >0 :
+                    if unread_chats >self ._unread_chats_counter :# a new unread chat may be a new deal
                         self ._possible_new_chat .set ()
+                    self ._unread_chats_counter =unread_chats 
 
                 if "chatUpdated"in payload_data :
                     _chat =chat (payload_data ["chatUpdated"])
                     _message =chat_message (payload_data ["chatUpdated"]["lastMessage"])
+                    self .message_store .add (_chat .id ,_message )
+                    self .account .chat_directory .invalidate (_chat .id )
 
                     if not self ._is_chat_subscribed (_chat .id ):
+                        is_new_chat =not any (chat_ .id ==_chat .id for chat_ in self .chats )
                         self ._subscribe_chat_message_created (_chat .id )
 
-                        events =[ChatInitializedEvent (_chat )]
-                        events .extend (self ._proccess_new_chat_message (_chat ,_message ))
+                        events =[ChatInitializedEvent (_chat )]if is_new_chat else []
+                        if self ._claim_msg (_message ,_chat .id ):
+                            events .extend (self ._proccess_new_chat_message (_chat ,_message ))
                         for event in events :
                         # yield event
                             self .q .put (event )
@@ -336,6 +553,9 @@ class EventListener :
                     try :_chat =[chat_ for chat_ in self .chats if chat_ .id ==chat_id ][0 ]
                     except :return 
                     _message =chat_message (payload_data ["chatMessageCreated"])
+                    self ._subscribe_chat_message_created (chat_id )
+                    if not self ._claim_msg (_message ,chat_id ):
+                        return # the message has been delivered already
 
                     events =self ._proccess_new_chat_message (_chat ,_message )
                     for event in events :
@@ -377,134 +597,254 @@ class EventListener :
                 # except:
                 #     ssl_context = None
 
-        try :self .chats =self .account .get_chats (count =24 ).chats # initialization of the first 24 chats
-        except :self .chats =[]
+        if not self ._is_restored :
+            try :self .chats =self .account .get_chats (count =24 ).chats # initialization of the first 24 chats
+            except :self .chats =[]
 
-        self ._process_chats_last_messages (self .chats )
+            self ._process_chats_last_messages (self .chats )
 
         for chat_ in self .chats :
             yield ChatInitializedEvent (chat_ )
 
+        reconnect_delay =WS_RECONNECT_MIN_DELAY 
         while True :
+            connected_at =time .time ()
             try :
-                self .ws =websocket .WebSocket (
+                self .ws =DeflateWebSocket (
                 sslopt ={"ca_certs":self .account ._tmp_cert_path }
                 )
                 self .ws .connect (
-                url ="wss://ws.playerok.com/graphql",
+                url =self .account .ws_url ,
                 header =[f"{k }: {v }"for k ,v in headers .items ()],
                 subprotocols =["graphql-transport-ws"],
                 http_proxy_host =proxy_host ,
                 http_proxy_port =proxy_port ,
                 http_proxy_auth =proxy_auth 
                 )
+                self .ws .settimeout (WS_PING_INTERVAL )
+                self ._ws_last_recv =time .time ()
                 self ._send_connection_init ()
 
                 while True :
-                    msg =self .ws .recv ()
-                    Thread (target =self .proccess_ws_message ,args =(msg ,),daemon =True ).start ()
-            except websocket ._exceptions .WebSocketException :
-                time .sleep (3 )
-                pass 
+                    try :
+                        msg =self .ws .recv ()
+                    except websocket ._exceptions .WebSocketTimeoutException :
+                        if time .time ()-self ._ws_last_recv >WS_DEAD_TIMEOUT :
+                            raise websocket ._exceptions .WebSocketConnectionClosedException ("the server does not answer pings")
+                        self .ws .send (json .dumps ({"type":"ping"}))
+                        continue 
 
-    def _should_check_review_deal (self ,deal_id ,delay =30 ,max_tries =30 )->bool :
-        now =time .time ()
-        info =self .review_deal_times .get (deal_id ,{"last":0 ,"tries":0 })
+                    self ._ws_last_recv =time .time ()
+                    if self ._ws_capture :
+                        self ._capture_ws_message (msg ,self ._ws_last_recv )
+                    Thread (
+                    target =self .proccess_ws_message ,
+                    args =(msg ,self .ws .received_frames ,self .ws .received_size ,self .ws .received_raw_size ),
+                    daemon =True 
+                    ).start ()
+            except (websocket ._exceptions .WebSocketException ,OSError )as e :
+                logger .debug (f"WebSocket connection lost: {e }")
+            get_metrics ().inc ("playerok_ws_reconnects_total")
+
+            try :self .ws .close ()
+            except :pass 
+            if self ._ws_last_recv :
+                self ._ws_gap_start =self ._ws_gap_start or self ._ws_last_recv 
 
-        last_time =info ["last"]
-        tries =info ["tries"]
+            if time .time ()-connected_at >60 :# the connection was stable, reconnect quickly
+                reconnect_delay =WS_RECONNECT_MIN_DELAY 
+            time .sleep (reconnect_delay *random .uniform (0.5 ,1.5 ))
+            reconnect_delay =min (reconnect_delay *2 ,WS_RECONNECT_MAX_DELAY )
 
-        if now -last_time >delay :
-            self .review_deal_times [deal_id ]={
-            "last":now ,
-            "tries":tries +1 
-            }
-            return True 
-        elif tries >=max_tries :
+    def _get_gap_messages (self ,chat_ :Chat )->list [ChatMessage ]:
+        try :
+            return self ._get_chat_messages (chat_ .id ,count =24 )
+        except :
+            logger .debug (f"Error getting chat messages{chat_ .id } after reconnection: {traceback .format_exc ()}")
+            return []
+
+    def _fill_ws_gap (self ,since :float ):
+        since_dt =datetime .fromtimestamp (since ,timezone .utc )
+        try :
+            chats =self .account .get_chats (count =24 ).chats 
+        except :
+            logger .debug (f"Error getting chats after reconnection: {traceback .format_exc ()}")
+            return 
+
+        gap_chats =[
+        chat_ for chat_ in chats 
+        if chat_ .last_message and self ._parse_iso (chat_ .last_message .created_at )>since_dt 
+        ]
+        if not gap_chats :
+            return 
+
+        known_chat_ids ={chat_ .id for chat_ in self .chats }
+        for chat_ in gap_chats :
+            if chat_ .id not in known_chat_ids :
+                self .q .put (ChatInitializedEvent (chat_ ))
+            self ._subscribe_chat_message_created (chat_ .id )
+
+        with ThreadPoolExecutor (max_workers =WS_GAP_FILL_WORKERS )as executor :
+            gap_messages =list (executor .map (self ._get_gap_messages ,gap_chats ))
+
+        filled =0 
+        for chat_ ,messages in zip (gap_chats ,gap_messages ):
+            last_seen =self ._chat_last_seen .get (chat_ .id ,since_dt )
+            for message in sorted (messages ,key =lambda msg :msg .created_at ):
+                if self ._parse_iso (message .created_at )<=last_seen or not self ._claim_msg (message ,chat_ .id ):
+                    continue 
+                filled +=1 
+                for event in self ._proccess_new_chat_message (chat_ ,message ):
+                    self .q .put (event )
+
+        if filled :
+            logger .info (f"Received {filled } messages missed while the WebSocket was disconnected")
+
+    def _add_review_check_deal (self ,deal_id :str ,added_at :float |None =None ,tries :int =0 ):
+        with self ._review_lock :
             if deal_id in self .review_check_deals :
-                self .review_check_deals .remove (deal_id )
-            del self .review_deal_times [deal_id ]
+                return 
+            added_at =added_at or time .time ()
+            self .review_check_deals [deal_id ]={"added":added_at ,"tries":tries }
+            heapq .heappush (self ._review_queue ,(added_at +self ._get_review_check_interval (tries ),deal_id ))
 
-        return False 
+    def _get_review_check_interval (self ,tries :int )->float :
+        return min (REVIEW_CHECK_MIN_INTERVAL *2 **min (tries ,16 ),REVIEW_CHECK_MAX_INTERVAL )
+
+    def _pop_due_review_deals (self )->list [str ]:
+        due_deals =[]
+        now =time .time ()
+        with self ._review_lock :
+            while self ._review_queue and self ._review_queue [0 ][0 ]<=now and len (due_deals )<REVIEW_CHECK_BATCH_SIZE :
+                _ ,deal_id =heapq .heappop (self ._review_queue )
+                if deal_id in self .review_check_deals :# evicted deals may still be in the queue
+                    due_deals .append (deal_id )
+        return due_deals 
+
+    def _reschedule_review_deal (self ,deal_id :str ):
+        now =time .time ()
+        with self ._review_lock :
+            info =self .review_check_deals .get (deal_id )
+            if not info :
+                return 
+            info ["tries"]+=1 
+            if now -info ["added"]>=REVIEW_CHECK_TTL :
+                self ._evict_review_deal (deal_id )
+                return 
+            heapq .heappush (self ._review_queue ,(now +self ._get_review_check_interval (info ["tries"]),deal_id ))
+
+    def _evict_review_deal (self ,deal_id :str ):
+        self .review_check_deals .pop (deal_id ,None )
+        self .reviews_stats ["evictions"]+=1 
+
+    def _get_review_deals (self ,deal_ids :list [str ])->dict [str ,ItemDeal ]:
+        deals ={}
+        for deal_id in deal_ids :# the deals list query is persisted by hash and may not return the review, so each deal is read in full
+            try :
+                deals [deal_id ]=self .account .get_deal (deal_id )
+                self .reviews_stats ["requests"]+=1 
+            except :
+                pass 
+        return deals 
 
     def listen_new_reviews (self ):
         while True :
-            for deal_id in list (self .review_check_deals ):
+            due_deals =self ._pop_due_review_deals ()
+            if not due_deals :
+                time .sleep (1 )
+                continue 
+
+            self .reviews_stats ["checks"]+=len (due_deals )
+            try :
+                deals =self ._get_review_deals (due_deals )
+            except :
+                deals ={}
+                logger .debug (f"Error checking new reviews: {traceback .format_exc ()}")
+
+            for deal_id in due_deals :
                 try :
-                    if not self ._should_check_review_deal (deal_id ):
+                    deal =deals .get (deal_id )
+                    if not deal or not (deal .review or deal .status is ItemDealStatuses .ROLLED_BACK ):
+                        self ._reschedule_review_deal (deal_id )
                         continue 
 
-                    try :deal =self .account .get_deal (deal_id )
-                    except :continue 
-
-                    if deal .review :
-                        if deal_id in self .review_check_deals :
-                            self .review_check_deals .remove (deal_id )
+                    with self ._review_lock :
+                        self ._evict_review_deal (deal_id )
+                    if not deal .review :
+                        continue 
 
-                        try :
-                            deal .chat =[chat_ for chat_ in self .chats if chat_ .id ==deal .chat .id ][0 ]
-                        except :
-                            try :deal .chat =self .account .get_chat (deal .chat .id )
-                            except :pass 
+                    try :
+                        deal .chat =[chat_ for chat_ in self .chats if chat_ .id ==deal .chat .id ][0 ]
+                    except :
+                        try :deal .chat =self .account .get_chat (deal .chat .id )
+                        except :pass 
 
-                        yield NewReviewEvent (deal ,deal .chat )
+                    self .reviews_stats ["detections"]+=1 
+                    yield NewReviewEvent (deal ,deal .chat )
                 except :
                     logger .debug (f"Error checking new reviews in a deal{deal_id }: {traceback .format_exc ()}")
-            time .sleep (1 )
 
-    def _wait_for_check_new_chats (self ,delay =10 ):
-        sleep_time =delay -(time .time ()-self ._last_chats_check )
-        if sleep_time >0 :
-            time .sleep (sleep_time )
+    def _wait_for_new_deals_check (self )->bool :
+        max_interval =DEALS_POLL_MAX_INTERVAL if self .ws is not None and self .ws .connected else DEALS_POLL_OFFLINE_INTERVAL 
+        interval =min (self ._deals_poll_interval ,max_interval )
+        by_event =self ._possible_new_chat .wait (timeout =max (0 ,interval -(time .time ()-self ._last_chats_check )))
+        if by_event :
+            self ._possible_new_chat .clear ()
+            self ._deals_poll_interval =DEALS_POLL_MIN_INTERVAL 
+            sleep_time =DEALS_POLL_MIN_INTERVAL -(time .time ()-self ._last_chats_check )
+            if sleep_time >0 :
+                time .sleep (sleep_time )
+        return by_event 
+
+    def _get_new_deal_chats (self ,watermark :datetime )->list [Chat ]:
+        chats =[]
+        cursor =None 
+        for _ in range (DEALS_POLL_MAX_PAGES ):
+            chat_list =self .account .get_chats (count =DEALS_POLL_PAGE_SIZE ,type =ChatTypes .PM ,after_cursor =cursor )
+            self .new_deals_stats ["requests"]+=1 
+
+            newer_chats =[
+            chat_ for chat_ in chat_list .chats 
+            if chat_ .last_message and self ._parse_iso (chat_ .last_message .created_at )>watermark 
+            ]
+            chats .extend (newer_chats )
+            if len (newer_chats )<len (chat_list .chats )or not chat_list .page_info .has_next_page :
+                break # the rest of the chats were already seen on the previous checks
+            cursor =chat_list .page_info .end_cursor 
+        return chats 
 
     def listen_new_deals (self ):
         while True :
+            by_event =self ._wait_for_new_deals_check ()
+            detected =0 
             try :
-                by_event =self ._possible_new_chat .wait (timeout =15 )
-                if by_event :
-                    self ._possible_new_chat .clear ()
-                    self ._wait_for_check_new_chats ()
-
-                possible_chats =[]
                 now =datetime .now (timezone .utc )
+                watermark =self ._deals_watermark or now -timedelta (seconds =self ._deals_lookback )
+                since =min (watermark ,now -timedelta (seconds =90 ))# paid messages are searched at least 90 s back
+                new_watermark =watermark 
+                is_failed =False 
 
-                for _ in range (3 ):
-                    try :
-                        if by_event :
-                            time .sleep (8 )# The player may not immediately display current chats
-
-                        chats =self .account .get_chats (count =5 ,type =ChatTypes .PM ).chats 
-                        for chat in chats :
-                            last_msg =chat .last_message 
-                            is_msg_processed =self ._is_msg_processed (last_msg .id )
-                            is_chat_processed =any ((_chat for _chat in self .chats if _chat .id ==chat .id ))
-
-                            if (
-                            not is_chat_processed 
-                            or not is_msg_processed or (
-                            is_msg_processed 
-                            and (now -self ._parse_iso (last_msg .created_at ).astimezone (timezone .utc )).total_seconds ()<=90 
-                            )
-                            ):
-                                possible_chats .append (chat )
-                                break 
-
-                        if possible_chats :
-                            break # if chats with possible new transactions are found, stop the cycle
+                self .new_deals_stats ["polls"]+=1 
+                if by_event :
+                    self .new_deals_stats ["fast_path_polls"]+=1 
 
-                        if not by_event :
-                            time .sleep (8 )
-                    except :
-                        pass 
+                chats =self ._get_new_deal_chats (watermark )
+                known_chat_ids ={chat_ .id for chat_ in self .chats }
+                is_ws_connected =self .ws is not None and self .ws .connected 
 
-                for chat in possible_chats :
+                for chat in chats :
                     last_msg =chat .last_message 
+                    new_watermark =max (new_watermark ,self ._parse_iso (last_msg .created_at ))
 
-                    # New chat - look at last_message first (fast way)
                     if (
-                    last_msg and last_msg .text =="{{ITEM_PAID}}"
-                    and (now -self ._parse_iso (last_msg .created_at ).astimezone (timezone .utc )).total_seconds ()<=90 
+                    chat .id in known_chat_ids and is_ws_connected 
+                    and self ._is_chat_subscribed (chat .id )and self ._is_msg_processed (last_msg .id )
                     ):
+                        continue # messages of subscribed chats already come from the WebSocket
+
+                        # New chat - look at last_message first (fast way)
+                    if last_msg .text =="{{ITEM_PAID}}"and self ._parse_iso (last_msg .created_at )>since :
+                        detected +=1 
                         events =self ._proccess_new_chat_message (chat ,last_msg )
                         for event in events :
                             yield event 
@@ -513,70 +853,155 @@ class EventListener :
                         # slow path: last_message is interrupted by a new message from the buyer.
                         # we request history and look for {{ITEM_PAID}} among the first messages.
                     try :
-                        time .sleep (1 )
-                        messages =self .account .get_chat_messages (chat .id ,count =12 ).messages 
-                        new_paid_msg =next (
-                        (
-                        msg for msg in messages 
-                        if msg .text =="{{ITEM_PAID}}"
-                        and (now -self ._parse_iso (msg .created_at ).astimezone (timezone .utc )).total_seconds ()<=90 
-                        # ^ check that this transaction was made recently
-                        ),
-                        None 
-                        )
+                        new_paid_msg =self .message_store .get_latest (chat .id ,"{{ITEM_PAID}}",since )
+                        if not new_paid_msg :
+                            messages =self ._get_chat_messages (chat .id ,count =12 )
+                            self .new_deals_stats ["requests"]+=1 
+                            new_paid_msg =next (
+                            (
+                            msg for msg in messages 
+                            if msg .text =="{{ITEM_PAID}}"
+                            and self ._parse_iso (msg .created_at )>since 
+                            ),
+                            None 
+                            )
 
                         if new_paid_msg :
+                            detected +=1 
                             events =self ._proccess_new_chat_message (chat ,new_paid_msg )
                             for event in events :
                                 yield event 
                     except :
+                        is_failed =True 
                         logger .debug (f"Error getting new chat message history{chat .id }: {traceback .format_exc ()}")
-            except websocket ._exceptions .WebSocketException :
-                pass 
+
+                if not is_failed :# chats that failed are checked again on the next check
+                    self ._deals_watermark =new_watermark 
+                self ._deals_lookback =90 
             except :
                 logger .debug (f"Error checking new transactions:{traceback .format_exc ()}")
 
+            if detected :
+                self .new_deals_stats ["detections"]+=detected 
+                self ._deals_poll_interval =DEALS_POLL_MIN_INTERVAL 
+            else :
+                self .new_deals_stats ["wasted_polls"]+=1 
+                self ._deals_poll_interval =min (self ._deals_poll_interval *2 ,DEALS_POLL_MAX_INTERVAL )
             self ._last_chats_check =time .time ()
 
-    def listen_deal_statuses (self ):# listens for status changes in all active transactions
-        while True :# TODO: Improve it, check again for bugs
-            for chat_id ,deals in list (self .active_deals .items ()):
-                for _ in range (3 ):
-                    try :
-                        msg_list =self .account .get_chat_messages (chat_id ,24 )
-                        messages =sorted (
-                        msg_list .messages ,
-                        key =lambda x :self ._parse_iso (x .created_at )
-                        )
-                        break 
-                    except :
-                        time .sleep (6 )
+    def _get_deal_chat (self ,deal :ItemDeal ,chat_id :str |None )->Chat |None :
+        chat_id =chat_id or (deal .chat .id if deal .chat else None )
+        try :return [chat_ for chat_ in self .chats if chat_ .id ==chat_id ][0 ]
+        except :pass 
+        if deal .chat :
+            return deal .chat # the deal only has the chat ID, that is enough to answer in it
+        try :
+            if chat_id :
+                return self .account .get_chat (chat_id )
+            chat =self .account .get_deal (deal .id ).chat 
+            if chat :
+                with self ._deal_states_lock :
+                    if deal .id in self .deal_states :
+                        self .deal_states [deal .id ]["chat_id"]=chat .id 
+            return chat 
+        except :
+            logger .debug (f"Error getting the chat of deal {deal .id }: {traceback .format_exc ()}")
+            return None 
+
+    def _get_deal_sync_events (self ,deal :ItemDeal )->list [
+    ItemSentEvent 
+    |DealConfirmedEvent 
+    |DealRolledBackEvent 
+    |DealHasProblemEvent 
+    |DealProblemResolvedEvent 
+    |DealStatusChangedEvent 
+    ]:
+        changes =self ._update_deal_state (deal ,deal .chat .id if deal .chat else None ,deal .status ,bool (deal .has_problem ))
+        if changes is None or not any (changes ):
+            return []# the deal is seen for the first time or has not changed
+
+        is_status_changed ,is_problem_changed =changes 
+        chat =self ._get_deal_chat (deal ,self .deal_states .get (deal .id ,{}).get ("chat_id"))
+        if chat is None :# the handlers answer in the deal chat
+            logger .warning (f"Chat of deal {deal .id } was not found, its status change events are skipped")
+            return []
+        events =[]
 
-                for deal_id ,last_status ,status_date in deals :
-                    try :
-                        status_msgs =[
-                        msg for msg in messages 
-                        if self ._parse_iso (msg .created_at )
-                        >=status_date and msg .deal .status 
-                        ]
+        if is_status_changed :
+            if deal .status is ItemDealStatuses .SENT :
+                events .append (ItemSentEvent (deal ,chat ))
+            elif deal .status in (ItemDealStatuses .CONFIRMED ,ItemDealStatuses .CONFIRMED_AUTOMATICALLY ):
+                events .append (DealConfirmedEvent (deal ,chat ))
+            elif deal .status is ItemDealStatuses .ROLLED_BACK :
+                events .append (DealRolledBackEvent (deal ,chat ))
+        if is_problem_changed :
+            events .append (DealHasProblemEvent (deal ,chat )if deal .has_problem else DealProblemResolvedEvent (deal ,chat ))
+        events .append (DealStatusChangedEvent (deal ,chat ))
+        return events 
 
-                        for msg in status_msgs :
-                            msg_date =self ._parse_iso (msg .created_at )
-                            if msg .deal .status ==last_status and msg_date ==status_date :
-                                continue 
+    def _sync_deal_statuses (self )->list [DealStatusChangedEvent ]:
+        events =[]
+        if self ._deal_sync_cursor is None :# a new pass over the active deals
+            with self ._deal_states_lock :
+                self ._deal_sync_pass_ids ={
+                deal_id for deal_id ,state in self .deal_states .items ()
+                if state ["status"]in ACTIVE_DEAL_STATUSES 
+                }
+            self ._deal_sync_seen_ids =set ()
+            if not self ._deal_sync_pass_ids and not self ._deal_sync_lookups :
+                return events 
+
+        if self ._deal_sync_pass_ids :
+            for _ in range (DEAL_STATUS_SYNC_MAX_PAGES ):
+                deal_list =self .account .get_deals (
+                count =24 ,
+                statuses =list (ACTIVE_DEAL_STATUSES ),
+                after_cursor =self ._deal_sync_cursor 
+                )
+                self .deal_statuses_stats ["requests"]+=1 
+                for deal in deal_list .deals :
+                    self ._deal_sync_seen_ids .add (deal .id )
+                    events .extend (self ._get_deal_sync_events (deal ))
+
+                if not deal_list .page_info .has_next_page :
+                    self ._deal_sync_cursor =None 
+                    for deal_id in self ._deal_sync_pass_ids -self ._deal_sync_seen_ids :
+                        self ._deal_sync_lookups [deal_id ]=None # the deal has left the active statuses
+                    self ._deal_sync_pass_ids =set ()
+                    self .deal_statuses_stats ["passes"]+=1 
+                    break 
+                self ._deal_sync_cursor =deal_list .page_info .end_cursor 
 
-                            try :chat =self .account .get_chat (chat_id )
-                            except :continue 
+        for deal_id in list (self ._deal_sync_lookups )[:DEAL_STATUS_SYNC_MAX_LOOKUPS ]:
+            del self ._deal_sync_lookups [deal_id ]
+            try :
+                deal =self .account .get_deal (deal_id )
+                self .deal_statuses_stats ["requests"]+=1 
+            except :
+                logger .debug (f"Error getting deal{deal_id }: {traceback .format_exc ()}")
+                continue 
+            events .extend (self ._get_deal_sync_events (deal ))
+        return events 
 
-                            events =self ._parse_message_events (msg ,chat )
-                            for event in events :
-                                yield event 
+    def _evict_deal_states (self ):
+        now =time .time ()
+        with self ._deal_states_lock :
+            for deal_id ,state in list (self .deal_states .items ()):
+                if (
+                state ["status"]not in ACTIVE_DEAL_STATUSES and now -state ["updated"]>DEAL_FINISHED_KEEP 
+                or now -state ["updated"]>DEAL_STATUS_TTL 
+                ):
+                    del self .deal_states [deal_id ]
 
-                            self ._set_active_deal (chat ,msg .deal ,msg_date )
-                    except :
-                        logger .debug (f"Error checking transaction statuses{deal_id }: {traceback .format_exc ()}")
-                    time .sleep (8 )
-            time .sleep (1 )
+    def listen_deal_statuses (self ):# listens for status changes in all active transactions
+        while True :
+            time .sleep (DEAL_STATUS_SYNC_INTERVAL )
+            try :
+                for event in self ._sync_deal_statuses ():
+                    yield event 
+            except :
+                logger .debug (f"Error checking transaction statuses: {traceback .format_exc ()}")
+            self ._evict_deal_states ()
 
     def listen (
     self ,
@@ -601,6 +1026,8 @@ class EventListener :
             return 
 
         self .q =Queue ()
+        metrics =get_metrics ()
+        metrics .set_gauge ("playerok_listener_queue_depth",self .q .qsize ,account =self .account .username or self .account .id )
 
         def run (gen ):
             for event in gen :
@@ -609,10 +1036,13 @@ class EventListener :
         if get_new_message_events :
             Thread (target =run ,args =(self .listen_new_messages (),),daemon =True ).start ()
             Thread (target =run ,args =(self .listen_new_deals (),),daemon =True ).start ()
-            #Thread(target=run, args=(self.listen_deal_statuses(),), daemon=True).start()
+            Thread (target =run ,args =(self .listen_deal_statuses (),),daemon =True ).start ()
 
         if get_new_review_events :
             Thread (target =run ,args =(self .listen_new_reviews (),),daemon =True ).start ()
 
         while True :
-            yield self .q .get ()
\ No newline at end of file
+            event =self .q .get ()
+            metrics .inc ("playerok_events_total",type =event .type .name )
+            metrics .observe ("playerok_event_lag_seconds",time .time ()-event .time ,type =event .type .name )
+            yield event 
\ No newline at end of file
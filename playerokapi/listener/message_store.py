@@ -0,0 +1,127 @@
+import time 
+import bisect 
+from datetime import datetime 
+from threading import Lock 
+from collections import OrderedDict 
+
+from ..types import ChatMessage 
+
+
+MESSAGE_STORE_MAX_CHATS =200 
+MESSAGE_STORE_MAX_MESSAGES =100 
+
+
+def _get_timestamp (iso_dt :str |None )->float :
+    if not iso_dt :
+        return 0 
+    if iso_dt .endswith ("Z"):
+        iso_dt =iso_dt [:-1 ]+"+00:00"
+    try :return datetime .fromisoformat (iso_dt ).timestamp ()
+    except ValueError :return 0 
+
+
+class ChatHistory :
+    'Locally known messages of one chat.\n\n    :param chat_id: Chat ID.\n    :type chat_id: `str`'
+
+    def __init__ (self ,chat_id :str ):
+        self .chat_id :str =chat_id 
+        "Chat ID."
+        self .messages :dict [str ,ChatMessage ]={}
+        "Messages by their IDs."
+        self .order :list [tuple [float ,str ]]=[]
+        "Pairs (creation time, message ID) sorted by the creation time."
+        self .actual_ids :set [str ]=set ()
+        "IDs of the messages received from the API pages (with full deal data)."
+        self .fetched_at :float =0 
+        "Time of the last page fetch (timestamp)."
+
+
+class ChatMessageStore :
+    'Bounded store of recent chat messages, fed by WebSocket frames and by fetched pages.\n    Keeps up to `max_messages` latest messages for each of the `max_chats`\n    most recently active chats, the least recently active chats are evicted.\n\n    :param max_chats: Maximum number of chats in the store.\n    :type max_chats: `int`\n\n    :param max_messages: Maximum number of messages of one chat.\n    :type max_messages: `int`'
+
+    def __init__ (self ,max_chats :int =MESSAGE_STORE_MAX_CHATS ,
+    max_messages :int =MESSAGE_STORE_MAX_MESSAGES ):
+        self .max_chats =max_chats 
+        self .max_messages =max_messages 
+
+        self .hits :int =0 
+        "Number of lookups served from the store."
+        self .misses :int =0 
+        "Number of lookups that required an API request."
+
+        self ._chats :OrderedDict [str ,ChatHistory ]=OrderedDict ()
+        self ._lock =Lock ()
+
+    def _get_history (self ,chat_id :str )->ChatHistory :
+        history =self ._chats .get (chat_id )
+        if history is None :
+            history =self ._chats [chat_id ]=ChatHistory (chat_id )
+            while len (self ._chats )>self .max_chats :
+                self ._chats .popitem (last =False )
+        else :
+            self ._chats .move_to_end (chat_id )
+        return history 
+
+    def _add (self ,history :ChatHistory ,message :ChatMessage ,is_actual :bool ):
+        if message .id not in history .messages :
+            bisect .insort (history .order ,(_get_timestamp (message .created_at ),message .id ))
+        if is_actual or message .id not in history .actual_ids :
+            history .messages [message .id ]=message 
+        if is_actual :
+            history .actual_ids .add (message .id )
+
+        while len (history .order )>self .max_messages :
+            _ ,old_id =history .order .pop (0 )
+            history .messages .pop (old_id ,None )
+            history .actual_ids .discard (old_id )
+
+    def add (self ,chat_id :str ,message :ChatMessage ):
+        'Adds a message received from the WebSocket.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param message: Message object.\n        :type message: `playerokapi.types.ChatMessage`'
+        if not message or not message .id :
+            return 
+        with self ._lock :
+            self ._add (self ._get_history (chat_id ),message ,False )
+
+    def add_page (self ,chat_id :str ,messages :list [ChatMessage ]):
+        'Adds the messages of a page fetched from the API.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param messages: Messages of the page.\n        :type messages: `list[playerokapi.types.ChatMessage]`'
+        with self ._lock :
+            history =self ._get_history (chat_id )
+            for message in messages :
+                self ._add (history ,message ,True )
+            history .fetched_at =time .time ()
+
+    def get (self ,chat_id :str ,message_id :str ,actual_only :bool =False )->ChatMessage |None :
+        'Returns the message by its ID.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param message_id: Message ID.\n        :type message_id: `str`\n\n        :param actual_only: Return only the message received from an API page, _optional_.\n        :type actual_only: `bool`\n\n        :return: Message object or None if it is not in the store.\n        :rtype: `playerokapi.types.ChatMessage` or `None`'
+        with self ._lock :
+            history =self ._chats .get (chat_id )
+            if not history or (actual_only and message_id not in history .actual_ids ):
+                return None 
+            return history .messages .get (message_id )
+
+    def get_messages (self ,chat_id :str ,count :int =24 ,max_age :float |None =None )->list [ChatMessage ]|None :
+        'Returns the latest messages of the chat, newest first (like the API page).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param count: Number of messages.\n        :type count: `int`\n\n        :param max_age: Maximum age of the last page fetch in seconds (None - any), _optional_.\n        :type max_age: `float` or `None`\n\n        :return: List of messages or None if the store has no fresh enough page of the chat.\n        :rtype: `list[playerokapi.types.ChatMessage]` or `None`'
+        with self ._lock :
+            history =self ._chats .get (chat_id )
+            if not history or not history .fetched_at or (
+            max_age is not None and time .time ()-history .fetched_at >max_age 
+            ):
+                self .misses +=1 
+                return None 
+            self .hits +=1 
+            return [history .messages [message_id ]for _ ,message_id in reversed (history .order [-count :])]
+
+    def get_latest (self ,chat_id :str ,text :str |None =None ,since :datetime |None =None ,
+    with_deal :bool =True )->ChatMessage |None :
+        'Returns the latest message of the chat matching the conditions, without API requests.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param text: Message text (e.g. system `{{ITEM_PAID}}`), None - any, _optional_.\n        :type text: `str` or `None`\n\n        :param since: The message must be created after this time, _optional_.\n        :type since: `datetime.datetime` or `None`\n\n        :param with_deal: Return only messages with a deal, _optional_.\n        :type with_deal: `bool`\n\n        :return: Message object or None if not found.\n        :rtype: `playerokapi.types.ChatMessage` or `None`'
+        with self ._lock :
+            history =self ._chats .get (chat_id )
+            if not history :
+                return None 
+            since_ts =since .timestamp ()if since else 0 
+            for created_ts ,message_id in reversed (history .order ):
+                if created_ts <=since_ts :
+                    break 
+                message =history .messages [message_id ]
+                if (text is None or message .text ==text )and (not with_deal or message .deal ):
+                    return message 
+        return None 
@@ -0,0 +1,95 @@
+import zlib 
+from logging import getLogger 
+
+import websocket 
+from websocket ._abnf import ABNF ,frame_buffer 
+
+
+logger =getLogger ("playerokapi.listener")
+
+DEFLATE_TAIL =b"\x00\x00\xff\xff"
+
+
+class DeflateFrameBuffer (frame_buffer ):
+    'Frame buffer that removes the RSV1 bit from the headers of the compressed frames\n    (websocket-client rejects frames with RSV bits, the payload is inflated by `DeflateWebSocket`).'
+
+    def __init__ (self ,recv_fn :callable ,skip_utf8_validation :bool ):
+        super ().__init__ (recv_fn ,skip_utf8_validation )
+        self .is_deflate_enabled =False 
+        self .is_compressed =False 
+
+    def recv_header (self ):
+        super ().recv_header ()
+        fin ,rsv1 ,rsv2 ,rsv3 ,opcode ,has_mask ,length_bits =self .header 
+        self .is_compressed =bool (rsv1 )and self .is_deflate_enabled 
+        if self .is_compressed :
+            self .header =(fin ,0 ,rsv2 ,rsv3 ,opcode ,has_mask ,length_bits )
+
+
+class DeflateWebSocket (websocket .WebSocket ):
+    'WebSocket with support for the permessage-deflate extension (RFC 7692) on received messages.\n    Compression is used if the server accepts the `sec-websocket-extensions` header of the handshake,\n    sent messages are not compressed. Also counts the sizes of the received messages.'
+
+    def __init__ (self ,*args ,**kwargs ):
+        super ().__init__ (*args ,**kwargs )
+        self .frame_buffer =DeflateFrameBuffer (self ._recv ,self .frame_buffer .skip_utf8_validation )
+
+        self .is_deflate_enabled :bool =False 
+        "Whether the server compresses the messages."
+        self .received_frames :int =0 
+        "Number of frames of the last received message."
+        self .received_size :int =0 
+        "Size of the last received message as it was transferred (compressed), in bytes."
+        self .received_raw_size :int =0 
+        "Size of the last received message after inflating, in bytes."
+
+        self ._decompressor =None 
+        self ._no_context_takeover =False 
+        self ._is_inflating =False 
+        self ._frames =0 
+        self ._size =0 
+        self ._raw_size =0 
+
+    def connect (self ,url :str ,**options ):
+        super ().connect (url ,**options )
+
+        extensions =(self .getheaders ()or {}).get ("sec-websocket-extensions","")
+        params =next (
+        (
+        [param .strip ()for param in extension .split (";")]
+        for extension in extensions .split (",")
+        if extension .strip ().startswith ("permessage-deflate")
+        ),
+        None 
+        )
+        self .is_deflate_enabled =params is not None 
+        self ._no_context_takeover =bool (params )and "server_no_context_takeover"in params 
+        self ._decompressor =zlib .decompressobj (-zlib .MAX_WBITS )
+        self ._is_inflating =False 
+        self .frame_buffer .is_deflate_enabled =self .is_deflate_enabled 
+        logger .debug (f"WS permessage-deflate: {'on'if self .is_deflate_enabled else 'off'}")
+
+    def recv_frame (self )->ABNF :
+        frame =super ().recv_frame ()
+        if frame .opcode not in (ABNF .OPCODE_TEXT ,ABNF .OPCODE_BINARY ,ABNF .OPCODE_CONT ):
+            return frame # control frames are never compressed
+
+        if frame .opcode !=ABNF .OPCODE_CONT :# the first frame of a message
+            self ._is_inflating =self .frame_buffer .is_compressed 
+            self ._frames =self ._size =self ._raw_size =0 
+
+        self ._frames +=1 
+        self ._size +=len (frame .data )
+        if self ._is_inflating :
+            data =self ._decompressor .decompress (frame .data )
+            if frame .fin :
+                data +=self ._decompressor .decompress (DEFLATE_TAIL )
+                if self ._no_context_takeover :
+                    self ._decompressor =zlib .decompressobj (-zlib .MAX_WBITS )
+            frame .data =data 
+        self ._raw_size +=len (frame .data )
+
+        if frame .fin :
+            self .received_frames =self ._frames 
+            self .received_size =self ._size 
+            self .received_raw_size =self ._raw_size 
+        return frame 
@@ -0,0 +1,153 @@
+from bisect import bisect_left 
+from threading import Lock 
+
+
+METRICS_BUCKETS =(0.05 ,0.1 ,0.25 ,0.5 ,1 ,2.5 ,5 ,10 ,30 ,60 )
+
+
+def _escape (value )->str :
+    return str (value ).replace ("\\","\\\\").replace ('"','\\"').replace ("\n"," ")
+
+
+def _format_labels (labels :tuple ,le :str |None =None )->str :
+    parts =[f'{k }="{_escape (v )}"'for k ,v in labels ]
+    if le is not None :
+        parts .append (f'le="{le }"')
+    return "{"+",".join (parts )+"}"if parts else ""
+
+
+class Metrics :
+    'Registry of the performance metrics: counters, histograms and gauges with labels.\n    While the registry is disabled, `inc` and `observe` return at once, so the instrumented code\n    costs a single attribute check.\n\n    :param buckets: Upper bounds of the histograms buckets in seconds, _optional_.\n    :type buckets: `tuple[float]`'
+
+    def __init__ (self ,buckets :tuple [float ]=METRICS_BUCKETS ):
+        self .enabled :bool =False 
+        'Whether the metrics are collected.'
+        self .buckets :tuple [float ]=buckets 
+        'Upper bounds of the histograms buckets.'
+
+        self ._descriptions :dict [str ,tuple [str ,str ]]={}
+        self ._values :dict [tuple [str ,tuple ],float |list ]={}
+        self ._gauges :dict [tuple [str ,tuple ],callable ]={}
+        self ._lock =Lock ()
+
+    def describe (self ,name :str ,metric_type :str ,description :str ):
+        'Sets the type and the description of the metric (used in the export).\n\n        :param name: Metric name.\n        :type name: `str`\n\n        :param metric_type: Metric type: counter, histogram or gauge.\n        :type metric_type: `str`\n\n        :param description: Metric description.\n        :type description: `str`'
+        self ._descriptions [name ]=(metric_type ,description )
+
+    def inc (self ,name :str ,value :float =1 ,**labels ):
+        'Increases the counter.\n\n        :param name: Counter name.\n        :type name: `str`\n\n        :param value: Increment, _optional_.\n        :type value: `float`'
+        if not self .enabled :
+            return 
+        key =(name ,tuple (sorted (labels .items ())))
+        with self ._lock :
+            self ._values [key ]=self ._values .get (key ,0 )+value 
+
+    def observe (self ,name :str ,value :float ,**labels ):
+        'Adds the value to the histogram.\n\n        :param name: Histogram name.\n        :type name: `str`\n\n        :param value: Observed value (seconds).\n        :type value: `float`'
+        if not self .enabled :
+            return 
+        key =(name ,tuple (sorted (labels .items ())))
+        with self ._lock :
+            histogram =self ._values .get (key )
+            if histogram is None :
+                histogram =self ._values [key ]=[[0 ]*(len (self .buckets )+1 ),0.0 ,0 ]
+            histogram [0 ][bisect_left (self .buckets ,value )]+=1 
+            histogram [1 ]+=value 
+            histogram [2 ]+=1 
+
+    def set_gauge (self ,name :str ,func :callable ,**labels ):
+        'Registers the gauge, its value is read from the function on export.\n\n        :param name: Gauge name.\n        :type name: `str`\n\n        :param func: Function that returns the current value.\n        :type func: `callable`'
+        self ._gauges [(name ,tuple (sorted (labels .items ())))]=func 
+
+    def get_series (self ,name :str )->list [tuple [dict ,float |list ]]:
+        'Returns the series of the metric.\n\n        :param name: Metric name.\n        :type name: `str`\n\n        :return: Pairs (labels, value), the histogram value is [bucket counts, sum, count].\n        :rtype: `list[tuple[dict, float | list]]`'
+        with self ._lock :
+            return [
+            (dict (labels ),[list (value [0 ]),value [1 ],value [2 ]]if isinstance (value ,list )else value )
+            for (name_ ,labels ),value in self ._values .items ()if name_ ==name 
+            ]
+
+    def get_gauge_values (self ,name :str )->list [tuple [dict ,float ]]:
+        'Returns the current values of the gauge.\n\n        :param name: Gauge name.\n        :type name: `str`\n\n        :return: Pairs (labels, value).\n        :rtype: `list[tuple[dict, float]]`'
+        values =[]
+        for (name_ ,labels ),func in list (self ._gauges .items ()):
+            if name_ ==name :
+                try :values .append ((dict (labels ),func ()))
+                except Exception :pass 
+        return values 
+
+    def get_total (self ,name :str ,**labels )->float :
+        'Returns the sum of the counter series matching the labels (the observations count for a histogram).\n\n        :param name: Metric name.\n        :type name: `str`\n\n        :return: Total value.\n        :rtype: `float`'
+        return sum (
+        value [2 ]if isinstance (value ,list )else value 
+        for series_labels ,value in self .get_series (name )
+        if all (str (series_labels .get (k ))==str (v )for k ,v in labels .items ())
+        )
+
+    def get_quantile (self ,name :str ,quantile :float ,**labels )->float |None :
+        'Estimates the quantile of the histogram series matching the labels (by the bucket upper bounds).\n\n        :param name: Histogram name.\n        :type name: `str`\n\n        :param quantile: Quantile from 0 to 1.\n        :type quantile: `float`\n\n        :return: Estimated value or None if there are no observations.\n        :rtype: `float` or `None`'
+        counts =[0 ]*(len (self .buckets )+1 )
+        for series_labels ,value in self .get_series (name ):
+            if isinstance (value ,list )and all (str (series_labels .get (k ))==str (v )for k ,v in labels .items ()):
+                counts =[a +b for a ,b in zip (counts ,value [0 ])]
+        total =sum (counts )
+        if not total :
+            return None 
+        seen =0 
+        for i ,count in enumerate (counts ):
+            seen +=count 
+            if seen >=total *quantile :
+                return self .buckets [i ]if i <len (self .buckets )else float ("inf")
+
+    def export (self )->str :
+        'Exports the metrics in the Prometheus text format.\n\n        :return: Metrics text.\n        :rtype: `str`'
+        with self ._lock :
+            values =sorted (self ._values .items (),key =lambda item :(item [0 ][0 ],repr (item [0 ][1 ])))
+        gauges =sorted (self ._gauges .items (),key =lambda item :(item [0 ][0 ],repr (item [0 ][1 ])))
+
+        lines =[]
+        described =set ()
+
+        def describe (name ,metric_type ):
+            if name in described :
+                return 
+            described .add (name )
+            metric_type ,description =self ._descriptions .get (name ,(metric_type ,""))
+            if description :
+                lines .append (f"# HELP {name } {description }")
+            lines .append (f"# TYPE {name } {metric_type }")
+
+        for (name ,labels ),value in values :
+            if isinstance (value ,list ):
+                describe (name ,"histogram")
+                cumulative =0 
+                for bound ,count in zip (self .buckets +("+Inf",),value [0 ]):
+                    cumulative +=count 
+                    lines .append (f"{name }_bucket{_format_labels (labels ,bound )} {cumulative }")
+                lines .append (f"{name }_sum{_format_labels (labels )} {value [1 ]}")
+                lines .append (f"{name }_count{_format_labels (labels )} {value [2 ]}")
+            else :
+                describe (name ,"counter")
+                lines .append (f"{name }{_format_labels (labels )} {value }")
+
+        for (name ,labels ),func in gauges :
+            try :
+                value =func ()
+            except Exception :
+                continue 
+            describe (name ,"gauge")
+            lines .append (f"{name }{_format_labels (labels )} {value }")
+        return "\n".join (lines )+"\n"
+
+    def reset (self ):
+        'Clears the collected values (the gauges are kept).'
+        with self ._lock :
+            self ._values .clear ()
+
+
+_metrics =Metrics ()
+
+
+def get_metrics ()->Metrics :
+    'Returns the metrics registry of the process.\n\n    :return: Metrics registry.\n    :rtype: `playerokapi.metrics.Metrics`'
+    return _metrics 
@@ -0,0 +1,142 @@
+import os 
+import time 
+import pickle 
+import inspect 
+import tempfile 
+import functools 
+from threading import Lock ,Thread 
+from logging import getLogger 
+
+
+logger =getLogger ("playerokapi")
+
+REFERENCE_CACHE_VERSION =1 
+REFERENCE_CACHE_MAX_ENTRIES =1000 
+REFERENCE_TTLS ={
+"games":24 *3600 ,
+"game":24 *3600 ,
+"game_category":12 *3600 ,
+"game_category_obtaining_types":12 *3600 ,
+"game_category_data_fields":12 *3600 ,
+"transaction_providers":6 *3600 ,
+"sbp_bank_members":24 *3600 
+}
+
+
+class ReferenceCache :
+    'Cache of the rarely changing reference data (games, categories, banks, transaction providers).\n    Each entity type has its own TTL, a stale entry is returned at once and refreshed in the background.\n    If the directory is set, each entity type is stored in its own versioned file, loaded lazily\n    on the first access to the entity type.\n\n    :param dir_path: Directory of the cache files (None - memory only), _optional_.\n    :type dir_path: `str` or `None`'
+
+    def __init__ (self ,dir_path :str |None =None ):
+        self .dir_path =dir_path 
+
+        self .stats :dict [str ,int ]={"hits":0 ,"stale_hits":0 ,"misses":0 ,"refreshes":0 }
+        "Cache statistics."
+
+        self ._entries :dict [str ,dict [str ,tuple [object ,float ]]]={}
+        self ._refreshing :set [tuple [str ,str ]]=set ()
+        self ._lock =Lock ()
+
+    def set_dir (self ,dir_path :str ):
+        'Sets the directory of the cache files (the already loaded entity types are not reloaded).\n\n        :param dir_path: Directory path.\n        :type dir_path: `str`'
+        self .dir_path =dir_path 
+
+    def _get_path (self ,entity :str )->str :
+        return os .path .join (self .dir_path ,f"{entity }.pkl")
+
+    def _load (self ,entity :str )->dict [str ,tuple [object ,float ]]:
+        entries =self ._entries .get (entity )
+        if entries is not None :
+            return entries 
+
+        entries ={}
+        if self .dir_path and os .path .exists (self ._get_path (entity )):
+            try :
+                with open (self ._get_path (entity ),"rb")as f :
+                    stored =pickle .load (f )
+                if stored .get ("version")==REFERENCE_CACHE_VERSION :
+                    entries =stored ["entries"]
+            except Exception as e :
+                logger .debug (f"Failed to read the reference cache of \"{entity }\": {e }")
+        self ._entries [entity ]=entries 
+        return entries 
+
+    def _save (self ,entity :str ):
+        if not self .dir_path :
+            return 
+        try :
+            os .makedirs (self .dir_path ,exist_ok =True )
+            with tempfile .NamedTemporaryFile (# atomic file write
+            "wb",
+            dir =self .dir_path ,
+            delete =False 
+            )as tmp :
+                pickle .dump (
+                {"version":REFERENCE_CACHE_VERSION ,"entries":dict (self ._entries [entity ])},
+                tmp ,protocol =pickle .HIGHEST_PROTOCOL 
+                )
+            os .replace (tmp .name ,self ._get_path (entity ))
+        except Exception as e :
+            logger .debug (f"Failed to save the reference cache of \"{entity }\": {e }")
+
+    def _store (self ,entity :str ,key :str ,value :object ):
+        with self ._lock :
+            entries =self ._load (entity )
+            entries [key ]=(value ,time .time ())
+            if len (entries )>REFERENCE_CACHE_MAX_ENTRIES :
+                for old_key ,_ in sorted (entries .items (),key =lambda item :item [1 ][1 ])[:len (entries )-REFERENCE_CACHE_MAX_ENTRIES ]:
+                    del entries [old_key ]
+            self ._save (entity )
+
+    def _refresh (self ,entity :str ,key :str ,fetch :callable ):
+        try :
+            self ._store (entity ,key ,fetch ())
+            self .stats ["refreshes"]+=1 
+        except Exception as e :
+            logger .debug (f"Failed to refresh the reference data \"{entity }\": {e }")
+        finally :
+            with self ._lock :
+                self ._refreshing .discard ((entity ,key ))
+
+    def get (self ,entity :str ,key :str ,fetch :callable ):
+        'Returns the reference data from the cache, fetches it if it is missing.\n\n        :param entity: Entity type (key of `REFERENCE_TTLS`).\n        :type entity: `str`\n\n        :param key: Key of the entry (request arguments).\n        :type key: `str`\n\n        :param fetch: Function that fetches the data.\n        :type fetch: `callable`\n\n        :return: Reference data.'
+        with self ._lock :
+            entry =self ._load (entity ).get (key )
+            if entry is not None :
+                value ,fetched_at =entry 
+                if time .time ()-fetched_at <=REFERENCE_TTLS .get (entity ,3600 ):
+                    self .stats ["hits"]+=1 
+                    return value 
+
+                self .stats ["stale_hits"]+=1 
+                if (entity ,key )not in self ._refreshing :
+                    self ._refreshing .add ((entity ,key ))
+                    Thread (target =self ._refresh ,args =(entity ,key ,fetch ),daemon =True ).start ()
+                return value 
+            self .stats ["misses"]+=1 
+
+        value =fetch ()
+        if value is not None :
+            self ._store (entity ,key ,value )
+        return value 
+
+    def clear (self ,entity :str |None =None ):
+        'Clears the cache.\n\n        :param entity: Entity type (None - all types), _optional_.\n        :type entity: `str` or `None`'
+        with self ._lock :
+            for entity_ in ([entity ]if entity else list (REFERENCE_TTLS )):
+                self ._entries [entity_ ]={}
+                self ._save (entity_ )
+
+
+def reference_data (entity :str ):
+    'Decorator of the `Account` methods that return reference data:\n    the result is taken from `Account.reference_cache` by the method arguments.\n\n    :param entity: Entity type (key of `REFERENCE_TTLS`).\n    :type entity: `str`'
+    def decorator (func :callable )->callable :
+        signature =inspect .signature (func )
+
+        @functools .wraps (func )
+        def wrapper (self ,*args ,**kwargs ):
+            bound =signature .bind (self ,*args ,**kwargs )
+            bound .apply_defaults ()
+            key =repr (tuple (bound .arguments .values ())[1 :])
+            return self .reference_cache .get (entity ,key ,lambda :func (self ,*args ,**kwargs ))
+        return wrapper 
+    return decorator 
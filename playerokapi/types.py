@@ -322,7 +322,8 @@ class UserProfile:
         game_id: str | None = None, 
         category_id: str | None = None, 
         statuses: list[ItemStatuses] | None = None,
-        after_cursor: str | None = None
+        after_cursor: str | None = None,
+        account: Account | None = None
     ) -> ItemProfileList:
         """Gets the user's items.
 
@@ -340,11 +341,14 @@ class UserProfile:
 
         :param after_cursor: The cursor from which the parsing will take place (if not present, it searches from the very beginning of the page), _optional_.
         :type after_cursor: `str` or `None`
+
+        :param account: Account through which the request is made (if not specified, the default account is used), _optional_.
+        :type account: `playerokapi.account.Account` or `None`
         
         :return: Item profile page.
         :rtype: `PlayerokAPI.types.ItemProfileList`"""
         from .account import get_account
-        account = get_account()
+        account = account or get_account()
         
         headers = {
             "Accept": "*/*",
@@ -391,7 +395,8 @@ class UserProfile:
         max_item_price: int | None = None, 
         sort_direction: SortDirections = SortDirections.DESC, 
         sort_field: str = "createdAt", 
-        after_cursor: str | None = None
+        after_cursor: str | None = None,
+        account: Account | None = None
     ) -> ReviewList:
         """Receives user feedback.
 
@@ -427,11 +432,14 @@ class UserProfile:
 
         :param after_cursor: The cursor from which the parsing will take place (if not present, it searches from the very beginning of the page), _optional_.
         :type after_cursor: `str` or `None`
+
+        :param account: Account through which the request is made (if not specified, the default account is used), _optional_.
+        :type account: `playerokapi.account.Account` or `None`
         
         :return: Reviews page.
         :rtype: `PlayerokAPI.types.ReviewList`"""
         from .account import get_account
-        account = get_account()
+        account = account or get_account()
         
         headers = {
             "Accept": "*/*",
@@ -2230,13 +2238,13 @@ class TemporaryAttachmentUploadOutput:
                  client_attachment_id: str, expires_at: str):
         self.id: str = id
         "Data ID."
-        self.url: str = id
+        self.url: str = url
         "Image URL."
-        self.chat_id: str = id
+        self.chat_id: str = chat_id
         "ID of the chat where the image is sent."
-        self.client_attachment_id: str = id
+        self.client_attachment_id: str = client_attachment_id
         "Client application ID."
-        self.expires_at: str = id
+        self.expires_at: str = expires_at
         "Expiration date."
 
 
@@ -0,0 +1,158 @@
+import time 
+from threading import Lock ,RLock ,Timer 
+from collections import OrderedDict 
+from colorama import Fore 
+from logging import getLogger 
+
+from playerokapi .exceptions import RequestFailedError 
+from playerokapi .types import ChatMessage 
+
+
+logger =getLogger ("universal.outbox")
+
+OUTBOX_MERGE_WINDOW =1.5 
+OUTBOX_MARK_AS_READ_WINDOW =30 
+OUTBOX_RETRY_DELAY =1 
+OUTBOX_MAX_CHATS =1000 
+
+
+def _is_transient_error (e :Exception )->bool :
+    return isinstance (e ,RequestFailedError )and e .status_code ==429 # surely not applied, a send error or a 5xx may come after the message is created
+
+
+class ChatQueue :
+    'Outgoing messages of one chat.\n\n    :param chat_id: Chat ID.\n    :type chat_id: `str`'
+
+    def __init__ (self ,chat_id :str ):
+        self .chat_id :str =chat_id 
+        "Chat ID."
+        self .pending :list [tuple [str ,bool ]]=[]
+        "Messages waiting to be merged: (text, exclude watermark)."
+        self .mark_chat_as_read :bool =False 
+        "Whether the chat must be marked as read before sending the pending messages."
+        self .marked_at :float =0 
+        "Time the chat was last marked as read (timestamp)."
+        self .timer :Timer |None =None 
+        "Timer of the pending messages sending."
+        self .lock =RLock ()
+
+
+class ChatOutbox :
+    'Per-chat pipeline of the outgoing messages.\n    Messages of one chat are sent in order, queued messages produced within `merge_window`\n    seconds are merged into one message, the chat is marked as read no more than once\n    per `mark_window` seconds, rate-limited requests (429) are retried with a back-off.\n\n    :param send_func: Function that sends a message: (chat ID, text, photo file paths, with watermark).\n    :type send_func: `callable`\n\n    :param mark_func: Function that marks the chat as read: (chat ID).\n    :type mark_func: `callable`\n\n    :param merge_window: Time to wait for more messages to merge, in seconds.\n    :type merge_window: `float`\n\n    :param mark_window: Minimum interval between marking one chat as read, in seconds.\n    :type mark_window: `float`'
+
+    def __init__ (self ,send_func :callable ,mark_func :callable ,
+    merge_window :float =OUTBOX_MERGE_WINDOW ,mark_window :float =OUTBOX_MARK_AS_READ_WINDOW ):
+        self .send_func =send_func 
+        self .mark_func =mark_func 
+        self .merge_window =merge_window 
+        self .mark_window =mark_window 
+
+        self .stats :dict [str ,int ]={
+        "messages":0 ,
+        "sends":0 ,
+        "merged":0 ,
+        "marks":0 ,
+        "skipped_marks":0 ,
+        "retries":0 ,
+        "failures":0 
+        }
+        "Outbox statistics."
+
+        self ._queues :OrderedDict [str ,ChatQueue ]=OrderedDict ()
+        self ._lock =Lock ()
+
+    def _get_queue (self ,chat_id :str )->ChatQueue :
+        with self ._lock :
+            queue =self ._queues .get (chat_id )
+            if queue is None :
+                queue =self ._queues [chat_id ]=ChatQueue (chat_id )
+                if len (self ._queues )>OUTBOX_MAX_CHATS :
+                    for old_id ,old_queue in list (self ._queues .items ())[:len (self ._queues )-OUTBOX_MAX_CHATS ]:
+                        if not old_queue .pending and time .time ()-old_queue .marked_at >self .mark_window :
+                            del self ._queues [old_id ]
+            else :
+                self ._queues .move_to_end (chat_id )
+            return queue 
+
+    def _call (self ,func :callable ,*args ,max_attempts :int =3 ):
+        for attempt in range (max_attempts ):
+            try :
+                return func (*args )
+            except Exception as e :
+                if attempt +1 >=max_attempts or not _is_transient_error (e ):
+                    raise 
+                self .stats ["retries"]+=1 
+                logger .debug (f"Transient error, retrying in {OUTBOX_RETRY_DELAY *2 **attempt } s: {e }")
+                time .sleep (OUTBOX_RETRY_DELAY *2 **attempt )
+
+    def _send (self ,queue :ChatQueue ,parts :list [tuple [str ,bool ]],photo_file_paths :list [str ],
+    mark_chat_as_read :bool ,max_attempts :int )->ChatMessage :
+        if mark_chat_as_read or queue .mark_chat_as_read :
+            queue .mark_chat_as_read =False 
+            if time .time ()-queue .marked_at >self .mark_window :
+                try :
+                    self ._call (self .mark_func ,queue .chat_id ,max_attempts =max_attempts )
+                    queue .marked_at =time .time ()
+                    self .stats ["marks"]+=1 
+                except Exception as e :
+                    logger .debug (f"Failed to mark chat {queue .chat_id } as read: {e }")
+            else :
+                self .stats ["skipped_marks"]+=1 
+
+        text ="\n\n".join (text for text ,_ in parts )
+        with_watermark =any (not exclude_watermark for _ ,exclude_watermark in parts )
+        try :
+            mess =self ._call (self .send_func ,queue .chat_id ,text or None ,photo_file_paths ,with_watermark ,max_attempts =max_attempts )
+        except Exception :
+            self .stats ["failures"]+=1 
+            raise 
+        self .stats ["sends"]+=1 
+        self .stats ["merged"]+=max (len (parts )-1 ,0 )
+        return mess 
+
+    def _take_pending (self ,queue :ChatQueue )->list [tuple [str ,bool ]]:
+        if queue .timer :
+            queue .timer .cancel ()
+            queue .timer =None 
+        parts ,queue .pending =queue .pending ,[]
+        return parts 
+
+    def _send_pending (self ,queue :ChatQueue ):
+        parts =self ._take_pending (queue )
+        if not parts :
+            return 
+        try :
+            self ._send (queue ,parts ,[],False ,3 )
+        except Exception as e :
+            text =" ".join (text for text ,_ in parts ).replace ("\n"," ").strip ()
+            logger .error (
+            f'{Fore .LIGHTRED_EX }Error sending message "{text }" '
+            f'{Fore .LIGHTRED_EX }to chat {queue .chat_id }{Fore .LIGHTRED_EX }: {Fore .WHITE }{e }'
+            )
+
+    def queue (self ,chat_id :str ,text :str ,mark_chat_as_read :bool =False ,exclude_watermark :bool =False ):
+        'Queues the message, it is sent after `merge_window` seconds together with the messages queued meanwhile\n        (or earlier, as a separate message right before the next message sent by `send`).\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param text: Message text.\n        :type text: `str`\n\n        :param mark_chat_as_read: Mark the chat as read before sending, _optional_.\n        :type mark_chat_as_read: `bool`\n\n        :param exclude_watermark: Do not add the watermark, _optional_.\n        :type exclude_watermark: `bool`'
+        queue =self ._get_queue (chat_id )
+        with queue .lock :
+            queue .pending .append ((text ,exclude_watermark ))
+            queue .mark_chat_as_read =queue .mark_chat_as_read or mark_chat_as_read 
+            self .stats ["messages"]+=1 
+            if not queue .timer :
+                queue .timer =Timer (self .merge_window ,self .flush ,(chat_id ,))
+                queue .timer .daemon =True 
+                queue .timer .start ()
+
+    def flush (self ,chat_id :str ):
+        'Sends the queued messages of the chat right away.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`'
+        queue =self ._get_queue (chat_id )
+        with queue .lock :
+            self ._send_pending (queue )
+
+    def send (self ,chat_id :str ,text :str |None =None ,photo_file_paths :list [str ]=[],
+    mark_chat_as_read :bool =False ,exclude_watermark :bool =False ,max_attempts :int =3 )->ChatMessage :
+        'Sends the message right away, the queued messages of the chat are sent before it as a separate message.\n\n        :param chat_id: Chat ID.\n        :type chat_id: `str`\n\n        :param text: Message text, _optional_.\n        :type text: `str` or `None`\n\n        :param photo_file_paths: Paths to photo files, _optional_.\n        :type photo_file_paths: `list[str]`\n\n        :param mark_chat_as_read: Mark the chat as read before sending, _optional_.\n        :type mark_chat_as_read: `bool`\n\n        :param exclude_watermark: Do not add the watermark, _optional_.\n        :type exclude_watermark: `bool`\n\n        :param max_attempts: Maximum number of attempts on transient errors, _optional_.\n        :type max_attempts: `int`\n\n        :return: Message object sent.\n        :rtype: `playerokapi.types.ChatMessage`'
+        queue =self ._get_queue (chat_id )
+        with queue .lock :
+            self ._send_pending (queue )# queued texts go as their own message, so a failure of this one doesn't lose them
+            self .stats ["messages"]+=1 
+            return self ._send (queue ,[(text ,exclude_watermark )]if text else [],photo_file_paths ,mark_chat_as_read ,max_attempts )
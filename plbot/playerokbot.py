@@ -1,15 +1,16 @@
 from __future__ import annotations 
+import os 
 import asyncio 
 import time 
 from datetime import datetime ,timedelta 
 import pytz 
-from threading import Thread 
 import textwrap 
 import shutil 
 import copy 
 from colorama import Fore 
 
-from playerokapi .account import Account 
+from playerokapi .account import Account ,get_account ,set_account 
+from playerokapi .account_state import PROFILE_MAX_AGE 
 from playerokapi .enums import *
 from playerokapi .types import *
 from playerokapi .exceptions import *
@@ -24,14 +25,27 @@ shutdown ,
 run_async_in_thread 
 )
 from core .handlers import (
-add_bot_event_handler ,
+get_playerok_event_handlers ,
 add_playerok_event_handler ,
 call_bot_event ,
 call_playerok_event 
 )
-from settings import DATA ,Settings as sett 
+from core .startup import get_startup 
+from core .scheduler import get_scheduler ,IntervalTrigger 
+from core .background_jobs import BackgroundJob 
+from core .message_templates import get_message_templates 
+from plbot .outbox import ChatOutbox 
+from core .supervisor import AccountProxy ,get_worker ,get_supervisor 
+from core .processed_deals import get_processed_deals 
+from core .journal import get_journal 
+from core .snapshot import (
+add_snapshot_provider ,
+restore_snapshot ,
+save_snapshot 
+)
+from settings import Settings as sett ,get_namespace_files as get_settings_files ,add_change_listener 
 from logging import getLogger 
-from data import Data as data 
+from data import Data as data ,get_namespace_files as get_data_files ,get_data_dir 
 from tgbot .telegrambot import (
 get_telegram_bot ,
 get_telegram_bot_loop 
@@ -48,32 +62,58 @@ LEGACY_SUPPORT_USERNAME ="\u043f\u043e\u0434\u0434\u0435\u0440\u0436\u043a\u0430
 LEGACY_NOTIFICATIONS_USERNAME ="\u0443\u0432\u0435\u0434\u043e\u043c\u043b\u0435\u043d\u0438\u044f"
 LEGACY_COMMANDS_TRIGGER ="!\u043a\u043e\u043c\u0430\u043d\u0434\u044b"
 LEGACY_SELLER_TRIGGER ="!\u043f\u0440\u043e\u0434\u0430\u0432\u0435\u0446"
+REFERENCE_CACHE_DIR ="bot_data/reference"
+SYNCED_SETTINGS =(
+"config","messages","custom_commands","auto_deliveries",
+"auto_restore_items","auto_complete_deals","auto_bump_items"
+)
+SYNCED_DATA =("initialized_users","saved_items","cached_orders")
+SYNC_FILES_INTERVAL =30 # settings written by the bot itself are synced right away (see add_change_listener)
+
+
+def get_playerok_bot (namespace :str |None =None )->PlayerokBot |None :
+    return PlayerokBot .instances .get (namespace )
+
 
+def get_playerok_bots ()->list [PlayerokBot ]:
+    return list (PlayerokBot .instances .values ())
 
-def get_playerok_bot ()->PlayerokBot |None :
-    if hasattr (PlayerokBot ,"instance"):
-        return getattr (PlayerokBot ,"instance")
+
+def get_account_bot (namespace :str |None =None )->PlayerokBot |AccountProxy |None :
+    plbot =get_playerok_bot (namespace )
+    if plbot is None and namespace is not None and get_supervisor ():
+        return get_supervisor ().get_account_proxy (namespace )# the account is run in a worker process
+    return plbot 
 
 
 class PlayerokBot :
-    def __new__ (cls ,*args ,**kwargs )->PlayerokBot :
-        if not hasattr (cls ,"instance"):
-            cls .instance =super (PlayerokBot ,cls ).__new__ (cls )
-        return getattr (cls ,"instance")
-
-    def __init__ (self ):
-        self .config =sett .get ("config")
-        self .messages =sett .get ("messages")
-        self .custom_commands =sett .get ("custom_commands")
-        self .auto_deliveries =sett .get ("auto_deliveries")
-        self .auto_restore_items =sett .get ("auto_restore_items")
-        self .auto_complete_deals =sett .get ("auto_complete_deals")
-        self .auto_bump_items =sett .get ("auto_bump_items")
-
-        self .initialized_users =data .get ("initialized_users")
-        self .saved_items =data .get ("saved_items")
-        self .cached_orders =data .get ("cached_orders")
-        self .latest_events_times =data .get ("latest_events_times")
+    instances :dict [str |None ,PlayerokBot ]={}
+
+    def __new__ (cls ,namespace :str |None =None ,*args ,**kwargs )->PlayerokBot :
+        if namespace not in cls .instances :
+            cls .instances [namespace ]=super (PlayerokBot ,cls ).__new__ (cls )
+            if namespace is None :
+                cls .instance =cls .instances [namespace ]
+        return cls .instances [namespace ]
+
+    def __init__ (self ,namespace :str |None =None ):
+        self .namespace =namespace 
+        self .settings_files =get_settings_files (namespace )
+        self .data_files =get_data_files (namespace )
+
+        self .config =sett .get ("config",self .settings_files )
+        self .messages =sett .get ("messages",self .settings_files )
+        get_message_templates ().register ("messages",self .settings_files )
+        self .custom_commands =sett .get ("custom_commands",self .settings_files )
+        self .auto_deliveries =sett .get ("auto_deliveries",self .settings_files )
+        self .auto_restore_items =sett .get ("auto_restore_items",self .settings_files )
+        self .auto_complete_deals =sett .get ("auto_complete_deals",self .settings_files )
+        self .auto_bump_items =sett .get ("auto_bump_items",self .settings_files )
+
+        self .initialized_users =data .get ("initialized_users",self .data_files )
+        self .saved_items =data .get ("saved_items",self .data_files )
+        self .cached_orders =data .get ("cached_orders",self .data_files )
+        self .latest_events_times =data .get ("latest_events_times",self .data_files )
 
         self .account =self .playerok_account =Account (
         cookies =self .config ["playerok"]["api"]["cookies"],
@@ -81,109 +121,93 @@ class PlayerokBot :
         proxy =self .config ["playerok"]["api"]["proxy"]or None ,
         requests_timeout =self .config ["playerok"]["api"]["requests_timeout"]
         ).get ()
+        self .account .reference_cache .set_dir (REFERENCE_CACHE_DIR )
+        if namespace is None or get_account ()is None :# the main account, or the first account of a worker process
+            set_account (self .account )
+
+        self .listener :EventListener |None =None 
+        self .outbox =ChatOutbox (self ._send_chat_message ,self ._mark_chat_as_read )
 
-        self .__saved_chats :dict [str ,Chat ]={}
+    def _get_snapshot_state (self )->dict :
+        return {"chat_directory":self .account .chat_directory .get_state ()}
+
+    def _set_snapshot_state (self ,state :dict ,saved_at :float ):
+        if "chat_directory"in state :
+            self .account .chat_directory .set_state (state ["chat_directory"])
+        else :# snapshot made before the chat directory
+            self .account .chat_directory .set_state ([
+            (chat ,saved_at )for chat in state .get ("saved_chats",{}).values ()if chat 
+            ])
 
     def get_chat_by_id (self ,chat_id :str )->Chat :
-        if chat_id in self .__saved_chats :
-            return self .__saved_chats [chat_id ]
-        self .__saved_chats [chat_id ]=self .account .get_chat (chat_id )
-        return self .get_chat_by_id (chat_id )
+        return self .account .chat_directory .get (chat_id )or self .account .get_chat (chat_id )
 
     def get_chat_by_username (self ,username :str )->Chat :
-        if username in self .__saved_chats :
-            return self .__saved_chats [username ]
         if username .lower ()in ('support',LEGACY_SUPPORT_USERNAME ):
-            chat =self .account .get_chat (self .account .support_chat_id )
+            return self .get_chat_by_id (self .account .support_chat_id )
         elif username .lower ()in ('notifications',LEGACY_NOTIFICATIONS_USERNAME ):
-            chat =self .account .get_chat (self .account .system_chat_id )
-        else :
-            chat =self .account .get_chat_by_username (username )
-        self .__saved_chats [username ]=chat 
-        return self .get_chat_by_username (username )
-
+            return self .get_chat_by_id (self .account .system_chat_id )
+        return self .account .get_chat_by_username (username )
 
     def refresh_account (self ):
         try :
-            self .account =self .playerok_account =self .account .get ()
+            self .account .state .refresh (
+            with_profile =time .time ()-self .account .state .profile_updated_at >=PROFILE_MAX_AGE 
+            )
         except Exception as e :
             logger .error (f"{Fore .LIGHTRED_EX }Error updating account:{Fore .WHITE }{e }")
 
     def check_banned (self ):
         try :
-            user =self .account .get_user (self .account .id )
-            if user .is_blocked :
+            if self .account .state .is_blocked :
                 logger .critical ("")
                 logger .critical (f"{Fore .LIGHTRED_EX }Your Playerok account has been blocked! Unfortunately, I can't continue working on a blocked account...")
                 logger .critical (f"Write to tech. Playerok support to find out the reason for the ban and solve this problem as quickly as possible.")
                 logger .critical ("")
-                shutdown ()
+                if self .namespace is None :
+                    shutdown ()
         except Exception as e :
             logger .error (f"{Fore .LIGHTRED_EX }Error when checking for blocking:{Fore .WHITE }{e }")
 
     def msg (self ,message_name :str ,messages_config_name :str ="messages",
-    messages_data :dict =DATA ,**kwargs )->str |None :
-        class SafeDict (dict ):
-            def __missing__ (self ,key ):
-                return "{"+key +"}"
-
-        messages =sett .get (messages_config_name ,messages_data )or {}
-        mess =messages .get (message_name ,{})
-        if not mess .get ("enabled"):
-            return None 
-        message_lines :list [str ]=mess .get ("text",[])
-        if not message_lines :
-            return f"Message{message_name }empty"
-        try :
-            msg ="\n".join ([line .format_map (SafeDict (**kwargs ))for line in message_lines ])
-            return msg 
-        except :
-            pass 
-        return f"Failed to receive message{message_name }"
-
-    def _do_call_event (self ,latest_event_time ,event_interval ):
-        if not latest_event_time :
-            return True 
+    messages_data :list |None =None ,**kwargs )->str |None :
+        return get_message_templates ().render (message_name ,messages_config_name ,messages_data or self .settings_files ,**kwargs )
 
-        if datetime .now ()>=(
-        datetime .fromisoformat (latest_event_time )
-        +timedelta (seconds =event_interval )
-        ):
-            return True 
+    def _get_legacy_event_time (self ,event :str )->float |None :
+        event_time =(self .latest_events_times or {}).get (event )
+        if event_time :
+            return datetime .fromisoformat (event_time ).timestamp ()
 
-        return False 
 
+    def _send_chat_message (self ,chat_id :str ,text :str |None ,photo_file_paths :list [str ],
+    with_watermark :bool )->ChatMessage :
+        watermark_enabled =self .config ["playerok"]["watermark"]["enabled"]
+        watermark =self .config ["playerok"]["watermark"]["value"]
+        if text and with_watermark and watermark_enabled and watermark :
+            text +=f"\n{watermark }"
+        return self .account .send_message (chat_id =chat_id ,text =text ,photo_file_paths =photo_file_paths )
+
+    def _mark_chat_as_read (self ,chat_id :str ):
+        self .account .mark_chat_as_read (chat_id =chat_id )
 
     def send_message (self ,chat_id :str ,text :str |None =None ,photo_file_paths :list [str ]=[],
-    mark_chat_as_read :bool =None ,exclude_watermark :bool =False ,max_attempts :int =3 )->ChatMessage |None :
-        'Custom method for sending messages to Playerok chat.\n        Tries to send in N attempts, if it fails, it generates an error in the console.'
+    mark_chat_as_read :bool =None ,exclude_watermark :bool =False ,max_attempts :int =3 ,
+    merge :bool =False )->ChatMessage |None :
+        'Custom method for sending messages to Playerok chat.\n        Messages go through the chat outbox: rate-limited requests are retried with a back-off,\n        if it fails, it generates an error in the console. With `merge` the message is queued\n        and sent together with the other messages of the chat produced within a short window.'
 
         if not any ((text ,photo_file_paths )):
             return 
 
-        for _ in range (max_attempts ):
-            try :
-                read_chat_enabled =self .config ["playerok"]["read_chat"]["enabled"]
-                watermark_enabled =self .config ["playerok"]["watermark"]["enabled"]
-                watermark =self .config ["playerok"]["watermark"]["value"]
-
-                if text and watermark_enabled and watermark and not exclude_watermark :
-                    text +=f"\n{watermark }"
-
-                mark_chat_as_read =(read_chat_enabled or False )if mark_chat_as_read is None else mark_chat_as_read 
-                mess =self .account .send_message (
-                chat_id =chat_id ,
-                text =text ,
-                photo_file_paths =photo_file_paths ,
-                mark_chat_as_read =mark_chat_as_read 
-                )
+        read_chat_enabled =self .config ["playerok"]["read_chat"]["enabled"]
+        mark_chat_as_read =(read_chat_enabled or False )if mark_chat_as_read is None else mark_chat_as_read 
+        if merge and text and not photo_file_paths :
+            self .outbox .queue (chat_id ,text ,mark_chat_as_read ,exclude_watermark )
+            return 
 
-                return mess 
-            except Exception as e :
-                err =e 
-                break 
-        else :
-            err ='Failed to send message'
+        try :
+            return self .outbox .send (chat_id ,text ,photo_file_paths ,mark_chat_as_read ,exclude_watermark ,max_attempts )
+        except Exception as e :
+            err =e 
 
         msg =""
         if text :
@@ -271,7 +295,8 @@ class PlayerokBot :
                 itm_list =user .get_items (
                 after_cursor =next_cursor ,
                 game_id =game_id ,
-                category_id =category_id 
+                category_id =category_id ,
+                account =self .account 
                 )
 
                 for itm in itm_list .items :
@@ -303,7 +328,7 @@ class PlayerokBot :
         return my_items 
 
 
-    def bump_item (self ,item :ItemProfile |MyItem ):
+    def bump_item (self ,item :ItemProfile |MyItem )->bool |None :
         try :
             name_frmtd =item .name [:32 ]+("..."if len (item .name )>32 else "")
 
@@ -333,7 +358,7 @@ class PlayerokBot :
             ):
                 if not isinstance (item ,MyItem ):
                     try :item =self .account .get_item (item .id )
-                    except :return 
+                    except :return False 
 
                 time .sleep (1 )
                 statuses =self .account .get_item_priority_statuses (item .id ,item .raw_price )
@@ -349,19 +374,24 @@ class PlayerokBot :
                 f"{Fore .LIGHTWHITE_EX }«{name_frmtd }» {Fore .WHITE }— {Fore .YELLOW }raised."
                 f"{Fore .WHITE }Position:{Fore .LIGHTWHITE_EX }{item .sequence } {Fore .WHITE }→ {Fore .YELLOW }1"
                 )
+                return True 
         except Exception as e :
             logger .error (f'{Fore .LIGHTRED_EX }Error when picking up an item "{name_frmtd }": {Fore .WHITE }{e }')
+            return False 
 
-    def bump_items (self ):
+    def bump_items (self ,job :BackgroundJob |None =None ):
         try :
-            self .latest_events_times ["auto_bump_items"]=datetime .now ().isoformat ()
-            data .set ("latest_events_times",self .latest_events_times )
-
             items =self .get_my_items (statuses =[ItemStatuses .APPROVED ])
             up_items =[it for it in items if it .priority !=PriorityTypes .DEFAULT ]
+            if job :
+                job .set_total (len (up_items ))
 
             for item in up_items :
-                self .bump_item (item )
+                if job and job .is_cancelled :
+                    break 
+                bumped =self .bump_item (item )
+                if job :
+                    job .advance (error =bumped is False )
         except Exception as e :
             logger .error (f"{Fore .LIGHTRED_EX }Error when picking up objects:{Fore .WHITE }{e }")
 
@@ -435,12 +465,9 @@ class PlayerokBot :
 
     def request_withdrawal (self )->bool :
         try :
-            self .latest_events_times ["auto_withdrawal"]=datetime .now ().isoformat ()
-            data .set ("latest_events_times",self .latest_events_times )
-
             balance =0 
-            self .account =self .account .get ()
-            balance =self .account .profile .balance .withdrawable 
+            account_balance =self .account .state .get_balance (max_age =0 )
+            balance =account_balance .withdrawable if account_balance else 0 
             if balance <=500 :
                 raise Exception ('Balance too small. The transaction must be in the amount of 500₽')
 
@@ -467,10 +494,33 @@ class PlayerokBot :
         return False 
 
 
-    def log_new_message (self ,message :ChatMessage ,chat :Chat ):
-        plbot =get_playerok_bot ()
+    def _alert_stale_deals (self ,processed_deals ):
+        stale =processed_deals .get_stale ()
+        if not stale :
+            return 
+        deals ="\n".join (f"{deal_id } ({event })"for deal_id ,event in stale )
+        logger .warning (f"{Fore .LIGHTRED_EX }Processing of these deal events was interrupted and could not be repeated, check them manually:\n{deals }")
+        if self .config ["playerok"]["tg_logging"]["enabled"]:
+            self .call_telegram_bot (
+            "log_event",
+            text =log_text (
+            title ="⚠️ Interrupted deal processing",
+            text =f"Processing of these deal events was interrupted, check them manually:\n{deals }",
+            account =self .namespace 
+            )
+            )
 
-        chat_user =next ((u .username for u in chat .users if u .id !=plbot .account .id ),None )
+    def call_telegram_bot (self ,method :str ,*args ,**kwargs ):
+        worker =get_worker ()
+        if worker :
+            return worker .call_telegram_bot (method ,*args ,**kwargs )
+        asyncio .run_coroutine_threadsafe (
+        getattr (get_telegram_bot (),method )(*args ,**kwargs ),
+        get_telegram_bot_loop ()
+        )
+
+    def log_new_message (self ,message :ChatMessage ,chat :Chat ):
+        chat_user =next ((u .username for u in chat .users if u .id !=self .account .id ),None )
         if not chat_user :
             chat_user =message .user .username 
 
@@ -535,83 +585,65 @@ class PlayerokBot :
 
 
     async def _on_playerok_bot_init (self ):
-        def endless_loop ():
-            while True :
-                balance =self .account .profile .balance .value if self .account .profile .balance is not None else "?"
-                set_title (f"Playerok Universal v{VERSION } | {self .account .username }: {balance }₽")
+        settings_versions :dict [str ,tuple ]={}
+        synced_data ={name :copy .deepcopy (getattr (self ,name ))for name in SYNCED_DATA }
 
-                if sett .get ("config")!=self .config :
-                    self .config =sett .get ("config")
-                if sett .get ("messages")!=self .messages :
-                    self .messages =sett .get ("messages")
-                if sett .get ("custom_commands")!=self .custom_commands :
-                    self .custom_commands =sett .get ("custom_commands")
-                if sett .get ("auto_deliveries")!=self .auto_deliveries :
-                    self .auto_deliveries =sett .get ("auto_deliveries")
-                if sett .get ("auto_restore_items")!=self .auto_restore_items :
-                    self .auto_restore_items =sett .get ("auto_restore_items")
-                if sett .get ("auto_complete_deals")!=self .auto_complete_deals :
-                    self .auto_complete_deals =sett .get ("auto_complete_deals")
-                if sett .get ("auto_bump_items")!=self .auto_bump_items :
-                    self .auto_bump_items =sett .get ("auto_bump_items")
-
-                if data .get ("initialized_users")!=self .initialized_users :
-                    data .set ("initialized_users",self .initialized_users )
-                if data .get ("saved_items")!=self .saved_items :
-                    data .set ("saved_items",self .saved_items )
-                if data .get ("cached_orders")!=self .cached_orders :
-                    data .set ("cached_orders",self .cached_orders )
-                if data .get ("latest_events_times")!=self .latest_events_times :
-                    data .set ("latest_events_times",self .latest_events_times )
-
-                time .sleep (3 )
-
-        def refresh_account_loop ():
-            while True :
-                time .sleep (1800 )
-                self .refresh_account ()
-
-        def check_banned_loop ():
-            while True :
-                self .check_banned ()
-                time .sleep (900 )
-
-        def restore_expired_items_loop ():
-            while True :
-                if self .config ["playerok"]["auto_restore_items"]["expired"]:
-                    self .restore_expired_items ()
-                time .sleep (45 )
-
-        def bump_items_loop ():
-            while True :
-                if (
-                self .config ["playerok"]["auto_bump_items"]["enabled"]
-                and self ._do_call_event (
-                self .latest_events_times ["auto_bump_items"],
-                self .config ["playerok"]["auto_bump_items"]["interval"]
-                )
-                ):
-                    self .bump_items ()
-                time .sleep (3 )
+        def get_file_version (path :str )->tuple :
+            try :
+                stat =os .stat (path )
+                return (stat .st_mtime_ns ,stat .st_size )
+            except OSError :
+                return ()
 
-        def withdrawal_loop ():
-            while True :
-                if (
-                self .config ["playerok"]["auto_withdrawal"]["enabled"]
-                and self ._do_call_event (
-                self .latest_events_times ["auto_withdrawal"],
-                self .config ["playerok"]["auto_withdrawal"]["interval"]
-                )
-                ):
-                    self .request_withdrawal ()
-                time .sleep (3 )
+        def sync_files ():
+            if self .namespace is None :
+                balance =self .account .profile .balance .value if self .account .profile .balance is not None else "?"
+                set_title (f"Playerok Universal v{VERSION } | {self .account .username }: {balance }₽")
 
-        Thread (target =endless_loop ,daemon =True ).start ()
-        Thread (target =refresh_account_loop ,daemon =True ).start ()
-        Thread (target =check_banned_loop ,daemon =True ).start ()
-        Thread (target =restore_expired_items_loop ,daemon =True ).start ()
-        Thread (target =bump_items_loop ,daemon =True ).start ()
-        Thread (target =withdrawal_loop ,daemon =True ).start ()
+            for file in self .settings_files :# the settings are read again only when their files have changed
+                if file .name not in SYNCED_SETTINGS :
+                    continue 
+                version =get_file_version (file .path )
+                if version and settings_versions .get (file .name )==version :
+                    continue 
+                settings_versions [file .name ]=version 
+                value =sett .get (file .name ,self .settings_files )
+                if value !=getattr (self ,file .name ):
+                    setattr (self ,file .name ,value )
+
+            for name in SYNCED_DATA :# the data is written only when it has changed in memory since the last write
+                value =getattr (self ,name )
+                if value !=synced_data [name ]:
+                    data .set (name ,value ,self .data_files )
+                    synced_data [name ]=copy .deepcopy (value )
+
+        prefix =f"{self .namespace }."if self .namespace else ""
+        auto_bump_config =lambda :self .config ["playerok"]["auto_bump_items"]
+        auto_withdrawal_config =lambda :self .config ["playerok"]["auto_withdrawal"]
+
+        scheduler =get_scheduler ()
+        scheduler .add_job (f"{prefix }sync_files",sync_files ,IntervalTrigger (SYNC_FILES_INTERVAL ))
+        synced_paths ={file .path for file in self .settings_files if file .name in SYNCED_SETTINGS }
+        add_change_listener (lambda path :scheduler .run_job_now (f"{prefix }sync_files")if path in synced_paths else None )
+        scheduler .add_job (f"{prefix }refresh_account",self .refresh_account ,IntervalTrigger (900 ,jitter =30 ),delay =900 )
+        scheduler .add_job (f"{prefix }check_banned",self .check_banned ,IntervalTrigger (900 ,jitter =30 ))
+        scheduler .add_job (# long jobs of the account run one at a time in its own pool
+        f"{prefix }restore_expired_items",self .restore_expired_items ,IntervalTrigger (45 ),
+        enabled =lambda :self .config ["playerok"]["auto_restore_items"]["expired"],
+        pool =f"{prefix }items"
+        )
+        scheduler .add_job (
+        f"{prefix }auto_bump_items",self .bump_items ,IntervalTrigger (lambda :auto_bump_config ()["interval"]),
+        enabled =lambda :auto_bump_config ()["enabled"],persist =True ,
+        last_run =self ._get_legacy_event_time ("auto_bump_items"),pool =f"{prefix }items"
+        )
+        scheduler .add_job (
+        f"{prefix }auto_withdrawal",self .request_withdrawal ,IntervalTrigger (lambda :auto_withdrawal_config ()["interval"]),
+        enabled =lambda :auto_withdrawal_config ()["enabled"],persist =True ,
+        last_run =self ._get_legacy_event_time ("auto_withdrawal")
+        )
+        scheduler .add_job ("save_snapshot",save_snapshot ,IntervalTrigger (60 ),delay =60 )
+        scheduler .start ()
 
     async def _on_new_message (self ,event :NewMessageEvent ):
         if not event .message .user :
@@ -642,15 +674,14 @@ class PlayerokBot :
                 text =f"<b>{event .message .user .username }:</b> "
                 text +=event .message .text or ""
                 text +=f'<b><a href="{event .message .file .url }">{event .message .file .filename }</a></b>'if event .message .file else ""
-                asyncio .run_coroutine_threadsafe (
-                get_telegram_bot ().log_event (
+                self .call_telegram_bot (
+                "log_event",
                 text =log_text (
                 title =f'💬 New message in <a href="https://playerok.com/chats/{event .chat .id }">chat</a>',
-                text =text .strip ()
+                text =text .strip (),
+                account =self .namespace 
                 ),
-                kb =log_new_mess_kb (event .message .user .username )
-                ),
-                get_telegram_bot_loop ()
+                kb =log_new_mess_kb (event .message .user .username ,self .namespace )
                 )
 
         if (
@@ -664,10 +695,7 @@ class PlayerokBot :
                 self .send_message (event .chat .id ,self .msg ("cmd_commands"))
 
             elif str (event .message .text ).lower ()in ('!seller',LEGACY_SELLER_TRIGGER ):
-                asyncio .run_coroutine_threadsafe (
-                get_telegram_bot ().call_seller (event .message .user .username ,event .chat .id ),
-                get_telegram_bot_loop ()
-                )
+                self .call_telegram_bot ("call_seller",event .message .user .username ,event .chat .id )
                 self .send_message (event .chat .id ,self .msg ("cmd_seller"))
 
             elif self .config ["playerok"]["custom_commands"]["enabled"]:
@@ -685,8 +713,8 @@ class PlayerokBot :
         self .config ["playerok"]["tg_logging"]["enabled"]
         and self .config ["playerok"]["tg_logging"]["events"]["new_review"]
         ):
-            asyncio .run_coroutine_threadsafe (
-            get_telegram_bot ().log_event (
+            self .call_telegram_bot (
+            "log_event",
             text =log_text (
             title =f'💬✨ New review for <a href="https://playerok.com/deal/{event .deal .id }">transaction</a>',
             text =(
@@ -694,11 +722,10 @@ class PlayerokBot :
             f"\n<b>Left by:</b>{event .deal .review .creator .username }"
             f"\n<b>Text:</b>{event .deal .review .text }"
             f"\n<b>Date:</b>{datetime .fromisoformat (event .deal .review .created_at ).strftime ('%d.%m.%Y %H:%M:%S')}"
-            )
             ),
-            kb =log_new_mess_kb (event .deal .user .username )
+            account =self .namespace 
             ),
-            get_telegram_bot_loop ()
+            kb =log_new_mess_kb (event .deal .user .username ,self .namespace )
             )
 
         self .send_message (event .chat .id ,self .msg (
@@ -718,18 +745,17 @@ class PlayerokBot :
         self .config ["playerok"]["tg_logging"]["enabled"]
         and self .config ["playerok"]["tg_logging"]["events"]["new_problem"]
         ):
-            asyncio .run_coroutine_threadsafe (
-            get_telegram_bot ().log_event (
+            self .call_telegram_bot (
+            "log_event",
             text =log_text (
             title =f'🤬 New complaint in <a href="https://playerok.com/deal/{event .deal .id }">transaction</a>',
             text =(
             f"<b>Buyer:</b>{event .deal .user .username }"
             f"\n<b>Item:</b>{event .deal .item .name }"
-            )
             ),
-            kb =log_new_mess_kb (event .deal .user .username )
+            account =self .namespace 
             ),
-            get_telegram_bot_loop ()
+            kb =log_new_mess_kb (event .deal .user .username ,self .namespace )
             )
 
     async def _on_new_deal (self ,event :NewDealEvent ):
@@ -747,32 +773,32 @@ class PlayerokBot :
         "item_id":event .deal .item .id ,
         "item_name":event .deal .item .name 
         }
+        data .set ("cached_orders",self .cached_orders ,self .data_files )
 
         self .log_new_deal (event .deal )
         if (
         self .config ["playerok"]["tg_logging"]["enabled"]
         and self .config ["playerok"]["tg_logging"]["events"]["new_deal"]
         ):
-            asyncio .run_coroutine_threadsafe (
-            get_telegram_bot ().log_event (
+            self .call_telegram_bot (
+            "log_event",
             text =log_text (
             title =f'📋 New <a href="https://playerok.com/deal/{event .deal .id }">deal</a>',
             text =(
             f"<b>Buyer:</b>{event .deal .user .username }"
             f"\n<b>Item:</b>{(event .deal .item .name or '-')}"
             f"\n<b>Amount:</b>{event .deal .item .price or '?'}₽"
-            )
             ),
-            kb =log_new_deal_kb (event .deal .user .username ,event .deal .id )
+            account =self .namespace 
             ),
-            get_telegram_bot_loop ()
+            kb =log_new_deal_kb (event .deal .user .username ,event .deal .id ,self .namespace )
             )
 
         self .send_message (event .chat .id ,self .msg (
         "new_deal",
         deal_item_name =(event .deal .item .name or "-"),
         deal_item_price =event .deal .item .price 
-        ))
+        ),merge =True )
 
         is_support_chat =event .chat .id in (self .account .system_chat_id ,self .account .support_chat_id )
         if (
@@ -782,7 +808,7 @@ class PlayerokBot :
             self .send_message (event .chat .id ,self .msg (
             "first_message",
             username =event .deal .user .username 
-            ))
+            ),merge =True )
             self .initialized_users .append (event .deal .user .id )
 
         if self .config ["playerok"]["auto_deliveries"]["enabled"]:
@@ -806,7 +832,7 @@ class PlayerokBot :
                                 f"Remainder:{Fore .LIGHTYELLOW_EX }{len (goods )-1 }"
                                 )
                                 self .auto_deliveries [i ]["goods"].pop (goods .index (good ))
-                                sett .set ("auto_deliveries",self .auto_deliveries )
+                                sett .set ("auto_deliveries",self .auto_deliveries ,self .settings_files )
                         else :
                             msg =auto_delivery .get ("message","")
                             if msg :
@@ -903,14 +929,13 @@ class PlayerokBot :
         self .config ["playerok"]["tg_logging"]["enabled"]
         and self .config ["playerok"]["tg_logging"]["events"]["deal_status_changed"]
         ):
-            asyncio .run_coroutine_threadsafe (
-            get_telegram_bot ().log_event (
+            self .call_telegram_bot (
+            "log_event",
             log_text (
             title =f'🔄️📋 Status <a href="https://playerok.com/deal/{event .deal .id }//">transactions</a> has changed',
-            text =f"<b>New status:</b>{status_frmtd }"
+            text =f"<b>New status:</b>{status_frmtd }",
+            account =self .namespace 
             )
-            ),
-            get_telegram_bot_loop ()
             )
 
         if event .deal .status is ItemDealStatuses .PENDING :
@@ -943,6 +968,16 @@ class PlayerokBot :
             ))
 
 
+    @staticmethod 
+    def add_event_handlers ():
+        if PlayerokBot ._on_new_message not in get_playerok_event_handlers ()[EventTypes .NEW_MESSAGE ]:
+            add_playerok_event_handler (EventTypes .NEW_MESSAGE ,PlayerokBot ._on_new_message ,0 )
+            add_playerok_event_handler (EventTypes .NEW_REVIEW ,PlayerokBot ._on_new_review ,0 )
+            add_playerok_event_handler (EventTypes .DEAL_HAS_PROBLEM ,PlayerokBot ._on_new_problem ,0 )
+            add_playerok_event_handler (EventTypes .NEW_DEAL ,PlayerokBot ._on_new_deal ,0 )
+            add_playerok_event_handler (EventTypes .ITEM_PAID ,PlayerokBot ._on_item_paid ,0 )
+            add_playerok_event_handler (EventTypes .DEAL_STATUS_CHANGED ,PlayerokBot ._on_deal_status_changed ,0 )
+
     async def run_bot (self ):
         logger .info ("")
         logger .info (f"{Fore .YELLOW }Playerok bot is running and active")
@@ -987,18 +1022,47 @@ class PlayerokBot :
             logger .info (f"{Fore .YELLOW }───────────────────────────────────────")
             logger .info ("")
 
-        add_bot_event_handler ("ON_PLAYEROK_BOT_INIT",PlayerokBot ._on_playerok_bot_init ,0 )
-        add_playerok_event_handler (EventTypes .NEW_MESSAGE ,PlayerokBot ._on_new_message ,0 )
-        add_playerok_event_handler (EventTypes .NEW_REVIEW ,PlayerokBot ._on_new_review ,0 )
-        add_playerok_event_handler (EventTypes .DEAL_HAS_PROBLEM ,PlayerokBot ._on_new_problem ,0 )
-        add_playerok_event_handler (EventTypes .NEW_DEAL ,PlayerokBot ._on_new_deal ,0 )
-        add_playerok_event_handler (EventTypes .ITEM_PAID ,PlayerokBot ._on_item_paid ,0 )
-        add_playerok_event_handler (EventTypes .DEAL_STATUS_CHANGED ,PlayerokBot ._on_deal_status_changed ,0 )
+        PlayerokBot .add_event_handlers ()
+
+        self .listener =EventListener (self .account )
+        if self .config ["playerok"]["ws_capture"]["enabled"]:# recorded traffic for benchmarks/replay.py
+            os .makedirs (get_data_dir (self .namespace ),exist_ok =True )
+            self .listener .start_ws_capture (os .path .join (get_data_dir (self .namespace ),"ws_capture.jsonl"))
+        add_snapshot_provider (f"{self .account .id }.listener",self .account .id ,self .listener .get_state ,self .listener .set_state )
+        add_snapshot_provider (f"{self .account .id }.playerok_bot",self .account .id ,self ._get_snapshot_state ,self ._set_snapshot_state )
+        restore_snapshot (self .account .id )
+
+        processed_deals =get_processed_deals (os .path .join (get_data_dir (self .namespace ),"processed_deals.log"))
+        journal =get_journal (os .path .join (get_data_dir (self .namespace ),"journal"))
+        once_per_deal_events =(EventTypes .NEW_DEAL ,EventTypes .ITEM_PAID ,EventTypes .NEW_REVIEW )
+
+        def claim_redelivered (event )->bool :
+            if event .type not in once_per_deal_events :
+                return True 
+            return processed_deals .claim ((event .deal .id ,event .type .name ))[0 ]
+
+        def commit_redelivered (event ):
+            if event .type in once_per_deal_events :
+                processed_deals .commit ((event .deal .id ,event .type .name ))
 
         async def listener_loop ():
-            listener =EventListener (self .account )
-            for event in listener .listen ():
-                await call_playerok_event (event .type ,[self ,event ])
+            await journal .redeliver ([self ],claim_redelivered ,commit_redelivered )
+            self ._alert_stale_deals (processed_deals )
+            for event in self .listener .listen ():
+                if event .type in once_per_deal_events :
+                    if not processed_deals .claim ((event .deal .id ,event .type .name ))[0 ]:
+                        logger .debug (f"Event {event .type .name } of deal {event .deal .id } has already been processed, skipping it")
+                        continue 
+                    if await journal .dispatch (event ,[self ,event ]):
+                        processed_deals .commit ((event .deal .id ,event .type .name ))
+                    else :
+                        logger .warning (f"Event {event .type .name } of deal {event .deal .id } was not fully processed, it will be retried after a restart")
+                else :
+                    await journal .dispatch (event ,[self ,event ])
+                if get_startup ():
+                    get_startup ().mark_first_event ()
 
         run_async_in_thread (listener_loop )
-        await call_bot_event ("ON_PLAYEROK_BOT_INIT",[self ])
+        await self ._on_playerok_bot_init ()
+        if get_account ()is self .account :# modules are initialized once per process, with the bot of the default account
+            await call_bot_event ("ON_PLAYEROK_BOT_INIT",[self ])
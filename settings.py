@@ -2,7 +2,7 @@ import os
 import json
 import copy
 import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 
 @dataclass
@@ -76,6 +76,9 @@ CONFIG = SettingsFile(
                     "deal_status_changed": True,
                 }
             },
+            "ws_capture": {
+                "enabled": False
+            },
         },
         "telegram": {
             "api": {
@@ -89,6 +92,14 @@ CONFIG = SettingsFile(
         },
         "logs": {
             "max_file_size": 300
+        },
+        "metrics": {
+            "enabled": False,
+            "port": 0
+        },
+        "profiling": {
+            "slow_handler_threshold": 5,
+            "duration": 30
         }
     }
 )
@@ -205,7 +216,33 @@ AUTO_BUMP_ITEMS = SettingsFile(
         "excluded": []
     }
 )
-DATA = [CONFIG, MESSAGES, CUSTOM_COMMANDS, AUTO_DELIVERIES, AUTO_RESTORE_ITEMS, AUTO_COMPLETE_DEALS, AUTO_BUMP_ITEMS]
+ACCOUNTS = SettingsFile(
+    name="accounts",
+    path="bot_settings/accounts.json",
+    need_restore=False,
+    default=[]
+)
+DATA = [CONFIG, MESSAGES, CUSTOM_COMMANDS, AUTO_DELIVERIES, AUTO_RESTORE_ITEMS, AUTO_COMPLETE_DEALS, AUTO_BUMP_ITEMS, ACCOUNTS]
+
+
+def get_namespace_files(namespace: str | None, data: list[SettingsFile] = DATA) -> list[SettingsFile]:
+    """Returns the settings files of the account namespace.
+    Each additional account has its own copy of the settings in `bot_settings/accounts/<namespace>`.
+
+    :param namespace: Account namespace (None - main account).
+    :type namespace: `str` or `None`
+
+    :param data: Settings files.
+    :type data: `list[SettingsFile]`
+
+    :return: Settings files of the namespace.
+    :rtype: `list[SettingsFile]`"""
+    if not namespace:
+        return data
+    return [
+        replace(file, path=os.path.join("bot_settings", "accounts", namespace, os.path.basename(file.path)))
+        for file in data if file is not ACCOUNTS
+    ]
 
 
 def validate_config(config, default):
@@ -317,6 +354,17 @@ def set_json(path: str, new: dict):
     os.replace(tmp.name, path)
 
 
+_change_listeners: list[callable] = []
+
+
+def add_change_listener(func: callable):
+    """Adds a function that is called with the path of each settings file written by `Settings.set`.
+
+    :param func: Listener function.
+    :type func: `callable`"""
+    _change_listeners.append(func)
+
+
 class Settings:
     
     @staticmethod
@@ -331,4 +379,6 @@ class Settings:
         try: 
             file = [file for file in data if file.name == name][0]
             set_json(file.path, new)
+            for listener in list(_change_listeners):
+                listener(file.path)
         except: pass
\ No newline at end of file
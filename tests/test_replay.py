@@ -0,0 +1,34 @@
+import os 
+
+from benchmarks .replay import load_capture ,prepare_capture ,get_expected_events 
+from benchmarks .scenarios import bench_replay 
+
+
+CAPTURE_PATH =os .path .join (os .path .dirname (__file__ ),"fixtures","ws_capture.jsonl")
+
+
+def get_expected_counts (path :str )->dict [str ,int ]:
+    prepared ,_ =prepare_capture (load_capture (path ))
+    messages ={
+    item ["data"]["id"]:item ["data"]
+    for item in prepared 
+    if item ["type"]=="next"and item ["operation"]=="chatMessageCreated"
+    }
+    counts ={}
+    for message in messages .values ():
+        for event_type ,_ in get_expected_events (message ):
+            counts [event_type .name ]=counts .get (event_type .name ,0 )+1 
+    return counts 
+
+
+def test_replay_produces_each_event_once ():
+    result =bench_replay (capture =CAPTURE_PATH ,rates =(10 ,),timeout =60 ,trace_allocations =False )
+    rate_result =result ["rates"]["10x"]
+    expected =get_expected_counts (CAPTURE_PATH )
+
+    assert result ["skipped_records"]==0 
+    assert rate_result ["lost_events"]==0 
+    assert rate_result ["duplicated_events"]==0 
+    assert rate_result ["unexpected_events"]==0 
+    assert rate_result ["events"]==rate_result ["expected_events"]==sum (expected .values ())
+    assert expected =={"NEW_MESSAGE":34 ,"NEW_DEAL":6 ,"ITEM_PAID":6 }
@@ -4,10 +4,12 @@ from aiogram.filters.callback_data import CallbackData
 class RememberUsername(CallbackData, prefix="rech"):
     name: str
     do: str
+    ns: str | None = None
 
 class RememberDealId(CallbackData, prefix="rede"):
     de_id: str
     do: str
+    ns: str | None = None
 
 
 class DeleteIncludedRestoreItem(CallbackData, prefix="delinre"):
@@ -46,4 +48,8 @@ class SetNewDelivPiece(CallbackData, prefix="sepiece"):
     val: bool
 
 class DeleteDelivGood(CallbackData, prefix="delgod"):
-    index: int
\ No newline at end of file
+    index: int
+
+
+class CancelJob(CallbackData, prefix="cajob"):
+    name: str
\ No newline at end of file
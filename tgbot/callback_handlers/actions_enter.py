@@ -550,6 +550,24 @@ async def callback_enter_tg_logging_chat_id (callback :CallbackQuery ,state :FSM
     )
 
 
+@router .callback_query (F .data =="enter_slow_handler_threshold")
+async def callback_enter_slow_handler_threshold (callback :CallbackQuery ,state :FSMContext ):
+    await state .set_state (states .SettingsStates .waiting_for_slow_handler_threshold )
+
+    config =sett .get ("config")
+    threshold =config ["profiling"]["slow_handler_threshold"]or '❌ Disabled'
+
+    await throw_float_message (
+    state =state ,
+    message =callback .message ,
+    text =templ .performance_float_text (
+    f"🐢 Enter the new <b>slow handler threshold</b> (in seconds, 0 - do not log slow handlers):"
+    f"\n・ Current: <b>{threshold }</b>"
+    ),
+    reply_markup =templ .back_kb (calls .MenuNavigation (to ="performance").pack ())
+    )
+
+
 @router .callback_query (F .data =="enter_logs_max_file_size")
 async def callback_enter_logs_max_file_size (callback :CallbackQuery ,state :FSMContext ):
     await state .set_state (states .SettingsStates .waiting_for_logs_max_file_size )
@@ -4,6 +4,7 @@ from aiogram .fsm .context import FSMContext
 from pathlib import Path 
 from collections import deque 
 import shutil 
+import asyncio 
 import os 
 
 from playerokapi .enums import ItemDealStatuses 
@@ -13,6 +14,7 @@ from ..import templates as templ
 from ..import callback_datas as calls 
 from ..import states 
 from ..helpful import throw_float_message 
+from ..jobs import throw_job_message ,send_job_document 
 from .navigation import *
 from .pagination import *
 from .page import callback_module_page 
@@ -237,7 +239,7 @@ async def callback_remember_username (callback :CallbackQuery ,callback_data :ca
     username =callback_data .name 
     do =callback_data .do 
 
-    await state .update_data (username =username )
+    await state .update_data (username =username ,namespace =callback_data .ns )
 
     if do =="send_mess":
         await state .set_state (states .ActionsStates .waiting_for_message_content )
@@ -258,7 +260,7 @@ async def callback_remember_deal_id (callback :CallbackQuery ,callback_data :cal
     deal_id =callback_data .de_id 
     do =callback_data .do 
 
-    await state .update_data (deal_id =deal_id )
+    await state .update_data (deal_id =deal_id ,namespace =callback_data .ns )
 
     if do =="refund":
         await throw_float_message (
@@ -350,10 +352,10 @@ async def callback_set_new_deliv_piece (callback :CallbackQuery ,callback_data :
 async def callback_refund_deal (callback :CallbackQuery ,state :FSMContext ):
     await state .set_state (None )
 
-    from plbot .playerokbot import get_playerok_bot 
-    plbot =get_playerok_bot ()
+    from plbot .playerokbot import get_account_bot 
 
     data =await state .get_data ()
+    plbot =get_account_bot (data .get ("namespace"))
     deal_id =data .get ("deal_id")
 
     plbot .playerok_account .update_deal (deal_id ,ItemDealStatuses .ROLLED_BACK )
@@ -369,10 +371,10 @@ async def callback_refund_deal (callback :CallbackQuery ,state :FSMContext ):
 async def callback_complete_deal (callback :CallbackQuery ,state :FSMContext ):
     await state .set_state (None )
 
-    from plbot .playerokbot import get_playerok_bot 
+    from plbot .playerokbot import get_account_bot 
 
-    plbot =get_playerok_bot ()
     data =await state .get_data ()
+    plbot =get_account_bot (data .get ("namespace"))
     deal_id =data .get ("deal_id")
 
     plbot .playerok_account .update_deal (deal_id ,ItemDealStatuses .SENT )
@@ -389,21 +391,16 @@ async def callback_bump_items (callback :CallbackQuery ,state :FSMContext ):
     try :
         await state .set_state (None )
 
-        await throw_float_message (
-        state =state ,
-        message =callback .message ,
-        text =templ .events_float_text (f"⬆️ <b>raising items</b> is in progress, wait (see console)..."),
-        reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
-        )
-
         from plbot .playerokbot import get_playerok_bot 
-        get_playerok_bot ().bump_items ()
-
-        await throw_float_message (
-        state =state ,
-        message =callback .message ,
-        text =templ .events_float_text (f"⬆️✅ <b>Items</b> were successfully picked up"),
-        reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
+        await throw_job_message (
+        state ,
+        callback .message ,
+        "bump_items",
+        get_playerok_bot ().bump_items ,
+        title ="⬆️ Raising items",
+        text_func =templ .events_float_text ,
+        back_cb =calls .MenuNavigation (to ="events").pack (),
+        callback =callback 
         )
     except Exception as e :
         await throw_float_message (
@@ -414,44 +411,81 @@ async def callback_bump_items (callback :CallbackQuery ,state :FSMContext ):
         )
 
 
+def _request_withdrawal_job (job ):
+    from plbot .playerokbot import get_playerok_bot 
+    job .set_total (1 )
+    if not get_playerok_bot ().request_withdrawal ():
+        job .advance (error =True )
+        raise Exception ("failed to create the withdrawal transaction (see console for errors)")
+    job .advance ()
+
+
 @router .callback_query (F .data =="request_withdrawal")
 async def callback_request_withdrawal (callback :CallbackQuery ,state :FSMContext ):
     try :
         await state .set_state (None )
 
+        await throw_job_message (
+        state ,
+        callback .message ,
+        "request_withdrawal",
+        _request_withdrawal_job ,
+        title ="💸 Withdrawal transaction",
+        text_func =templ .events_float_text ,
+        back_cb =calls .MenuNavigation (to ="events").pack (),
+        callback =callback 
+        )
+    except Exception as e :
         await throw_float_message (
         state =state ,
         message =callback .message ,
-        text =templ .events_float_text (f"💸 I am creating <b>transaction to withdraw funds</b>, please wait (see console)..."),
+        text =templ .events_float_text (e ),
         reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
         )
 
-        from plbot .playerokbot import get_playerok_bot 
-        success =get_playerok_bot ().request_withdrawal ()
-
-        if success :
-            await throw_float_message (
-            state =state ,
-            message =callback .message ,
-            text =templ .events_float_text (f"✅ <b>Withdrawal transaction</b> was successfully created"),
-            reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
-            )
+
+@router .callback_query (F .data .in_ ({"profile_cpu","profile_memory"}))
+async def callback_profile (callback :CallbackQuery ,state :FSMContext ):
+    try :
+        await state .set_state (None )
+
+        from core .profiling import profile_cpu ,profile_memory 
+        duration =sett .get ("config")["profiling"]["duration"]
+        if callback .data =="profile_cpu":
+            func ,title =profile_cpu ,f"🔥 CPU profile of all threads ({duration } sec.)"
         else :
-            await throw_float_message (
-            state =state ,
-            message =callback .message ,
-            text =templ .events_float_text (f"❌ Failed to create <b>withdrawal transaction </b> (see console for errors)"),
-            reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
-            )
+            func ,title =profile_memory ,f"🧠 Allocations diff ({duration } sec.)"
+
+        job =await throw_job_message (
+        state ,
+        callback .message ,
+        callback .data ,
+        func ,
+        duration ,
+        title =title ,
+        text_func =templ .performance_float_text ,
+        back_cb =calls .MenuNavigation (to ="performance").pack (),
+        callback =callback 
+        )
+        asyncio .create_task (send_job_document (job ,callback .message ))
     except Exception as e :
         await throw_float_message (
         state =state ,
         message =callback .message ,
-        text =templ .events_float_text (e ),
-        reply_markup =templ .back_kb (calls .MenuNavigation (to ="events").pack ())
+        text =templ .performance_float_text (e ),
+        reply_markup =templ .back_kb (calls .MenuNavigation (to ="performance").pack ())
         )
 
 
+@router .callback_query (calls .CancelJob .filter ())
+async def callback_cancel_job (callback :CallbackQuery ,callback_data :calls .CancelJob ):
+    from core .background_jobs import get_job_runner 
+    if get_job_runner ().cancel (callback_data .name ):
+        await callback .answer ("⛔ Cancelling, the job stops after the current step...")
+    else :
+        await callback .answer ("The job is not running")
+
+
 @router .callback_query (F .data =="clean_fp_proxy")
 async def callback_clean_fp_proxy (callback :CallbackQuery ,state :FSMContext ):
     await state .set_state (None )
@@ -7,6 +7,7 @@ from core.modules import (
     enable_module, 
     disable_module
 )
+from core.metrics import init_metrics
 from settings import Settings as sett
 
 from .. import templates as templ
@@ -352,4 +353,18 @@ async def callback_switch_module_enabled(callback: CallbackQuery, state: FSMCont
             message=callback.message,
             text=templ.module_page_float_text(e),
             reply_markup=templ.back_kb(calls.ModulesPagination(page=last_page).pack())
-        )
\ No newline at end of file
+        )
+
+
+@router.callback_query(F.data == "switch_metrics_enabled")
+async def callback_switch_metrics_enabled(callback: CallbackQuery, state: FSMContext):
+    config = sett.get("config")
+    config["metrics"]["enabled"] = not config["metrics"]["enabled"]
+    sett.set("config", config)
+    init_metrics()
+
+    return await callback_menu_navigation(
+        callback,
+        calls.MenuNavigation(to="performance"),
+        state
+    )
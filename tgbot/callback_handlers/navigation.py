@@ -7,11 +7,35 @@ from settings import Settings as sett
 from .. import templates as templ
 from .. import callback_datas as calls
 from ..helpful import throw_float_message
+from ..view_cache import throw_cached_message
 
 
 router = Router()
 
 
+def get_withdrawal_data() -> dict:
+    from plbot.playerokbot import get_playerok_bot
+    acc = get_playerok_bot().account
+
+    bank_cards = []
+    try:
+        crsr = None
+        while True:
+            card_list = acc.get_verified_cards(after_cursor=crsr)
+            bank_cards.extend(card_list.bank_cards)
+            if not card_list.page_info.has_next_page: break
+            crsr = card_list.page_info.end_cursor
+    except:
+        pass
+
+    try:
+        sbp_banks = acc.get_sbp_bank_members()
+    except:
+        sbp_banks = []
+
+    return {"bank_cards": bank_cards, "sbp_banks": sbp_banks}
+
+
 @router.callback_query(calls.MenuNavigation.filter())
 async def callback_menu_navigation(callback: CallbackQuery, callback_data: calls.MenuNavigation, state: FSMContext):
     await state.set_state(None)
@@ -22,8 +46,13 @@ async def callback_menu_navigation(callback: CallbackQuery, callback_data: calls
         await throw_float_message(state, callback.message, templ.menu_text(), templ.menu_kb(), callback)
     elif to == "stats":
         await throw_float_message(state, callback.message, templ.stats_text(), templ.stats_kb(), callback)
+    elif to == "performance":
+        await throw_float_message(state, callback.message, templ.performance_text(), templ.performance_kb(), callback)
     elif to == "profile":
-        await throw_float_message(state, callback.message, templ.profile_text(), templ.profile_kb(), callback)
+        await throw_cached_message(
+            state, callback.message, "profile", templ.get_profile_data,
+            lambda profile: (templ.profile_text(profile), templ.profile_kb()), callback
+        )
     elif to == "events":
         await throw_float_message(state, callback.message, templ.events_text(), templ.events_kb(), callback)
     elif to == "logs":
@@ -59,39 +88,21 @@ async def callback_settings_navigation(callback: CallbackQuery, callback_data: c
     elif to == "complete":
         await throw_float_message(state, callback.message, templ.settings_complete_text(), templ.settings_complete_kb(), callback)
     elif to == "withdrawal":
-        from plbot.playerokbot import get_playerok_bot
-        acc = get_playerok_bot().account
-
-        config = sett.get("config")
-        credentials_type = config["playerok"]["auto_withdrawal"]["credentials_type"]
-        card_id = config["playerok"]["auto_withdrawal"]["card_id"]
-        sbp_bank_id = config["playerok"]["auto_withdrawal"]["sbp_bank_id"]
-        
-        card = None
-        sbp_bank = None
-
-        try: 
-            crsr = None
-            while True:
-                card_list = acc.get_verified_cards(after_cursor=crsr)
-                if not card_list.page_info.has_next_page: break
-                crsr = card_list.page_info.end_cursor
-            
-            await state.update_data(bank_cards=card_list.bank_cards)
+        def render(data: dict) -> tuple:
+            config = sett.get("config")
+            credentials_type = config["playerok"]["auto_withdrawal"]["credentials_type"]
+            card_id = config["playerok"]["auto_withdrawal"]["card_id"]
+            sbp_bank_id = config["playerok"]["auto_withdrawal"]["sbp_bank_id"]
+
+            card = None
+            sbp_bank = None
             if credentials_type == "card":
-                card = [card for card in card_list.bank_cards if card.id == card_id][0]
-        except: 
-            pass
-
-        try: 
-            sbp_banks = acc.get_sbp_bank_members()
-            await state.update_data(sbp_banks=sbp_banks)
-            if credentials_type == "sbp":
-                sbp_bank = [bank for bank in sbp_banks if bank.id == sbp_bank_id][0]
-        except: 
-            pass
-
-        await throw_float_message(state, callback.message, templ.settings_withdrawal_text(card, sbp_bank), templ.settings_withdrawal_kb(card, sbp_bank), callback)
+                card = next((card for card in data["bank_cards"] if card.id == card_id), None)
+            elif credentials_type == "sbp":
+                sbp_bank = next((bank for bank in data["sbp_banks"] if bank.id == sbp_bank_id), None)
+            return templ.settings_withdrawal_text(card, sbp_bank), templ.settings_withdrawal_kb(card, sbp_bank)
+
+        await throw_cached_message(state, callback.message, "withdrawal", get_withdrawal_data, render, callback, max_age=300)
     elif to == "bump":
         await throw_float_message(state, callback.message, templ.settings_bump_text(), templ.settings_bump_kb(), callback)
     elif to == "logger":
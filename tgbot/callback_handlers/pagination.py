@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 from .. import templates as templ
 from .. import callback_datas as calls
 from ..helpful import throw_float_message
+from ..view_cache import get_view_data
 
 
 router = Router()
@@ -196,8 +197,7 @@ async def callback_bank_cards_pagination(callback: CallbackQuery, callback_data:
     page = callback_data.page
     await state.update_data(last_page=page)
     
-    data = await state.get_data()
-    bank_cards = data.get("bank_cards", [])
+    bank_cards = (get_view_data("withdrawal") or {}).get("bank_cards", [])
     
     await throw_float_message(
         state=state,
@@ -215,8 +215,7 @@ async def callback_sbp_banks_pagination(callback: CallbackQuery, callback_data:
     page = callback_data.page
     await state.update_data(last_page=page)
     
-    data = await state.get_data()
-    sbp_banks = data.get("sbp_banks", [])
+    sbp_banks = (get_view_data("withdrawal") or {}).get("sbp_banks", [])
     
     await throw_float_message(
         state=state,
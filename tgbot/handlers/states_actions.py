@@ -21,8 +21,10 @@ async def handler_waiting_for_message_content (message :types .Message ,state :F
         data =await state .get_data ()
         username =data .get ("username")
 
-        from plbot .playerokbot import get_playerok_bot 
-        plbot =get_playerok_bot ()
+        from plbot .playerokbot import get_account_bot 
+        plbot =get_account_bot (data .get ("namespace"))
+        if plbot is None :
+            raise Exception (f'❌ Account <b>{data .get ("namespace")}</b> is not running')
         chat =plbot .get_chat_by_username (username )
 
         sent_msg =""
@@ -376,6 +376,44 @@ async def handler_waiting_for_watermark_value (message :types .Message ,state :F
         )
 
 
+@router .message (states .SettingsStates .waiting_for_slow_handler_threshold ,F .text )
+async def handler_waiting_for_slow_handler_threshold (message :types .Message ,state :FSMContext ):
+    try :
+        await state .set_state (None )
+
+        try :
+            threshold =float (message .text .replace (",","."))
+        except ValueError :
+            raise Exception ('❌ You must enter a numeric value')
+        if threshold <0 :
+            raise Exception ('❌ Value too low')
+
+        threshold =int (threshold )if threshold .is_integer ()else threshold 
+        config =sett .get ("config")
+        config ["profiling"]["slow_handler_threshold"]=threshold 
+        sett .set ("config",config )
+
+        from core .profiling import set_slow_handler_threshold 
+        set_slow_handler_threshold (threshold )
+
+        await throw_float_message (
+        state =state ,
+        message =message ,
+        text =templ .performance_float_text (
+        f"✅ <b>Slow handler threshold</b> has been successfully changed to <b>{threshold } sec.</b>"if threshold 
+        else "✅ <b>Slow handlers</b> are no longer logged"
+        ),
+        reply_markup =templ .back_kb (calls .MenuNavigation (to ="performance").pack ())
+        )
+    except Exception as e :
+        await throw_float_message (
+        state =state ,
+        message =message ,
+        text =templ .performance_float_text (e ),
+        reply_markup =templ .back_kb (calls .MenuNavigation (to ="performance").pack ())
+        )
+
+
 @router .message (states .SettingsStates .waiting_for_logs_max_file_size ,F .text )
 async def handler_waiting_for_logs_max_file_size (message :types .Message ,state :FSMContext ):
     try :
@@ -108,7 +108,8 @@ async def throw_float_message(
     reply_markup: InlineKeyboardMarkup = None,
     callback: CallbackQuery = None,
     photo: str = None,
-    send: bool = False
+    send: bool = False,
+    view_key: str = None
 ) -> Message | None:
     
     if not text and not photo:
@@ -155,6 +156,6 @@ async def throw_float_message(
         await bot.answer_callback_query(callback.id, cache_time=0)
 
     if mess:
-        await state.update_data(accent_message_id=mess.message_id)
+        await state.update_data(accent_message_id=mess.message_id, view_key=view_key)
 
     return mess
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import logging
+from typing import Callable
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery, FSInputFile
+
+from core.background_jobs import BackgroundJob, JobAlreadyRunningError, get_job_runner
+
+from . import templates as templ
+from .helpful import throw_float_message, try_edit_message
+
+
+logger = logging.getLogger("universal.telegram")
+
+JOB_PROGRESS_INTERVAL = 3
+
+
+async def throw_job_message(
+    state: FSMContext,
+    message: Message,
+    name: str,
+    func: Callable,
+    *args,
+    title: str,
+    text_func: Callable[[str], str],
+    back_cb: str,
+    callback: CallbackQuery = None,
+    **kwargs
+) -> BackgroundJob:
+    """Starts the background job and shows its progress message,
+    the message is edited while the job runs (processed steps, errors, time left) and has the cancel button.
+    The editing stops once the user has moved to another screen.
+    If the job with the same name is already running, the progress of the running job is shown instead.
+
+    :param name: Unique job name.
+    :type name: `str`
+
+    :param func: Job function, receives the job object and the passed arguments.
+    :type func: `callable`
+
+    :param title: Job title shown to the user.
+    :type title: `str`
+
+    :param text_func: Template function that wraps the progress text (e.g. `templ.events_float_text`).
+    :type text_func: `callable`
+
+    :param back_cb: Callback data of the back button.
+    :type back_cb: `str`
+
+    :return: Started or already running job.
+    :rtype: `core.background_jobs.BackgroundJob`"""
+    try:
+        job = get_job_runner().submit(name, func, *args, title=title, **kwargs)
+    except JobAlreadyRunningError as e:
+        job = e.job
+
+    view_key = f"job:{name}"
+    mess = await throw_float_message(
+        state=state,
+        message=message,
+        text=text_func(templ.job_progress_text(job)),
+        reply_markup=templ.job_kb(name, back_cb, job.is_running),
+        callback=callback,
+        view_key=view_key
+    )
+    if mess:
+        asyncio.create_task(_watch_job(state, job, mess, view_key, text_func, back_cb))
+    return job
+
+
+async def send_job_document(job: BackgroundJob, message: Message):
+    """Waits for the job to finish and sends the file it has returned (its path) as a document.
+    Nothing is sent if the job has failed or has returned no file.
+
+    :param job: Job whose function returns the file path.
+    :type job: `core.background_jobs.BackgroundJob`
+
+    :param message: Message to answer with the document.
+    :type message: `aiogram.types.Message`"""
+    while job.is_running:
+        await asyncio.sleep(1)
+    if job.status == "failed" or not job.result or not os.path.exists(job.result):
+        return
+    try:
+        await message.answer_document(
+            document=FSInputFile(job.result),
+            caption=job.title,
+            reply_markup=templ.destroy_kb()
+        )
+    except Exception as e:
+        logger.error(f"Failed to send the \"{job.name}\" job result: {e}")
+
+
+async def _watch_job(state: FSMContext, job: BackgroundJob, mess: Message, view_key: str,
+                     text_func: Callable[[str], str], back_cb: str):
+    from .telegrambot import get_telegram_bot
+    bot = get_telegram_bot().bot
+
+    last_text = None
+    while True:
+        await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+        is_running = job.is_running
+        text = text_func(templ.job_progress_text(job))
+        if text != last_text:
+            data = await state.get_data()
+            if data.get("view_key") != view_key or data.get("accent_message_id") != mess.message_id:
+                return  # the user has moved to another screen
+            try:
+                edited = await try_edit_message(bot, mess.chat.id, mess.message_id, text, None, templ.job_kb(job.name, back_cb, is_running), None)
+            except Exception as e:
+                logger.debug(f"Failed to update the \"{job.name}\" job progress: {e}")
+                edited = "not_modified"
+            if edited is None:
+                return  # the message has been deleted
+            last_text = text
+        if not is_running:
+            return
@@ -26,6 +26,7 @@ class SettingsStates(StatesGroup):
     waiting_for_watermark_value = State()
 
     waiting_for_logs_max_file_size = State()
+    waiting_for_slow_handler_threshold = State()
 
 
 class MessagesStates(StatesGroup):
@@ -7,6 +7,7 @@ from .profile import *
 from .events import *
 from .logs import *
 from .stats import *
+from .performance import *
 
 from .settings import *
 from .settings_auth import *
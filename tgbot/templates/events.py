@@ -1,21 +1,22 @@
 from aiogram .types import InlineKeyboardMarkup ,InlineKeyboardButton 
 import textwrap 
-from datetime import datetime ,timedelta 
+from datetime import datetime 
 
-from data import Data as data 
-from settings import Settings as sett 
+from core .scheduler import get_scheduler 
 
 from ..import callback_datas as calls 
 
 
-def events_text ():
-    config =sett .get ("config")
-    latest_events_times =data .get ("latest_events_times")
+def _job_times (name :str )->tuple [str ,str ]:
+    job =get_scheduler ().get_job (name )
+    last =datetime .fromtimestamp (job .last_run ).strftime ("%d.%m.%Y %H:%M")if job and job .last_run else '❌ There was no'
+    next_ =datetime .fromtimestamp (job .next_run ).strftime ("%d.%m.%Y %H:%M")if job and job .next_run else '❌ Not planned'
+    return last ,next_ 
+
 
-    last_bump_items =(datetime .fromisoformat (latest_events_times ["auto_bump_items"]).strftime ("%d.%m.%Y %H:%M"))if latest_events_times .get ("auto_bump_items")else '❌ There was no'
-    next_bump_items =((datetime .fromisoformat (latest_events_times ["auto_bump_items"])if latest_events_times .get ("auto_bump_items")else datetime .now ())+timedelta (seconds =config ["playerok"]["auto_bump_items"]["interval"])).strftime ("%d.%m.%Y %H:%M")
-    last_withdrawal =(datetime .fromisoformat (latest_events_times ["auto_withdrawal"]).strftime ("%d.%m.%Y %H:%M"))if latest_events_times .get ("auto_withdrawal")else '❌ There was no'
-    next_withdrawal =((datetime .fromisoformat (latest_events_times ["auto_withdrawal"])if latest_events_times .get ("auto_withdrawal")else datetime .now ())+timedelta (seconds =config ["playerok"]["auto_withdrawal"]["interval"])).strftime ("%d.%m.%Y %H:%M")
+def events_text ():
+    last_bump_items ,next_bump_items =_job_times ("auto_bump_items")
+    last_withdrawal ,next_withdrawal =_job_times ("auto_withdrawal")
 
     txt =textwrap .dedent (f"""<b>🚩 Events</b>
 
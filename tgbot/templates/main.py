@@ -1,4 +1,5 @@
 import textwrap 
+import time 
 from aiogram .types import InlineKeyboardMarkup ,InlineKeyboardButton 
 
 from ..import callback_datas as calls 
@@ -37,34 +38,36 @@ def do_action_text (placeholder :str ):
     return txt 
 
 
-def log_text (title :str ,text :str ):
+def log_text (title :str ,text :str ,account :str |None =None ):
     txt =textwrap .dedent (f"""
         <b>{title }</b>
         \n{text }
     """)
+    if account :
+        txt +=f"\n<b>Account:</b> {account }"
     return txt 
 
 
-def log_new_mess_kb (username :str ):
-    rows =[[InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess").pack ())]]
+def log_new_mess_kb (username :str ,namespace :str |None =None ):
+    rows =[[InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess",ns =namespace ).pack ())]]
     kb =InlineKeyboardMarkup (inline_keyboard =rows )
     return kb 
 
 
-def log_new_deal_kb (username :str ,deal_id :str ):
+def log_new_deal_kb (username :str ,deal_id :str ,namespace :str |None =None ):
     rows =[[
-    InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess").pack ()),
-    InlineKeyboardButton (text ='☑️ Completed',callback_data =calls .RememberDealId (de_id =deal_id ,do ="complete").pack ()),
-    InlineKeyboardButton (text ='📦 Refund',callback_data =calls .RememberDealId (de_id =deal_id ,do ="refund").pack ())
+    InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess",ns =namespace ).pack ()),
+    InlineKeyboardButton (text ='☑️ Completed',callback_data =calls .RememberDealId (de_id =deal_id ,do ="complete",ns =namespace ).pack ()),
+    InlineKeyboardButton (text ='📦 Refund',callback_data =calls .RememberDealId (de_id =deal_id ,do ="refund",ns =namespace ).pack ())
     ]]
     kb =InlineKeyboardMarkup (inline_keyboard =rows )
     return kb 
 
 
-def log_new_review_kb (username :str ,deal_id :str ):
+def log_new_review_kb (username :str ,deal_id :str ,namespace :str |None =None ):
     rows =[[
-    InlineKeyboardButton (text ='💬🌟 Reply to review',callback_data =calls .RememberDealId (de_id =deal_id ,do ="answer_rev").pack ()),
-    InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess").pack ())
+    InlineKeyboardButton (text ='💬🌟 Reply to review',callback_data =calls .RememberDealId (de_id =deal_id ,do ="answer_rev",ns =namespace ).pack ()),
+    InlineKeyboardButton (text ='💬 Write',callback_data =calls .RememberUsername (name =username ,do ="send_mess",ns =namespace ).pack ())
     ]]
     kb =InlineKeyboardMarkup (inline_keyboard =rows )
     return kb 
@@ -81,4 +84,35 @@ def call_seller_text (calling_name ,chat_link ):
     txt =textwrap .dedent (f"""
         🆘 <b>{calling_name }</b> needs your help!{chat_link }
     """)
-    return txt 
\ No newline at end of file
+    return txt 
+
+
+def job_progress_text (job ):
+    if job .is_running :
+        status =f'⏳ <b>{job .title }</b> is in progress{" (cancelling...)"if job .is_cancelled else ""}'
+    elif job .status =="done":
+        status =f'✅ <b>{job .title }</b> completed'
+    elif job .status =="cancelled":
+        status =f'⛔ <b>{job .title }</b> cancelled'
+    else :
+        status =f'❌ <b>{job .title }</b> failed: {job .error }'
+
+    elapsed =int ((job .finished_at or time .time ())-job .started_at )
+    eta =f"~{int (job .eta )} sec."if job .eta is not None else "—"
+    txt =textwrap .dedent (f"""{status }
+
+        ・ <b>Processed:</b> {job .processed }/{job .total if job .total is not None else '?'}
+        ・ <b>Errors:</b> {job .errors }
+        ・ <b>Elapsed:</b> {elapsed } sec.
+        ・ <b>Time left:</b> {eta }
+    """)
+    return txt 
+
+
+def job_kb (name :str ,back_cb :str ,is_running :bool ):
+    rows =[]
+    if is_running :
+        rows .append ([InlineKeyboardButton (text ='⛔ Cancel',callback_data =calls .CancelJob (name =name ).pack ())])
+    rows .append ([InlineKeyboardButton (text ='⬅️ Back',callback_data =back_cb )])
+    kb =InlineKeyboardMarkup (inline_keyboard =rows )
+    return kb 
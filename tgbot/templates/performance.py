@@ -0,0 +1,86 @@
+from aiogram .types import InlineKeyboardMarkup ,InlineKeyboardButton 
+import textwrap 
+
+from playerokapi .metrics import get_metrics 
+from settings import Settings as sett 
+
+from ..import callback_datas as calls 
+
+
+def _seconds (value :float |None )->str :
+    if value is None :
+        return "—"
+    return "> 60 sec."if value ==float ("inf")else f"≤ {value } sec."
+
+
+def _slowest (name :str ,label :str ,count :int =3 )->str :
+    series =[
+    (labels .get (label ),value [1 ]/value [2 ])
+    for labels ,value in get_metrics ().get_series (name )if value [2 ]
+    ]
+    series .sort (key =lambda item :item [1 ],reverse =True )
+    return "".join (f"\n        ・ <code>{series_name }</code> — {avg :.2f} sec."for series_name ,avg in series [:count ])or "\n        ・ —"
+
+
+def performance_text ():
+    metrics =get_metrics ()
+    if not metrics .enabled :
+        txt =textwrap .dedent (f"""<b>📈 Performance</b>
+
+        Metrics collection is <b>disabled</b>.
+        Enable it to see the API latency, rate limits, WebSocket reconnects, event lag and handler durations.
+        """)
+        return txt 
+
+    requests_total =int (metrics .get_total ("playerok_requests_total"))
+    requests_ok =int (metrics .get_total ("playerok_requests_total",status =200 ))
+    rate_limited =int (metrics .get_total ("playerok_request_retries_total",reason =429 ))
+    retries =int (metrics .get_total ("playerok_request_retries_total"))
+    queue_depth =sum (value for _ ,value in metrics .get_gauge_values ("playerok_listener_queue_depth"))
+
+    txt =textwrap .dedent (f"""<b>📈 Performance</b>
+
+        <b>🌐 Playerok API:</b>
+        ・ <b>Requests:</b> {requests_total } (not 200: {requests_total -requests_ok })
+        ・ <b>Latency p50:</b> {_seconds (metrics .get_quantile ('playerok_request_duration_seconds',0.5 ))}
+        ・ <b>Latency p95:</b> {_seconds (metrics .get_quantile ('playerok_request_duration_seconds',0.95 ))}
+        ・ <b>Retries:</b> {retries } (429: {rate_limited })
+        <b>Slowest operations:</b>{_slowest ('playerok_request_duration_seconds','operation')}
+
+        <b>📡 Listener:</b>
+        ・ <b>WS messages:</b> {int (metrics .get_total ('playerok_ws_messages_total'))}
+        ・ <b>WS reconnects:</b> {int (metrics .get_total ('playerok_ws_reconnects_total'))}
+        ・ <b>Events:</b> {int (metrics .get_total ('playerok_events_total'))}
+        ・ <b>Event lag p95:</b> {_seconds (metrics .get_quantile ('playerok_event_lag_seconds',0.95 ))}
+        ・ <b>Queue depth:</b> {int (queue_depth )}
+
+        <b>🧩 Handlers:</b>
+        ・ <b>Errors:</b> {int (metrics .get_total ('bot_handler_errors_total'))}
+        <b>Slowest handlers:</b>{_slowest ('bot_handler_duration_seconds','handler')}
+    """)
+    return txt 
+
+
+def performance_kb ():
+    metrics =get_metrics ()
+    profiling =sett .get ("config")["profiling"]
+    slow_handler_threshold =f"≥ {profiling ['slow_handler_threshold']} sec."if profiling ["slow_handler_threshold"]else "❌ Disabled"
+    rows =[
+    [InlineKeyboardButton (text ='🔴 Disable collection'if metrics .enabled else '🟢 Enable collection',callback_data ="switch_metrics_enabled")],
+    [
+    InlineKeyboardButton (text =f"🔥 CPU profile ({profiling ['duration']} sec.)",callback_data ="profile_cpu"),
+    InlineKeyboardButton (text =f"🧠 Allocations ({profiling ['duration']} sec.)",callback_data ="profile_memory")
+    ],
+    [InlineKeyboardButton (text =f"🐢 Log slow handlers: {slow_handler_threshold }",callback_data ="enter_slow_handler_threshold")],
+    [InlineKeyboardButton (text ='🔄 Refresh',callback_data =calls .MenuNavigation (to ="performance").pack ())],
+    [InlineKeyboardButton (text ='⬅️ Back',callback_data =calls .MenuNavigation (to ="stats").pack ())]
+    ]
+    kb =InlineKeyboardMarkup (inline_keyboard =rows )
+    return kb 
+
+
+def performance_float_text (placeholder :str ):
+    txt =textwrap .dedent (f"""<b>📈 Performance</b>
+        \n{placeholder }
+    """)
+    return txt 
@@ -5,14 +5,21 @@ from datetime import datetime
 from ..import callback_datas as calls 
 
 
-def profile_text ():
+def get_profile_data ():
     from plbot .playerokbot import get_playerok_bot 
 
-    plbot =get_playerok_bot ()
-    plbot .refresh_account ()
+    state =get_playerok_bot ().account .state 
+    try :
+        state .get_balance ()
+        return state .get_profile ()
+    except Exception :
+        return get_playerok_bot ().account .profile 
 
-    acc =plbot .account 
-    profile =acc .profile 
+
+def profile_text (profile =None ):
+    from plbot .playerokbot import get_playerok_bot 
+
+    profile =profile or get_playerok_bot ().account .profile 
 
     txt =textwrap .dedent (f"""<b>👤 My profile</b>
 
@@ -47,6 +47,7 @@ def stats_text ():
 
 def stats_kb ():
     rows =[
+    [InlineKeyboardButton (text ='📈 Performance',callback_data =calls .MenuNavigation (to ="performance").pack ())],
     [InlineKeyboardButton (text ='⬅️ Back',callback_data =calls .MenuNavigation (to ="default").pack ())]
     ]
     kb =InlineKeyboardMarkup (inline_keyboard =rows )
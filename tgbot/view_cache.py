@@ -0,0 +1,126 @@
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+
+from .helpful import throw_float_message, try_edit_message
+
+
+logger = logging.getLogger("universal.telegram")
+
+VIEW_DATA_MAX_AGE = 60
+
+
+class ViewData:
+    """Cached data of a Telegram screen.
+
+    :param data: Screen data.
+    :type data: `Any`"""
+
+    def __init__(self, data: Any):
+        self.data: Any = data
+        """Screen data."""
+        self.updated_at: float = time.time()
+        """Time the data was fetched (timestamp)."""
+
+
+_view_data: dict[str, ViewData] = {}
+_refresh_tasks: dict[str, asyncio.Task] = {}
+
+
+def get_view_data(key: str) -> Any | None:
+    """Returns the last fetched data of the screen without requests.
+
+    :param key: Screen key.
+    :type key: `str`
+
+    :return: Screen data or None if it was not fetched yet.
+    :rtype: `Any` or `None`"""
+    entry = _view_data.get(key)
+    return entry.data if entry else None
+
+
+async def refresh_view_data(key: str, fetch: Callable[[], Any]) -> ViewData:
+    """Fetches the screen data in a thread (off the event loop).
+    Concurrent refreshes of one screen share a single fetch.
+
+    :param key: Screen key.
+    :type key: `str`
+
+    :param fetch: Blocking function that fetches the data.
+    :type fetch: `callable`
+
+    :return: Fresh screen data.
+    :rtype: `tgbot.view_cache.ViewData`"""
+    task = _refresh_tasks.get(key)
+    if task is None:
+        async def run():
+            try:
+                _view_data[key] = ViewData(await asyncio.to_thread(fetch))
+                return _view_data[key]
+            finally:
+                _refresh_tasks.pop(key, None)
+        task = _refresh_tasks[key] = asyncio.create_task(run())
+    return await task
+
+
+def _with_stamp(text: str, entry: ViewData) -> str:
+    return f"{text}\n<i>🕓 Updated at {datetime.fromtimestamp(entry.updated_at).strftime('%H:%M:%S')}</i>"
+
+
+async def throw_cached_message(
+    state: FSMContext,
+    message: Message,
+    key: str,
+    fetch: Callable[[], Any],
+    render: Callable[[Any], tuple],
+    callback: CallbackQuery = None,
+    max_age: float = VIEW_DATA_MAX_AGE
+) -> Message | None:
+    """Shows the screen from the last fetched data with the "updated at" stamp.
+    If the data is older than `max_age`, it is refreshed in the background
+    and the message is edited when the fresh data lands (if the screen is still open).
+    Only the very first opening of the screen waits for the data.
+
+    :param key: Screen key.
+    :type key: `str`
+
+    :param fetch: Blocking function that fetches the screen data.
+    :type fetch: `callable`
+
+    :param render: Function that returns (text, reply markup) of the screen by its data.
+    :type render: `callable`
+
+    :param max_age: Maximum age of the data in seconds.
+    :type max_age: `float`"""
+    entry = _view_data.get(key)
+    if entry is None:
+        entry = await refresh_view_data(key, fetch)
+
+    text, reply_markup = render(entry.data)
+    mess = await throw_float_message(state, message, _with_stamp(text, entry), reply_markup, callback, view_key=key)
+    if mess and time.time() - entry.updated_at > max_age:
+        asyncio.create_task(_revalidate(state, mess, key, fetch, render))
+    return mess
+
+
+async def _revalidate(state: FSMContext, mess: Message, key: str, fetch: Callable[[], Any], render: Callable[[Any], tuple]):
+    try:
+        entry = await refresh_view_data(key, fetch)
+    except Exception as e:
+        logger.debug(f"Failed to refresh the \"{key}\" screen data: {e}")
+        return
+
+    data = await state.get_data()
+    if data.get("view_key") != key or data.get("accent_message_id") != mess.message_id:
+        return  # the user has moved to another screen
+
+    from .telegrambot import get_telegram_bot
+    text, reply_markup = render(entry.data)
+    try:
+        await try_edit_message(get_telegram_bot().bot, mess.chat.id, mess.message_id, _with_stamp(text, entry), None, reply_markup, None)
+    except Exception as e:
+        logger.debug(f"Failed to update the \"{key}\" screen: {e}")
@@ -69,7 +69,11 @@ def install_update (release_info :dict ,content :bytes )->bool :
             shutil .rmtree (temp_dir ,ignore_errors =True )
 
 
+_pending_update :tuple [dict ,bytes ]|None =None # downloaded, installed after the launch
+
+
 def check_for_updates ():
+    global _pending_update 
     try :
         releases =get_releases ()
         latest_release =get_latest_release (releases )
@@ -94,9 +98,21 @@ def check_for_updates ():
             bytes =download_update (latest_release )
             if not bytes :
                 return 
-            logger .info (f"Installing the update{latest_release ['tag_name']}...")
-            if install_update (latest_release ,bytes ):
-                logger .info (f"{Fore .YELLOW }Update{Fore .LIGHTWHITE_EX }{latest_release ['tag_name']} {Fore .YELLOW }was installed successfully.")
-                restart ()
+            _pending_update =(latest_release ,bytes )
+    except Exception as e :
+        logger .error (f"{Fore .LIGHTRED_EX }Error during update:{Fore .WHITE }{e }")
+
+
+def install_pending_update ():
+    global _pending_update 
+    if not _pending_update :
+        return 
+    latest_release ,bytes =_pending_update 
+    _pending_update =None 
+    try :
+        logger .info (f"Installing the update{latest_release ['tag_name']}...")
+        if install_update (latest_release ,bytes ):
+            logger .info (f"{Fore .YELLOW }Update{Fore .LIGHTWHITE_EX }{latest_release ['tag_name']} {Fore .YELLOW }was installed successfully.")
+            restart ()
     except Exception as e :
-        logger .error (f"{Fore .LIGHTRED_EX }Error during update:{Fore .WHITE }{e }")
\ No newline at end of file
+        logger .error (f"{Fore .LIGHTRED_EX }Error during update:{Fore .WHITE }{e }")